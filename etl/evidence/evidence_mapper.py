@@ -22,9 +22,12 @@ from .lib.tier2_tpt import Tier2TPTConstructor
 from .lib.tier3_curator import Tier3Curator, EvidenceMapping
 from .lib.ncbi_resolver import NCBIResolver
 from .lib.part_filter import PartFilter
-from .lib.nutrient_store import NutrientStore
+from .lib.nutrient_store import NutrientStore, NutrientRow
 from .lib.nutrient_mapper import NutrientMapper
 from .lib.unmapped_nutrients import UnmappedNutrientCollector
+from .lib.parallel_mapping import map_nutrients_parallel
+from .lib.optimized_prompts import prepare_transforms, preload_system_prompts
+from .lib.llm import set_response_cache_path
 from .tpt_id_utils import generate_tpt_id
 from .lib.fdc import load_foundation_foods_json, filter_nutrients_for_foods
 from .lib.jsonl import write_jsonl, read_jsonl
@@ -37,12 +40,19 @@ class EvidenceMapper:
     """3-Tier Evidence Mapping Pipeline"""
     
     def __init__(self, graph_db_path: Path, ncbi_db_path: Path, 
-                 overlay_dir: Path, model: str = "gpt-5-mini"):
+                 overlay_dir: Path, model: str = "gpt-5-mini", workers: int = 1,
+                 taxon_batch: int = 1):
         """Initialize the evidence mapper"""
         self.graph_db_path = graph_db_path
         self.ncbi_db_path = ncbi_db_path
         self.overlay_dir = overlay_dir
         self.model = model
+        self.workers = workers
+        self.taxon_batch = taxon_batch
+        # food_id → TaxonResolution when Tier 1 runs up front in marshaled batches
+        self._taxon_resolutions: Dict[str, TaxonResolution] = {}
+        # food_id → (food_id, nutrient_row dicts, unmapped) when nutrients are pre-mapped in parallel
+        self._premapped_nutrients: Dict[str, Any] = {}
         
         # Find project root and resolve paths
         project_root = find_project_root()
@@ -80,6 +90,10 @@ class EvidenceMapper:
                 'order': t.order,
                 'params': t.params or []
             }
+        
+        # Workers share the system prompts; render them once here, for the
+        # transforms Tier 2 will be given
+        preload_system_prompts(prepare_transforms(self.graph_db.transforms()))
     
     def map_fdc_evidence(self, fdc_dir: Path, output_dir: Path, 
                         limit: int = 0, min_confidence: float = 0.7, 
@@ -150,10 +164,20 @@ class EvidenceMapper:
                 nutrients_by_food[food_id] = []
             nutrients_by_food[food_id].append(nutrient)
         
+        self._premap_nutrients(nutrients_by_food)
+        
         # Load ontology data
         print("Loading ontology data...")
         parts = self.graph_db.parts()
-        transforms = self.graph_db.transforms()
+        # Sorted once here; Tier 2 prompts list transforms in this order for every food
+        transforms = prepare_transforms(self.graph_db.transforms())
+        
+        # Tier 1 only needs food names, so with taxon_batch > 1 it resolves all
+        # foods up front, several per LLM call, amortizing the static prompt
+        if self.taxon_batch > 1 and foods:
+            print(f"[TIER 1] → Resolving taxa for {len(foods)} foods, {self.taxon_batch} per call...")
+            resolutions = self.tier1_resolver.resolve_batch(foods, rows_per_call=self.taxon_batch)
+            self._taxon_resolutions = {r.food_id: r for r in resolutions}
         
         # Map evidence using 3-tier system (sequential processing)
         print(f"Mapping evidence for {len(foods)} foods...")
@@ -209,6 +233,15 @@ class EvidenceMapper:
         
         return summary
     
+    def _premap_nutrients(self, nutrients_by_food: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Shard nutrient mapping across processes up front when workers > 1"""
+        # Nutrient mapping is CPU-bound and independent of the LLM tiers
+        if self.workers > 1 and nutrients_by_food:
+            print(f"Mapping nutrients for {len(nutrients_by_food)} foods across {self.workers} processes...")
+            self._premapped_nutrients = map_nutrients_parallel(
+                nutrients_by_food, self.nutrient_mapper.nutrients_json_path, max_workers=self.workers
+            )
+    
     def _process_single_food(self, food: Dict[str, Any], 
                            nutrients_by_food: Dict[str, List[Dict[str, Any]]],
                            parts: List[Any], transforms: List[Any]) -> EvidenceMapping:
@@ -229,8 +262,10 @@ class EvidenceMapper:
         food_description = food.get('additional_description', '')
         
         # Tier 1: Taxon resolution
-        print(f"[TIER 1] → Resolving taxon for \"{food_name}\"...")
-        taxon_resolution = self.tier1_resolver.resolve_taxon(food_id, food_name, food_description)
+        taxon_resolution = self._taxon_resolutions.pop(food_id, None)
+        if taxon_resolution is None:
+            print(f"[TIER 1] → Resolving taxon for \"{food_name}\"...")
+            taxon_resolution = self.tier1_resolver.resolve_taxon(food_id, food_name, food_description)
         
         if taxon_resolution.disposition == 'skip':
             print(f"[TIER 1] → Skipped: {taxon_resolution.reason}")
@@ -331,9 +366,17 @@ class EvidenceMapper:
                                       tpt_construction: Any, nutrient_data: List[Dict[str, Any]]) -> EvidenceMapping:
         """Create a mapping for high-confidence TPT construction"""
         # Map nutrients for this food
-        nutrient_rows, unmapped_nutrients = self.nutrient_store.map_fdc_nutrients_with_mapper(
-            nutrient_data, self.nutrient_mapper
-        )
+        premapped = self._premapped_nutrients.get(food_id)
+        if premapped is not None:
+            _, row_dicts, unmapped_nutrients = premapped
+            nutrient_rows = [NutrientRow(**row) for row in row_dicts]
+            # Workers spill nowhere; record here so stats match an in-process run
+            for unmapped in unmapped_nutrients:
+                self.nutrient_mapper.record_unmapped(unmapped)
+        else:
+            nutrient_rows, unmapped_nutrients = self.nutrient_store.map_fdc_nutrients_with_mapper(
+                nutrient_data, self.nutrient_mapper
+            )
         
         # Collect unmapped nutrients for proposals
         for unmapped in unmapped_nutrients:
@@ -602,26 +645,37 @@ def main():
     parser.add_argument("--model", default="gpt-5-mini", help="LLM model to use")
     parser.add_argument("--limit", type=int, default=0, help="Limit number of foods to process")
     parser.add_argument("--min-confidence", type=float, default=0.7, help="Minimum confidence threshold")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for nutrient mapping (1 = in-process)")
+    parser.add_argument("--taxon-batch", type=int, default=1, help="Foods per Tier 1 LLM call (1 = one call per food, max 20)")
+    parser.add_argument("--llm-cache", type=Path, default=None, help="SQLite file persisting LLM responses across runs (default: $EVIDENCE_LLM_CACHE)")
     parser.add_argument("--verbose", action="store_true", help="Verbose output")
     
     args = parser.parse_args()
+    if args.llm_cache:
+        set_response_cache_path(args.llm_cache)
     
     # Initialize evidence mapper
     mapper = EvidenceMapper(
         graph_db_path=args.graph_db,
         ncbi_db_path=args.ncbi_db,
         overlay_dir=args.overlay_dir,
-        model=args.model
+        model=args.model,
+        workers=args.workers,
+        taxon_batch=args.taxon_batch
     )
     
     # Run mapping
     print("Starting 3-tier evidence mapping...")
-    summary = mapper.map_fdc_evidence(
-        fdc_dir=args.fdc_dir,
-        output_dir=args.output,
-        limit=args.limit,
-        min_confidence=args.min_confidence
-    )
+    try:
+        summary = mapper.map_fdc_evidence(
+            fdc_dir=args.fdc_dir,
+            output_dir=args.output,
+            limit=args.limit,
+            min_confidence=args.min_confidence
+        )
+    finally:
+        mapper.nutrient_mapper.close()
+        mapper.nutrient_store.close()
     
     # Print summary
     print("\nMapping Summary:")
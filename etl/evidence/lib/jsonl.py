@@ -1,4 +1,5 @@
 from __future__ import annotations
+import json
 from pathlib import Path
 from typing import Dict, Iterator, Any
 from lib.io import write_jsonl as _write_jsonl, append_jsonl as _append_jsonl, read_jsonl as _read_jsonl, index_jsonl_by as _index_jsonl_by
@@ -15,3 +16,26 @@ def read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
 
 def index_jsonl_by(path: Path, key: str) -> Dict[str, Dict[str, Any]]:
     return _index_jsonl_by(path, key)
+
+def load_checkpoint(path: Path, key: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Rows of an append-only checkpoint JSONL, by str(row[key]) (later rows win)
+
+    A run killed mid-append can leave a torn last line: it is skipped (so that
+    item is redone) and newline-terminated so the next append starts cleanly.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    if not path.exists():
+        return rows
+    text = path.read_text(encoding="utf-8")
+    for line in text.splitlines():
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(row, dict) and row.get(key) is not None:
+            rows[str(row[key])] = row
+    if text and not text.endswith("\n"):
+        with path.open("a", encoding="utf-8") as f:
+            f.write("\n")
+    return rows
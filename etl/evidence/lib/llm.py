@@ -1,95 +1,569 @@
 from __future__ import annotations
-import json, time, os, random
+import asyncio, hashlib, json, time, os, random, re, sqlite3, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 # Ensure .env is loaded once via centralized module (no-op if missing)
 from .env import *  # noqa: F401,F403
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 try:
-    from openai import OpenAI
+    from openai import OpenAI, APIStatusError, BadRequestError, RateLimitError
 except Exception as e:
     OpenAI = None
+    APIStatusError = BadRequestError = RateLimitError = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# System prompts live with the other prompt text; re-exported for existing callers
+from .optimized_prompts import DEFAULT_SYSTEM
 
 class LLMError(Exception): ...
 
-DEFAULT_SYSTEM = """
-You will receive a STATIC BLOCK followed by one ITEM per request.
-Return STRICT JSON for that item only—no prose, no markdown, no extra keys.
-
-Rules (critical):
-- Prefer existing taxon_id from the graph; only emit new_taxa if none fits (with full contiguous parents).
-- Follow the kingdom-specific ladders exactly; do not skip intermediate ranks.
-- Hybrids: use x_ prefix in the species segment (e.g., x_ananassa).
-- Only cultivar/variety are permitted in plant suffixes; animals may append [breed]. Otherwise, back off rank.
-- Ignore marketing tokens (colors/grades/size) in taxon_id.
-- Non-biological items (minerals/water) => disposition="skip" with null IDs.
-- Processed meat products (frankfurters, sausages, hot dogs, deli meats) are typically multi-ingredient and should be disposition="skip".
-- When in doubt about multi-ingredient status, prefer "skip" over forcing a single-species mapping.
-- If label implies process (frozen, pasteurized, cooked, ground), you MUST include those transforms (if present in the registry) and set node_kind="tpt"; if missing, return disposition="ambiguous".
-""".strip()
-
-def call_llm(*, model: str, system: str, user: str = None, user_messages: List[str] = None, max_retries: int = 3, temperature: Optional[float] = None, client: OpenAI = None) -> Dict[str, Any]:
+@lru_cache(maxsize=4)
+def _cached_client(api_key: str) -> OpenAI:
+    """One OpenAI client (and HTTP connection pool) per API key per process"""
+    # Retries are handled by call_llm so the SDK's own retries don't multiply them
+    return OpenAI(api_key=api_key, max_retries=0)
+
+def get_client() -> OpenAI:
+    """Return the shared OpenAI client for OPENAI_API_KEY"""
     if OpenAI is None:
         raise LLMError("openai SDK not installed. pip install openai>=1.0.0")
-    
-    # Validate input parameters
-    if user is None and user_messages is None:
-        raise ValueError("Either 'user' or 'user_messages' must be provided")
-    if user is not None and user_messages is not None:
-        raise ValueError("Cannot provide both 'user' and 'user_messages'")
-    
-    # Use provided client or create new one
-    if client is None:
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            raise LLMError("OPENAI_API_KEY environment variable is required but not set. Please set it with your OpenAI API key.")
-        client = OpenAI(api_key=api_key)
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise LLMError("OPENAI_API_KEY environment variable is required but not set. Please set it with your OpenAI API key.")
+    return _cached_client(api_key)
+
+def _build_messages(system: Optional[str], user: Optional[str], user_messages: Optional[List[str]]) -> List[Dict[str, str]]:
+    messages = [{"role": "system", "content": system or DEFAULT_SYSTEM}]
+
+    if user is not None:
+        # Single user message (backward compatibility)
+        messages.append({"role": "user", "content": user})
+    else:
+        # Multiple user messages (new multi-message pattern)
+        for user_msg in user_messages:
+            messages.append({"role": "user", "content": user_msg})
+    return messages
+
+def _build_create_args(model: str, messages: List[Dict[str, str]], temperature: Optional[float]) -> Dict[str, Any]:
+    create_args = {
+        "model": model,
+        "response_format": {"type": "json_object"},
+        "messages": messages,
+    }
+    cache_key = _prompt_cache_key(messages[0]["content"])
+    if cache_key:
+        create_args["prompt_cache_key"] = cache_key
+    # gpt-5-mini only supports temperature=1
+    if "gpt-5-mini" in (model or "").lower():
+        create_args["temperature"] = 1.0
+    elif temperature is not None:
+        create_args["temperature"] = temperature
+    return create_args
+
+def _token_usage(usage: Any) -> Dict[str, int]:
+    # SDK usage objects, or plain dicts from Batch API output files
+    get = dict.get if isinstance(usage, dict) else getattr
+    token_usage = {
+        'prompt_tokens': get(usage, 'prompt_tokens', 0),
+        'completion_tokens': get(usage, 'completion_tokens', 0),
+        'total_tokens': get(usage, 'total_tokens', 0),
+    }
+    # Add cached tokens if available (for cached input optimization)
+    cached = 0
+    details = get(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        cached = details.get("cached_tokens", 0)
+    elif details is not None:
+        cached = getattr(details, "cached_tokens", 0)
+    token_usage['cached_tokens'] = cached
+    return token_usage
+
+# Exponential backoff with jitter: min(BACKOFF_MAX, BACKOFF_INITIAL * 2**n + jitter)
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+BACKOFF_JITTER = 1.0
+# Ceiling on a server-requested wait: reset headers can name a daily bucket
+# ("1h"), which must not park a worker for that long
+RETRY_AFTER_MAX = 60.0
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse '12', '1.5s', '20ms' or '6m0s' style header values into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+def _retry_after(err: Exception) -> Optional[float]:
+    """
+    Server-requested wait in seconds for a rate-limit error, else None
+
+    Retry-After(-ms) wins; the x-ratelimit-reset-* headers (time until the
+    whole bucket refills, sent on every response) are only a fallback for 429s.
+    """
+    if RateLimitError is None or not isinstance(err, RateLimitError):
+        return None
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    ms = _parse_duration(headers.get("retry-after-ms"))
+    if ms is not None:
+        return ms / 1000.0
+    for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        seconds = _parse_duration(headers.get(header))
+        if seconds is not None:
+            return seconds
+    return None
+
+def _is_retryable(err: Exception) -> bool:
+    """Rate limits, timeouts and server errors are retried; bad requests and bad JSON are not"""
+    if isinstance(err, json.JSONDecodeError):
+        return False
+    if BadRequestError is not None and isinstance(err, BadRequestError):
+        return False
+    if RateLimitError is not None and isinstance(err, RateLimitError):
+        return True
+    if APIStatusError is not None and isinstance(err, APIStatusError):
+        return err.status_code in (408, 409) or err.status_code >= 500
+    return True
+
+def _backoff_delay(attempt: int, err: Exception) -> float:
+    delay = min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** (attempt - 1) + random.uniform(0, BACKOFF_JITTER))
+    retry_after = _retry_after(err)
+    if retry_after is not None:
+        delay = min(RETRY_AFTER_MAX, max(delay, retry_after))
+    return delay
+
+# Escalations from the primary model to model_large (read via get_escalation_stats)
+_escalation_lock = threading.Lock()
+_escalation_stats = {"calls": 0, "escalations": 0}
+
+def get_escalation_stats() -> Dict[str, int]:
+    with _escalation_lock:
+        return dict(_escalation_stats)
+
+def _needs_escalation(result: Dict[str, Any], escalate_below: float) -> bool:
+    """Low confidence or an 'ambiguous' disposition goes to the larger model"""
+    if (result.get("disposition") or "").lower() == "ambiguous":
+        return True
+    try:
+        confidence = float(result.get("confidence"))
+    except (TypeError, ValueError):
+        return False
+    return confidence < escalate_below
+
+def _merge_token_usage(first: Optional[Dict[str, int]], second: Optional[Dict[str, int]]) -> Optional[Dict[str, int]]:
+    if not first or not second:
+        return second or first
+    return {k: first.get(k, 0) + second.get(k, 0) for k in {**first, **second}}
+
+# Response cache: identical requests (model, messages, temperature) are answered
+# once per run. An SQLite file (set_response_cache_path, else EVIDENCE_LLM_CACHE)
+# persists it across runs.
+RESPONSE_CACHE_SIZE = 50_000
+_response_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+_response_cache_db: Optional[sqlite3.Connection] = None
+_response_cache_path: Optional[str] = None
+_response_cache_stats = {"hits": 0, "misses": 0}
+
+@lru_cache(maxsize=32)
+def _system_digest(system: str) -> str:
+    # System prompts are a handful of long, reused (interned) strings, so each
+    # is hashed once rather than re-serialized into every request key
+    return hashlib.blake2b(system.encode("utf-8"), digest_size=16).hexdigest()
+
+# OpenAI caches prompt prefixes automatically once they reach this many tokens;
+# shorter system prompts are not worth a routing key
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+@lru_cache(maxsize=32)
+def _prompt_cache_key(system: str) -> Optional[str]:
+    """
+    prompt_cache_key for requests sharing this system prompt, or None if it is too short
+
+    The static instructions and ontology listings sit first in the system
+    message, so every request with the same system shares a cacheable prefix;
+    the key routes them to the same provider cache. Tokens are estimated at
+    ~4 characters each, as in the prompt token estimates.
+    """
+    if len(system) // 4 < PROMPT_CACHE_MIN_TOKENS:
+        return None
+    return _system_digest(system)
+
+def _request_key(create_args: Dict[str, Any]) -> bytes:
+    system_message, *user_messages = create_args["messages"]
+    keyed_args = dict(create_args, messages=[_system_digest(system_message["content"]), *user_messages])
+    # Derived from the system prompt, which is already keyed
+    keyed_args.pop("prompt_cache_key", None)
+    payload = json.dumps(keyed_args, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+def set_response_cache_path(path: Optional[Union[str, Path]]) -> None:
+    """
+    Persist LLM responses in the SQLite file at path, so reruns skip calls already made
+
+    Takes precedence over EVIDENCE_LLM_CACHE; None falls back to it.
+    """
+    global _response_cache_db, _response_cache_path
+    with _response_cache_lock:
+        if _response_cache_db is not None:
+            _response_cache_db.close()
+            _response_cache_db = None
+        _response_cache_path = str(path) if path else None
+
+def _response_db() -> Optional[sqlite3.Connection]:
+    """Persistent cache connection (opened once); None when no cache file is configured"""
+    global _response_cache_db
+    path = _response_cache_path or os.environ.get("EVIDENCE_LLM_CACHE")
+    if path and _response_cache_db is None:
+        _response_cache_db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        _response_cache_db.execute("PRAGMA journal_mode=WAL")
+        _response_cache_db.execute("CREATE TABLE IF NOT EXISTS llm_response (key BLOB PRIMARY KEY, result TEXT NOT NULL)")
+    return _response_cache_db
+
+def _cache_get(key: bytes) -> Optional[Dict[str, Any]]:
+    with _response_cache_lock:
+        text = _response_cache.get(key)
+        if text is not None:
+            _response_cache.move_to_end(key)
+        else:
+            db = _response_db()
+            row = db.execute("SELECT result FROM llm_response WHERE key = ?", (key,)).fetchone() if db else None
+            if row is not None:
+                text = row[0]
+                _cache_remember(key, text)
+        _response_cache_stats["hits" if text is not None else "misses"] += 1
+    # Fresh dict per hit: callers annotate and pop keys on results
+    return json.loads(text) if text is not None else None
+
+def _cache_remember(key: bytes, text: str) -> None:
+    _response_cache[key] = text
+    if len(_response_cache) > RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+def _cache_put(key: bytes, result: Dict[str, Any]) -> None:
+    # Token usage belongs to the call that paid for it, not to later cache hits
+    text = json.dumps({k: v for k, v in result.items() if k != '_token_usage'}, ensure_ascii=False)
+    with _response_cache_lock:
+        _cache_remember(key, text)
+        db = _response_db()
+        if db is not None:
+            db.execute("INSERT OR REPLACE INTO llm_response (key, result) VALUES (?, ?)", (key, text))
+
+def get_response_cache_stats() -> Dict[str, int]:
+    with _response_cache_lock:
+        return dict(_response_cache_stats, size=len(_response_cache))
+
+def _complete(client: OpenAI, create_args: Dict[str, Any], max_retries: int, use_cache: bool = True) -> Dict[str, Any]:
+    if use_cache:
+        key = _request_key(create_args)
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+        result = _complete(client, create_args, max_retries, use_cache=False)
+        _cache_put(key, result)
+        return result
+
     last_err: Optional[Exception] = None
     for attempt in range(1, max_retries+1):
         try:
-            # Build messages list
-            messages = [{"role": "system", "content": system or DEFAULT_SYSTEM}]
-            
-            if user is not None:
-                # Single user message (backward compatibility)
-                messages.append({"role": "user", "content": user})
-            else:
-                # Multiple user messages (new multi-message pattern)
-                for user_msg in user_messages:
-                    messages.append({"role": "user", "content": user_msg})
-            
-            create_args = {
-                "model": model,
-                "response_format": {"type": "json_object"},
-                "messages": messages,
-            }
-            # gpt-5-mini only supports temperature=1
-            if "gpt-5-mini" in (model or "").lower():
-                create_args["temperature"] = 1.0
-            elif temperature is not None:
-                create_args["temperature"] = temperature
             resp = client.chat.completions.create(**create_args)
             content = resp.choices[0].message.content or "{}"
             result = json.loads(content)
-            
+
             # Add token usage to result for tracking
             if hasattr(resp, 'usage') and resp.usage:
-                usage = resp.usage
-                token_usage = {
-                    'prompt_tokens': getattr(usage, 'prompt_tokens', 0),
-                    'completion_tokens': getattr(usage, 'completion_tokens', 0),
-                    'total_tokens': getattr(usage, 'total_tokens', 0),
-                }
-                # Add cached tokens if available (for cached input optimization)
-                cached = 0
-                details = getattr(usage, "prompt_tokens_details", None)
-                if isinstance(details, dict):
-                    cached = details.get("cached_tokens", 0)
-                elif details is not None:
-                    cached = getattr(details, "cached_tokens", 0)
-                token_usage['cached_tokens'] = cached
-                result['_token_usage'] = token_usage
-            
+                result['_token_usage'] = _token_usage(resp.usage)
+
             return result
         except Exception as e:
             last_err = e
-            time.sleep(0.5 * attempt + random.random() * 0.25)
+            if not _is_retryable(e):
+                raise LLMError(f"LLM request failed: {e}") from e
+            if attempt < max_retries:
+                time.sleep(_backoff_delay(attempt, e))
+    raise LLMError(f"LLM failed after {max_retries} attempts: {last_err}")
+
+def call_llm(*, model: str, system: str, user: str = None, user_messages: List[str] = None, max_retries: int = 3, temperature: Optional[float] = None, client: OpenAI = None, model_large: Optional[str] = None, escalate_below: float = 0.7, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Run one JSON-mode chat completion
+
+    Identical requests are served from the response cache unless use_cache is
+    False (cache hits carry no '_token_usage').
+
+    When model_large is given, `model` acts as the small first-pass model and
+    results with confidence < escalate_below or disposition 'ambiguous' are
+    re-issued to model_large with the same messages. Escalated results carry
+    '_escalated_from' and their token usage covers both calls.
+    """
+    if OpenAI is None:
+        raise LLMError("openai SDK not installed. pip install openai>=1.0.0")
+
+    # Validate input parameters
+    if user is None and user_messages is None:
+        raise ValueError("Either 'user' or 'user_messages' must be provided")
+    if user is not None and user_messages is not None:
+        raise ValueError("Cannot provide both 'user' and 'user_messages'")
+
+    # Use provided client or the shared per-process one
+    if client is None:
+        client = get_client()
+    messages = _build_messages(system, user, user_messages)
+    result = _complete(client, _build_create_args(model, messages, temperature), max_retries, use_cache)
+    if not model_large or model_large == model:
+        return result
+
+    escalate = _needs_escalation(result, escalate_below)
+    with _escalation_lock:
+        _escalation_stats["calls"] += 1
+        if escalate:
+            _escalation_stats["escalations"] += 1
+    if not escalate:
+        return result
+
+    large = _complete(client, _build_create_args(model_large, messages, temperature), max_retries, use_cache)
+    usage = _merge_token_usage(result.get('_token_usage'), large.get('_token_usage'))
+    if usage:
+        large['_token_usage'] = usage
+    large['_escalated_from'] = model
+    return large
+
+def _stream_completion(client: OpenAI, create_args: Dict[str, Any], on_item: Optional[Callable[[str, Any], None]]) -> Dict[str, Any]:
+    """Consume one streamed completion, emitting top-level keys as they close"""
+    buf = bytearray()
+    usage = None
+    emitted = set()
+    events = coro = None
+    if on_item is not None and ijson is not None:
+        events = ijson.sendable_list()
+        coro = ijson.kvitems_coro(events, '', use_float=True)
+
+    stream = client.chat.completions.create(**create_args, stream=True, stream_options={"include_usage": True})
+    for chunk in stream:
+        if getattr(chunk, 'usage', None):
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        data = delta.encode("utf-8")
+        buf.extend(data)
+        if coro is not None:
+            try:
+                coro.send(data)
+            except ijson.JSONError:
+                # Let the full parse below report the error
+                coro = None
+            else:
+                for key, value in events:
+                    emitted.add(key)
+                    on_item(key, value)
+                del events[:]
+
+    # Authoritative parse of the whole object (also covers the no-ijson case)
+    result = json.loads(buf.decode("utf-8") or "{}")
+    if on_item is not None:
+        for key, value in result.items():
+            if key not in emitted:
+                on_item(key, value)
+    if usage:
+        result['_token_usage'] = _token_usage(usage)
+    return result
+
+def stream_call_llm(*, model: str, system: str, user: str = None, user_messages: List[str] = None, max_retries: int = 3, temperature: Optional[float] = None, client: OpenAI = None, on_item: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Streaming variant of call_llm
+
+    Tokens are consumed as they arrive and, when ijson is installed, each
+    top-level key of the JSON object is passed to on_item(key, value) as soon as
+    its value closes, so callers can start processing before decode finishes.
+
+    Returns:
+        The fully parsed result, same shape as call_llm
+    """
+    if OpenAI is None:
+        raise LLMError("openai SDK not installed. pip install openai>=1.0.0")
+    if user is None and user_messages is None:
+        raise ValueError("Either 'user' or 'user_messages' must be provided")
+    if user is not None and user_messages is not None:
+        raise ValueError("Cannot provide both 'user' and 'user_messages'")
+
+    if client is None:
+        client = get_client()
+    create_args = _build_create_args(model, _build_messages(system, user, user_messages), temperature)
+
+    emitted = False
+    def _on_item(key: str, value: Any) -> None:
+        nonlocal emitted
+        emitted = True
+        on_item(key, value)
+
+    last_err: Optional[Exception] = None
+    for attempt in range(1, max_retries+1):
+        try:
+            return _stream_completion(client, create_args, _on_item if on_item else None)
+        except Exception as e:
+            last_err = e
+            # Once partial keys have been handed out a retry would emit them twice
+            if emitted or not _is_retryable(e):
+                raise LLMError(f"LLM request failed: {e}") from e
+            if attempt < max_retries:
+                time.sleep(_backoff_delay(attempt, e))
     raise LLMError(f"LLM failed after {max_retries} attempts: {last_err}")
+
+async def acall_llm(**kwargs: Any) -> Dict[str, Any]:
+    """Async variant of call_llm; runs the blocking SDK call in a worker thread"""
+    return await asyncio.to_thread(call_llm, **kwargs)
+
+def call_llm_batch(requests: Iterable[Dict[str, Any]], max_workers: int = 8) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Issue several call_llm requests concurrently
+
+    Args:
+        requests: call_llm keyword arguments, one dict per request. May be a
+            generator: each request is submitted as soon as it is produced, so
+            building later prompts overlaps the calls already in flight
+        max_workers: Maximum number of in-flight requests
+
+    Returns:
+        Results in request order; a failed request yields its exception in place
+        so one bad item does not discard the rest of the batch
+    """
+    return list(iter_llm_batch(requests, max_workers))
+
+def iter_llm_batch(requests: Iterable[Dict[str, Any]], max_workers: int = 8) -> Iterator[Union[Dict[str, Any], Exception]]:
+    """
+    call_llm_batch, yielding each result as soon as it and every earlier one is done
+
+    Lets callers persist answers while later calls are still in flight.
+    """
+    def _run(kwargs: Dict[str, Any]) -> Union[Dict[str, Any], Exception]:
+        try:
+            return call_llm(**kwargs)
+        except Exception as e:
+            return e
+
+    if isinstance(requests, list):
+        if not requests:
+            return
+        max_workers = min(max_workers, len(requests))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(_run, kwargs) for kwargs in requests]
+        for f in futures:
+            yield f.result()
+
+# Batch API job states after which no more results will arrive
+_BATCH_DONE = frozenset({"completed", "failed", "expired", "cancelled"})
+
+def _batch_result(record: Dict[str, Any]) -> Union[Dict[str, Any], Exception]:
+    """call_llm-style result (or LLMError) from one Batch API output/error file line"""
+    response = record.get("response") or {}
+    body = response.get("body") or {}
+    if record.get("error") or response.get("status_code") != 200:
+        return LLMError(f"LLM request failed: {record.get('error') or body.get('error')}")
+    try:
+        result = json.loads(body["choices"][0]["message"].get("content") or "{}")
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return LLMError(f"LLM request failed: unreadable batch response ({e})")
+    if body.get("usage"):
+        result['_token_usage'] = _token_usage(body["usage"])
+    return result
+
+def call_llm_offline(requests: Iterable[Dict[str, Any]], work_path: Path, poll_interval: float = 60.0,
+                     client: OpenAI = None, use_cache: bool = True) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Run call_llm requests as one OpenAI Batch API job (half the price, results within 24h)
+
+    For offline runs with no latency budget. Blocks until the job finishes,
+    polling every poll_interval seconds.
+
+    Args:
+        requests: call_llm keyword arguments (model, system, user or
+            user_messages, temperature), one dict per request. Requests already
+            in the response cache are answered from it and not submitted
+        work_path: Where the submitted JSONL is written (kept for inspection)
+        poll_interval: Seconds between job status checks
+
+    Returns:
+        Results in request order, like call_llm_batch; a request that failed or
+        got no answer yields an LLMError in its place
+    """
+    if OpenAI is None:
+        raise LLMError("openai SDK not installed. pip install openai>=1.0.0")
+    if client is None:
+        client = get_client()
+
+    results: List[Optional[Union[Dict[str, Any], Exception]]] = []
+    # cache key → (custom_id, indexes of the requests it answers); identical
+    # requests are submitted once
+    submitted: Dict[bytes, Tuple[str, List[int]]] = {}
+    lines = []
+    for i, kwargs in enumerate(requests):
+        messages = _build_messages(kwargs.get('system'), kwargs.get('user'), kwargs.get('user_messages'))
+        create_args = _build_create_args(kwargs['model'], messages, kwargs.get('temperature'))
+        key = _request_key(create_args)
+        results.append(_cache_get(key) if use_cache and key not in submitted else None)
+        if results[i] is not None:
+            continue
+        if key in submitted:
+            submitted[key][1].append(i)
+            continue
+        submitted[key] = (str(i), [i])
+        lines.append(json.dumps({"custom_id": str(i), "method": "POST", "url": "/v1/chat/completions",
+                                 "body": create_args}, ensure_ascii=False))
+    if not lines:
+        return results
+
+    work_path = Path(work_path)
+    work_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    with work_path.open("rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions",
+                                  completion_window="24h")
+    while batch.status not in _BATCH_DONE:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+
+    by_custom_id = {custom_id: (key, indexes) for key, (custom_id, indexes) in submitted.items()}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            entry = by_custom_id.get(record.get("custom_id"))
+            if entry is None:
+                continue
+            key, indexes = entry
+            result = _batch_result(record)
+            if use_cache and not isinstance(result, Exception):
+                _cache_put(key, result)
+            results[indexes[0]] = result
+            for i in indexes[1:]:
+                # Duplicates get a fresh dict, without the token usage only the first paid for
+                results[i] = result if isinstance(result, Exception) else json.loads(
+                    json.dumps({k: v for k, v in result.items() if k != '_token_usage'}))
+
+    for custom_id, (_, indexes) in by_custom_id.items():
+        for i in indexes:
+            if results[i] is None:
+                results[i] = LLMError(f"Batch {batch.id} ({batch.status}) returned no result for request {custom_id}")
+    return results
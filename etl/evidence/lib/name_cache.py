@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Normalized Food-Name Response Cache
+
+FDC lists the same food under names that differ only in case, spacing or
+punctuation ("Apple, raw" / "APPLE,  RAW"). Tier 1 and Tier 2 answers are
+cached per (tier, normalized name, context) so those repeats skip the LLM.
+Byte-identical prompts are already caught by llm.py's request-hash cache;
+this layer catches the near-duplicates that hash differently.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_food_name(name: Any) -> str:
+    """Case-, spacing- and punctuation-insensitive form of a food name"""
+    return " ".join(_NON_WORD.sub(" ", str(name or "").casefold()).split())
+
+class NameCache:
+    """Thread-safe, bounded LRU of LLM answers keyed by normalized food name"""
+
+    def __init__(self, max_entries: int = 50_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(food_name: str, tier: int, context: Tuple[Hashable, ...]) -> Tuple[Hashable, ...]:
+        return (tier, normalize_food_name(food_name), *context)
+
+    def lookup(self, food_name: str, tier: int, *context: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Cached answer for food_name at tier, or None
+
+        context holds whatever else the answer depends on (e.g. the normalized
+        description for Tier 1, the taxon ID for Tier 2).
+        """
+        key = self._key(food_name, tier, context)
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers read and annotate results, so each hit gets its own dict
+        return dict(response)
+
+    def store(self, food_name: str, tier: int, response: Dict[str, Any], *context: Hashable) -> None:
+        """Remember an LLM answer (without its token usage) for food_name at tier"""
+        key = self._key(food_name, tier, context)
+        entry = {k: v for k, v in response.items() if k != '_token_usage'}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
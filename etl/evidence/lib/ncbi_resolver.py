@@ -23,14 +23,91 @@ class NCBIResolution:
     needs_refinement: bool
     reason: str
 
+# Row layout shared by the preloaded indexes:
+# (taxid, name, kingdom, phylum, class, order_name, family, genus, species, lineage_json)
+_PRELOAD_SQL = """
+    SELECT l.taxid, n.name_txt, l.kingdom, l.phylum, l.class, l.order_name,
+           l.family, l.genus, l.species, l.lineage_json
+    FROM ncbi_names n
+    JOIN ncbi_lineage l USING(taxid)
+    WHERE n.name_class = 'scientific name'
+    ORDER BY l.taxid
+"""
+
+_PRELOAD_NAMES_SQL = """
+    SELECT taxid, name_txt FROM ncbi_names
+    WHERE name_class = 'scientific name'
+"""
+
 class NCBIResolver:
     """NCBI-based taxon resolver for evidence mapping"""
     
-    def __init__(self, ncbi_db_path: Path):
-        """Initialize with path to NCBI SQLite database"""
+    def __init__(self, ncbi_db_path: Path, preload: bool = False, read_only: bool = False):
+        """
+        Initialize with path to NCBI SQLite database
+        
+        Args:
+            ncbi_db_path: Path to the NCBI SQLite database
+            preload: Read the scientific name → lineage table into memory once so
+                exact/genus lookups become dict hits instead of per-call SQL
+            read_only: Open the database with mode=ro (safe to share across processes)
+        """
         self.ncbi_db_path = ncbi_db_path
+        self.read_only = read_only
         if not ncbi_db_path.exists():
             raise FileNotFoundError(f"NCBI database not found: {ncbi_db_path}")
+        
+        self.preloaded = False
+        self._species_index: Dict[str, Tuple] = {}
+        self._genus_index: Dict[str, Tuple] = {}
+        self._name_by_taxid: Dict[int, str] = {}
+        if preload:
+            self._preload()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            return sqlite3.connect(f"{self.ncbi_db_path.resolve().as_uri()}?mode=ro", uri=True)
+        return sqlite3.connect(str(self.ncbi_db_path))
+    
+    def _preload(self) -> None:
+        """Build in-memory name → lineage indexes from a single table scan"""
+        species_index: Dict[str, Tuple] = {}
+        genus_index: Dict[str, Tuple] = {}
+        name_by_taxid: Dict[int, str] = {}
+        
+        with self._connect() as conn:
+            for row in conn.execute(_PRELOAD_SQL):
+                name = row[1]
+                species_index.setdefault(name, row)
+                # Lowest taxid whose name carries the genus token wins, matching the
+                # ORDER BY taxid LIMIT 1 semantics of the FTS genus lookup
+                genus_key = name.split(' ', 1)[0].lower()
+                genus_index.setdefault(genus_key, row)
+            
+            # Lineage ranks reference taxids that may have no lineage row of their own
+            for taxid, name in conn.execute(_PRELOAD_NAMES_SQL):
+                name_by_taxid.setdefault(taxid, name)
+        
+        self._species_index = species_index
+        self._genus_index = genus_index
+        self._name_by_taxid = name_by_taxid
+        self.preloaded = True
+    
+    @staticmethod
+    def _match_from_row(row: Tuple) -> Dict[str, Any]:
+        """Convert a preloaded index row into the match dict used by _create_resolution"""
+        return {
+            'taxid': row[0],
+            'name': row[1],
+            'kingdom': row[2],
+            'phylum': row[3],
+            'class': row[4],
+            'order': row[5],
+            'family': row[6],
+            'genus': row[7],
+            'species': row[8],
+            'lineage_json': row[9]
+        }
     
     def resolve_taxon(self, taxon_id: str, verbose: bool = False) -> NCBIResolution:
         """
@@ -69,7 +146,13 @@ class NCBIResolver:
         genus = segments[2] if len(segments) > 2 else None
         species = segments[3] if len(segments) > 3 else None
         
-        with sqlite3.connect(str(self.ncbi_db_path)) as conn:
+        # Preloaded exact matches never need a database round trip
+        if self.preloaded:
+            exact_match = self._find_exact_match(None, genus, species)
+            if exact_match:
+                return self._create_resolution(taxon_id, exact_match, confidence=0.9, reason="Exact NCBI match")
+        
+        with self._connect() as conn:
             # Try to find exact match first
             exact_match = self._find_exact_match(conn, genus, species)
             if exact_match:
@@ -100,6 +183,10 @@ class NCBIResolver:
         if not genus or not species:
             return None
         
+        if self.preloaded:
+            row = self._species_index.get(f"{genus} {species}")
+            return self._match_from_row(row) if row else None
+        
         cursor = conn.cursor()
         # First find the taxon ID for the species name
         cursor.execute("""
@@ -204,6 +291,10 @@ class NCBIResolver:
         if not genus:
             return None
         
+        if self.preloaded:
+            row = self._genus_index.get(genus.lower())
+            return self._match_from_row(row) if row else None
+        
         cursor = conn.cursor()
         # Search for genus using FTS5
         cursor.execute("""
@@ -272,7 +363,15 @@ class NCBIResolver:
         """Resolve taxon IDs in lineage to actual names"""
         resolved = {}
         
-        with sqlite3.connect(str(self.ncbi_db_path)) as conn:
+        if self.preloaded:
+            for rank, taxon_id in lineage.items():
+                if taxon_id and taxon_id.isdigit():
+                    resolved[rank] = self._name_by_taxid.get(int(taxon_id), taxon_id)
+                else:
+                    resolved[rank] = taxon_id
+            return resolved
+        
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             for rank, taxon_id in lineage.items():
@@ -8,11 +8,25 @@ Handles unit conversions, stores both original and converted values, and flags u
 
 from __future__ import annotations
 import json
+import os
+import sys
+import tempfile
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+from dataclasses import asdict, dataclass
+try:
+    import ijson
+except ImportError:
+    ijson = None
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
 
-@dataclass
+# Slotted dataclasses drop the per-instance __dict__ (slots= needs Python 3.10+)
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_SLOTS)
 class NutrientMapping:
     """FDC to INFOODS nutrient mapping"""
     fdc_id: str
@@ -24,14 +38,14 @@ class NutrientMapping:
     nutrient_name: str
     class_: str
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class MappedNutrient:
     """Result of mapping a single FDC nutrient"""
     mapped: bool
     nutrient_row: Optional[Any] = None  # NutrientRow object
     unmapped_info: Optional[UnmappedNutrientInfo] = None
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class UnmappedNutrientInfo:
     """Information about an unmapped nutrient"""
     fdc_id: str
@@ -43,25 +57,84 @@ class UnmappedNutrientInfo:
 class NutrientMapper:
     """Comprehensive FDC-to-INFOODS nutrient mapping system"""
     
-    def __init__(self, nutrients_json_path: Path):
-        """Initialize with nutrients.json path"""
+    def __init__(self, nutrients_json_path: Path, unmapped_path: Optional[Path] = None):
+        """
+        Initialize with nutrients.json path
+        
+        Unmapped nutrients are appended to unmapped_path as NDJSON instead of
+        being held in memory; without a path a temporary file is used and
+        removed on close(). A given unmapped_path is truncated here, so it only
+        ever holds this mapper's rows.
+        """
         self.nutrients_json_path = nutrients_json_path
-        self.nutrients_data = self._load_nutrients()
+        self.nutrients_version = 'unknown'
+        self._infoods_ids: Set[str] = set()
         self.fdc_to_infoods_mapping = self._build_fdc_to_infoods_mapping()
-        self.unmapped_nutrients: List[UnmappedNutrientInfo] = []
+        self.unmapped_path = unmapped_path
+        if unmapped_path is not None:
+            open(unmapped_path, 'w').close()
+        self.unmapped_count = 0
+        self._unmapped_writer = None
+        self._unmapped_is_temp = False
+        self._lookup_frame = None
+    
+    def record_unmapped(self, info: UnmappedNutrientInfo) -> None:
+        """Append one unmapped nutrient to the NDJSON spill file (opened lazily)"""
+        if self._unmapped_writer is None:
+            if self.unmapped_path is None:
+                fd, name = tempfile.mkstemp(prefix='unmapped_nutrients_', suffix='.jsonl')
+                os.close(fd)
+                self.unmapped_path = Path(name)
+                self._unmapped_is_temp = True
+            self._unmapped_writer = open(self.unmapped_path, 'a', encoding='utf-8')
+        self._unmapped_writer.write(json.dumps(asdict(info), ensure_ascii=False) + '\n')
+        self.unmapped_count += 1
+    
+    def close(self) -> None:
+        """Flush and close the unmapped spill file (deleting it if temporary)"""
+        if self._unmapped_writer is not None:
+            self._unmapped_writer.close()
+            self._unmapped_writer = None
+        if self._unmapped_is_temp and self.unmapped_path is not None:
+            self.unmapped_path.unlink(missing_ok=True)
+            self.unmapped_path = None
+            self._unmapped_is_temp = False
+            self.unmapped_count = 0
+    
+    def __enter__(self) -> NutrientMapper:
+        return self
     
-    def _load_nutrients(self) -> Dict[str, Any]:
-        """Load nutrients.json data"""
-        with open(self.nutrients_json_path, 'r') as f:
-            return json.load(f)
+    def __exit__(self, *exc) -> None:
+        self.close()
+    
+    def _iter_nutrients(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield nutrient entries from nutrients.json
+        
+        Streams with ijson when available so the raw catalog is never held in
+        memory alongside the mapping; falls back to json.load otherwise.
+        """
+        if ijson is None:
+            with open(self.nutrients_json_path, 'r') as f:
+                data = json.load(f)
+            self.nutrients_version = data.get('version', 'unknown')
+            yield from data['nutrients']
+            return
+        
+        with open(self.nutrients_json_path, 'rb') as f:
+            # "version" precedes "nutrients", so this stops after a short prefix scan
+            self.nutrients_version = next(ijson.items(f, 'version'), 'unknown')
+            f.seek(0)
+            yield from ijson.items(f, 'nutrients.item', use_float=True)
     
     def _build_fdc_to_infoods_mapping(self) -> Dict[str, NutrientMapping]:
         """Build comprehensive FDC to INFOODS mapping from nutrients.json"""
         mapping = {}
         
-        for nutrient in self.nutrients_data['nutrients']:
+        for nutrient in self._iter_nutrients():
             infoods_id = nutrient['id']
-            infoods_unit = nutrient['unit']
+            self._infoods_ids.add(infoods_id)
+            infoods_unit = sys.intern(nutrient['unit'])
             fdc_unit = nutrient.get('fdc_unit', '')
             conversion_factor = nutrient.get('unit_factor_from_fdc', 1.0)
             confidence = nutrient.get('confidence', 'medium')
@@ -98,7 +171,10 @@ class NutrientMapper:
         except (ValueError, TypeError):
             amount = 0.0
             
+        # Interned: the same few unit strings repeat across every row
         unit = fdc_nutrient.get('unit', 'g')
+        if type(unit) is str:
+            unit = sys.intern(unit)
         
         # Check if we have a mapping for this FDC nutrient ID
         if fdc_id in self.fdc_to_infoods_mapping:
@@ -109,7 +185,7 @@ class NutrientMapper:
             
             # Create nutrient row data (will be converted to NutrientRow by caller)
             nutrient_row_data = {
-                'id': f"{food_id}_{mapping.infoods_id}",
+                'id': str(food_id) + "_" + mapping.infoods_id,
                 'food_id': food_id,
                 'nutrient_id': mapping.infoods_id,
                 'amount': converted_amount,
@@ -120,7 +196,7 @@ class NutrientMapper:
                 'conversion_factor': mapping.conversion_factor,
                 'source': 'fdc_foundation',
                 'confidence': 0.9 if mapping.confidence == 'high' else 0.7,
-                'notes': f"FDC nutrient: {fdc_id} -> {mapping.infoods_id}",
+                'notes': "FDC nutrient: " + fdc_id + " -> " + mapping.infoods_id,
                 'nutrient_name': mapping.nutrient_name,
                 'nutrient_class': mapping.class_
             }
@@ -135,18 +211,95 @@ class NutrientMapper:
                 food_id=food_id,
                 amount=amount
             )
-            self.unmapped_nutrients.append(unmapped_info)
+            self.record_unmapped(unmapped_info)
             
             return MappedNutrient(mapped=False, unmapped_info=unmapped_info)
     
-    def get_unmapped_nutrients(self) -> List[UnmappedNutrientInfo]:
-        """Get all unmapped nutrients for manual curation"""
-        return self.unmapped_nutrients
+    def _get_lookup_frame(self) -> "pd.DataFrame":
+        """FDC-id-indexed lookup table for vectorized mapping (built on first use)"""
+        if self._lookup_frame is None:
+            mappings = list(self.fdc_to_infoods_mapping.values())
+            self._lookup_frame = pd.DataFrame(
+                {
+                    'infoods_id': [m.infoods_id for m in mappings],
+                    'infoods_unit': [m.infoods_unit for m in mappings],
+                    'conversion_factor': [float(m.conversion_factor) for m in mappings],
+                    'confidence': [0.9 if m.confidence == 'high' else 0.7 for m in mappings],
+                    'nutrient_name': [m.nutrient_name for m in mappings],
+                    'nutrient_class': [m.class_ for m in mappings],
+                },
+                index=pd.Index([m.fdc_id for m in mappings], name='fdc_nutrient_id'),
+            )
+        return self._lookup_frame
+    
+    def map_fdc_nutrients_df(self, df: "pd.DataFrame") -> "pd.DataFrame":
+        """
+        Vectorized map_fdc_nutrient over a DataFrame of FDC nutrient rows
+        
+        Expects 'nutrient_id' and 'amount' columns plus 'fdc_id' or 'food_id';
+        'unit' and 'name' are optional. Returns one row per input row with the
+        nutrient_row columns and a boolean 'mapped' column. Unmapped rows are
+        recorded like map_fdc_nutrient does, so out[~out.mapped] is for review.
+        """
+        if pd is None:
+            raise ImportError("pandas is required for map_fdc_nutrients_df. pip install pandas")
+        
+        lookup = self._get_lookup_frame()
+        fdc_ids = df['nutrient_id'].astype(str)
+        food_col = 'fdc_id' if 'fdc_id' in df.columns else 'food_id'
+        food_ids = df[food_col].astype(str)
+        amount = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0).astype(float)
+        unit = df['unit'] if 'unit' in df.columns else pd.Series('g', index=df.index)
+        
+        matched = lookup.reindex(fdc_ids.to_numpy())
+        matched.index = df.index
+        mapped = matched['infoods_id'].notna()
+        conversion = matched['conversion_factor'].where(mapped, 1.0)
+        
+        out = pd.DataFrame({
+            'id': food_ids + '_' + matched['infoods_id'],
+            'food_id': food_ids,
+            'nutrient_id': matched['infoods_id'],
+            'amount': amount * conversion,
+            'unit': matched['infoods_unit'],
+            'original_amount': amount,
+            'original_unit': unit,
+            'original_nutrient_id': fdc_ids,
+            'conversion_factor': conversion,
+            'source': 'fdc_foundation',
+            'confidence': matched['confidence'],
+            'notes': 'FDC nutrient: ' + fdc_ids + ' -> ' + matched['infoods_id'],
+            'nutrient_name': matched['nutrient_name'],
+            'nutrient_class': matched['nutrient_class'],
+            'mapped': mapped,
+        }, index=df.index)
+        
+        if not mapped.all():
+            unmapped = ~mapped
+            names = df['name'].astype(str) if 'name' in df.columns else 'FDC_' + fdc_ids
+            for fdc_id, food_id, name, u, a in zip(fdc_ids[unmapped], food_ids[unmapped], names[unmapped],
+                                                   unit[unmapped], amount[unmapped]):
+                self.record_unmapped(UnmappedNutrientInfo(
+                    fdc_id=fdc_id, fdc_name=name, fdc_unit=u, food_id=food_id, amount=float(a)
+                ))
+        
+        return out
+    
+    def get_unmapped_nutrients(self) -> Iterator[UnmappedNutrientInfo]:
+        """Stream all unmapped nutrients recorded so far back from the spill file"""
+        if self._unmapped_writer is not None:
+            self._unmapped_writer.flush()
+        if self.unmapped_path is None or not self.unmapped_path.exists():
+            return
+        with open(self.unmapped_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield UnmappedNutrientInfo(**json.loads(line))
     
     def get_mapping_stats(self) -> Dict[str, Any]:
         """Get statistics about the mapping"""
         total_fdc_ids = len(self.fdc_to_infoods_mapping)
-        unmapped_count = len(self.unmapped_nutrients)
+        unmapped_count = self.unmapped_count
         
         # Count by confidence level
         confidence_counts = {}
@@ -158,7 +311,7 @@ class NutrientMapper:
             'total_fdc_ids_mapped': total_fdc_ids,
             'unmapped_nutrients': unmapped_count,
             'confidence_breakdown': confidence_counts,
-            'nutrients_json_version': self.nutrients_data.get('version', 'unknown')
+            'nutrients_json_version': self.nutrients_version
         }
     
     def validate_mappings(self) -> List[str]:
@@ -167,8 +320,7 @@ class NutrientMapper:
         
         for fdc_id, mapping in self.fdc_to_infoods_mapping.items():
             # Check if the INFOODS ID exists in nutrients.json
-            infoods_exists = any(n['id'] == mapping.infoods_id for n in self.nutrients_data['nutrients'])
-            if not infoods_exists:
+            if mapping.infoods_id not in self._infoods_ids:
                 issues.append(f"FDC {fdc_id} maps to non-existent INFOODS ID: {mapping.infoods_id}")
             
             # Check unit conversion factor is reasonable
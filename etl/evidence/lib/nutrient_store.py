@@ -9,12 +9,20 @@ Provides functionality for storing FDC nutrient data and mapping to canonical nu
 from __future__ import annotations
 import sqlite3
 import json
+import sys
+import threading
+from functools import lru_cache
+from itertools import chain
+from operator import attrgetter
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
-@dataclass
+# Slotted dataclasses drop the per-instance __dict__ (slots= needs Python 3.10+)
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_SLOTS)
 class NutrientRow:
     """Nutrient row data structure with original and converted values"""
     id: str
@@ -33,6 +41,154 @@ class NutrientRow:
     nutrient_name: Optional[str] = None  # Human-readable nutrient name
     nutrient_class: Optional[str] = None  # Nutrient class (proximate, vitamin, etc.)
 
+# Applied to every connection: WAL with NORMAL sync avoids an fsync per commit
+_CONNECTION_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+"""
+
+# nutrient_row columns in NutrientRow field order, so rows can be built positionally
+_NUTRIENT_ROW_COLUMNS = (
+    "id, food_id, nutrient_id, amount, unit, original_amount, original_unit, "
+    "original_nutrient_id, conversion_factor, source, confidence, notes, created_at, "
+    "nutrient_name, nutrient_class"
+)
+
+# Extracts a NutrientRow's insert parameters in column order in one C-level call
+_ROW_GETTER = attrgetter(*(column.strip() for column in _NUTRIENT_ROW_COLUMNS.split(",")))
+_CREATED_AT_INDEX = 12
+
+# Bulk inserts bind this many rows per statement (100 × 15 params, well under SQLite's variable limit)
+_INSERT_BATCH_ROWS = 100
+_INSERT_ROW_PREFIX = f"""
+    INSERT INTO nutrient_row ({_NUTRIENT_ROW_COLUMNS})
+    VALUES """
+_INSERT_ROW_PLACEHOLDER = "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+# Upsert in place on id conflicts: unlike INSERT OR REPLACE this keeps the row
+# (no delete + reinsert) and leaves index entries alone when values are unchanged
+_INSERT_ROW_UPSERT = " ON CONFLICT(id) DO UPDATE SET " + ", ".join(
+    f"{column} = excluded.{column}"
+    for column in (c.strip() for c in _NUTRIENT_ROW_COLUMNS.split(","))
+    if column != "id"
+)
+_INSERT_ROW_SQL = _INSERT_ROW_PREFIX + _INSERT_ROW_PLACEHOLDER + _INSERT_ROW_UPSERT
+_INSERT_BATCH_SQL = _INSERT_ROW_PREFIX + ", ".join([_INSERT_ROW_PLACEHOLDER] * _INSERT_BATCH_ROWS) + _INSERT_ROW_UPSERT
+
+_SELECT_ROWS_BY_FOOD_SQL = f"""
+    SELECT {_NUTRIENT_ROW_COLUMNS}
+    FROM nutrient_row
+    WHERE food_id = ?
+    ORDER BY nutrient_id
+"""
+_SELECT_ROWS_BY_NUTRIENT_SQL = f"""
+    SELECT {_NUTRIENT_ROW_COLUMNS}
+    FROM nutrient_row
+    WHERE nutrient_id = ?
+    ORDER BY food_id
+"""
+_SELECT_ROWS_BY_SOURCE_SQL = f"""
+    SELECT {_NUTRIENT_ROW_COLUMNS}
+    FROM nutrient_row
+    WHERE source = ?
+    ORDER BY food_id, nutrient_id
+"""
+_DELETE_ROWS_BY_FOOD_SQL = "DELETE FROM nutrient_row WHERE food_id = ?"
+# Larger multi-food deletes switch from one IN (...) list to executemany in a transaction
+_DELETE_IN_LIST_MAX = 500
+_SUMMARY_AGGREGATE_SQL = """
+    SELECT COUNT(*), AVG(confidence), GROUP_CONCAT(DISTINCT source)
+    FROM nutrient_row
+    WHERE food_id = ?
+"""
+_SUMMARY_NUTRIENTS_SQL = """
+    SELECT nutrient_id, amount, unit, confidence
+    FROM nutrient_row
+    WHERE food_id = ?
+    ORDER BY nutrient_id
+"""
+_SELECT_CANONICAL_NUTRIENTS_SQL = "SELECT id, name, unit FROM nutrients ORDER BY id"
+
+# Name-based FDC → canonical rules for create_nutrient_mapping, first match wins:
+# (substrings that must all appear in the lowercased name, substring required in the unit, FDC nutrient ID)
+_NAME_RULES: Tuple[Tuple[Tuple[str, ...], Optional[str], str], ...] = (
+    (("energy",), "kcal", "1008"),           # Energy (kcal)
+    (("protein",), None, "1003"),            # Protein
+    (("fat", "total"), None, "1004"),        # Total fat
+    (("carbohydrate", "total"), None, "1005"),  # Total carbohydrate
+    (("fiber", "dietary"), None, "1079"),    # Dietary fiber
+    (("sugar", "total"), None, "2000"),      # Total sugars
+    (("sodium",), None, "1093"),             # Sodium
+    (("calcium",), None, "1087"),            # Calcium
+    (("iron",), None, "1089"),               # Iron
+    (("vitamin c",), None, "1162"),          # Vitamin C
+)
+
+# Size of the per-connection prepared statement cache (sqlite3 defaults to 128)
+_CACHED_STATEMENTS = 256
+
+# Secondary indexes on nutrient_row: (name, DDL). Column order matches each
+# query's WHERE + ORDER BY so no sort step is needed; the food index also
+# covers the summary queries so they never touch the table.
+_NUTRIENT_ROW_INDEXES = [
+    ("idx_nutrient_row_food_cover",
+     "CREATE INDEX IF NOT EXISTS idx_nutrient_row_food_cover "
+     "ON nutrient_row(food_id, nutrient_id, amount, unit, confidence, source)"),
+    ("idx_nutrient_row_nutrient_food",
+     "CREATE INDEX IF NOT EXISTS idx_nutrient_row_nutrient_food ON nutrient_row(nutrient_id, food_id)"),
+    ("idx_nutrient_row_source_food",
+     "CREATE INDEX IF NOT EXISTS idx_nutrient_row_source_food ON nutrient_row(source, food_id, nutrient_id)"),
+]
+
+# Single-column indexes superseded by the composite ones above
+_LEGACY_NUTRIENT_ROW_INDEXES = ("idx_nutrient_row_food_id", "idx_nutrient_row_nutrient_id", "idx_nutrient_row_source")
+
+# Below this many rows, maintaining the indexes is cheaper than rebuilding them
+BULK_LOAD_INDEX_THRESHOLD = 10_000
+
+# Batches at least this large refresh planner statistics (sqlite_stat1) afterwards
+ANALYZE_ROW_THRESHOLD = 10_000
+
+# Lists at least this long are mapped across worker processes
+PARALLEL_MAPPING_THRESHOLD = 10_000
+_MAPPING_CHUNK_SIZE = 2000
+
+def _map_fdc_chunk(fdc_nutrients: List[Dict[str, Any]], nutrient_mapping: Dict[str, str]) -> List[NutrientRow]:
+    """Build legacy nutrient rows for a chunk of FDC nutrients (module-level so worker processes can run it)"""
+    # Extract columns in bulk, then build rows positionally in one pass
+    food_ids = [n.get('fdc_id', n.get('food_id', '')) for n in fdc_nutrients]
+    nutrient_ids = [n.get('nutrient_id', '') for n in fdc_nutrients]
+    amounts = list(map(float, [n.get('amount', 0) for n in fdc_nutrients]))
+    # A handful of distinct units repeat on every row; intern so rows share one object each
+    units = [n.get('unit', 'g') for n in fdc_nutrients]
+    units = [sys.intern(u) if type(u) is str else u for u in units]
+    
+    # Map to canonical nutrient IDs (unmapped IDs pass through unchanged)
+    canonical_ids = list(map(nutrient_mapping.get, nutrient_ids, nutrient_ids))
+    row_ids = [a + "_" + b for a, b in zip(map(str, food_ids), map(str, canonical_ids))]
+    
+    # Rows keep original values (legacy method for backward compatibility)
+    return [
+        NutrientRow(
+            row_id,
+            food_id,
+            canonical_id,
+            amount,
+            unit,
+            amount,
+            unit,
+            nutrient_id,
+            1.0,
+            'fdc_foundation',
+            0.9,  # High confidence for FDC data
+            "FDC nutrient: " + str(nutrient_id)
+        )
+        for row_id, food_id, nutrient_id, amount, unit, canonical_id
+        in zip(row_ids, food_ids, nutrient_ids, amounts, units, canonical_ids)
+    ]
+
 class NutrientStore:
     """Nutrient storage and retrieval system"""
     
@@ -41,10 +197,55 @@ class NutrientStore:
         self.db_path = db_path
         if not db_path.exists():
             raise FileNotFoundError(f"Database not found: {db_path}")
+        self._connection: Optional[sqlite3.Connection] = None
+        # Serializes writes (and connection setup) when the store is shared across threads
+        self._lock = threading.RLock()
+        # Canonical nutrients rarely change within a run; keyed on PRAGMA data_version
+        self._cached_canonical_nutrients = lru_cache(maxsize=1)(self._load_canonical_nutrients)
+        self._cached_nutrient_mapping = lru_cache(maxsize=1)(self._build_nutrient_mapping)
+    
+    def _conn(self) -> sqlite3.Connection:
+        """
+        Return the store's long-lived connection, opening it on first use
+        
+        The connection runs in autocommit mode (isolation_level=None); methods
+        that write several statements open an explicit transaction.
+        """
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    conn = sqlite3.connect(
+                        str(self.db_path), check_same_thread=False, isolation_level=None,
+                        cached_statements=_CACHED_STATEMENTS
+                    )
+                    conn.executescript(_CONNECTION_PRAGMAS)
+                    self._connection = conn
+        return self._connection
+    
+    def close(self) -> None:
+        """Close the cached connection (reopened lazily if the store is used again)"""
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    # Cheap, SQLite-recommended statistics refresh before closing
+                    self._connection.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    pass
+                self._connection.close()
+                self._connection = None
+            # data_version is per connection, so the next one's values say nothing about these
+            self.refresh_nutrient_mapping()
+    
+    def __enter__(self) -> NutrientStore:
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
     
     def create_tables(self) -> None:
         """Create nutrient storage tables if they don't exist"""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with self._lock:
+            conn = self._conn()
             cursor = conn.cursor()
             
             # Create nutrient_row table
@@ -70,211 +271,143 @@ class NutrientStore:
             """)
             
             # Create indexes
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_nutrient_row_food_id 
-                ON nutrient_row(food_id)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_nutrient_row_nutrient_id 
-                ON nutrient_row(nutrient_id)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_nutrient_row_source 
-                ON nutrient_row(source)
-            """)
-            
-            conn.commit()
+            for _, index_sql in _NUTRIENT_ROW_INDEXES:
+                cursor.execute(index_sql)
+            for index_name in _LEGACY_NUTRIENT_ROW_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
     
     def store_nutrient_row(self, nutrient_row: NutrientRow) -> None:
         """Store a single nutrient row"""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO nutrient_row 
-                (id, food_id, nutrient_id, amount, unit, original_amount, original_unit, 
-                 original_nutrient_id, conversion_factor, source, confidence, notes, created_at,
-                 nutrient_name, nutrient_class)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                nutrient_row.id,
-                nutrient_row.food_id,
-                nutrient_row.nutrient_id,
-                nutrient_row.amount,
-                nutrient_row.unit,
-                nutrient_row.original_amount,
-                nutrient_row.original_unit,
-                nutrient_row.original_nutrient_id,
-                nutrient_row.conversion_factor,
-                nutrient_row.source,
-                nutrient_row.confidence,
-                nutrient_row.notes,
-                nutrient_row.created_at or datetime.now().isoformat(),
-                nutrient_row.nutrient_name,
-                nutrient_row.nutrient_class
-            ))
-            
-            conn.commit()
+        with self._lock:
+            self._conn().execute(_INSERT_ROW_SQL, self._row_params([nutrient_row])[0])
+    
+    @staticmethod
+    def _row_params(nutrient_rows: List[NutrientRow]) -> List[Tuple]:
+        """Bind tuples for nutrient_row inserts (created_at defaults to one batch timestamp)"""
+        now_iso = datetime.now().isoformat()
+        return [
+            params if params[_CREATED_AT_INDEX] else
+            params[:_CREATED_AT_INDEX] + (now_iso,) + params[_CREATED_AT_INDEX + 1:]
+            for params in map(_ROW_GETTER, nutrient_rows)
+        ]
+    
+    @staticmethod
+    def _insert_params(conn: sqlite3.Connection, params: List[Tuple]) -> None:
+        # Full batches go through one multi-row VALUES statement each;
+        # the leftover rows use the single-row statement
+        full = len(params) - len(params) % _INSERT_BATCH_ROWS
+        conn.executemany(_INSERT_BATCH_SQL, (
+            tuple(chain.from_iterable(params[i:i + _INSERT_BATCH_ROWS]))
+            for i in range(0, full, _INSERT_BATCH_ROWS)
+        ))
+        conn.executemany(_INSERT_ROW_SQL, params[full:])
     
     def store_nutrient_rows(self, nutrient_rows: List[NutrientRow]) -> None:
-        """Store multiple nutrient rows"""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            cursor = conn.cursor()
-            
-            for nutrient_row in nutrient_rows:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO nutrient_row 
-                    (id, food_id, nutrient_id, amount, unit, original_amount, original_unit, 
-                     original_nutrient_id, conversion_factor, source, confidence, notes, created_at,
-                     nutrient_name, nutrient_class)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    nutrient_row.id,
-                    nutrient_row.food_id,
-                    nutrient_row.nutrient_id,
-                    nutrient_row.amount,
-                    nutrient_row.unit,
-                    nutrient_row.original_amount,
-                    nutrient_row.original_unit,
-                    nutrient_row.original_nutrient_id,
-                    nutrient_row.conversion_factor,
-                    nutrient_row.source,
-                    nutrient_row.confidence,
-                    nutrient_row.notes,
-                    nutrient_row.created_at or datetime.now().isoformat(),
-                    nutrient_row.nutrient_name,
-                    nutrient_row.nutrient_class
-                ))
-            
-            conn.commit()
+        """Store multiple nutrient rows in a single transaction"""
+        self.bulk_load(nutrient_rows, drop_indexes=False)
+    
+    def bulk_load(self, nutrient_rows: List[NutrientRow], drop_indexes: bool = True) -> None:
+        """
+        Store a large batch of nutrient rows in a single transaction
+        
+        With drop_indexes, batches of at least BULK_LOAD_INDEX_THRESHOLD rows
+        drop the secondary indexes before inserting and rebuild them afterwards,
+        which is much cheaper than maintaining them row by row.
+        """
+        params = self._row_params(nutrient_rows)
+        if not params:
+            return
+        rebuild_indexes = drop_indexes and len(params) >= BULK_LOAD_INDEX_THRESHOLD
+        
+        with self._lock:
+            conn = self._conn()
+            # Explicit write transaction: take the write lock up front, one commit for the batch
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if rebuild_indexes:
+                    for index_name, _ in _NUTRIENT_ROW_INDEXES:
+                        conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+                self._insert_params(conn, params)
+                if rebuild_indexes:
+                    for _, index_sql in _NUTRIENT_ROW_INDEXES:
+                        conn.execute(index_sql)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            if len(params) >= ANALYZE_ROW_THRESHOLD:
+                # Large ingests skew the row distribution; keep the planner on the indexes
+                conn.execute("ANALYZE nutrient_row")
+    
+    def _iter_rows(self, sql: str, params: Tuple, chunk_size: int) -> Iterator[NutrientRow]:
+        """Yield NutrientRows from a query, fetching chunk_size rows at a time"""
+        cursor = self._conn().cursor()
+        cursor.arraysize = chunk_size
+        cursor.execute(sql, params)
+        try:
+            while batch := cursor.fetchmany():
+                yield from (NutrientRow(*row) for row in batch)
+        finally:
+            cursor.close()
+    
+    def iter_nutrient_rows_for_food(self, food_id: str, chunk_size: int = 1000) -> Iterator[NutrientRow]:
+        """Stream nutrient rows for a specific food"""
+        return self._iter_rows(_SELECT_ROWS_BY_FOOD_SQL, (food_id,), chunk_size)
+    
+    def iter_nutrient_rows_by_source(self, source: str, chunk_size: int = 1000) -> Iterator[NutrientRow]:
+        """Stream nutrient rows from a specific source with bounded memory"""
+        return self._iter_rows(_SELECT_ROWS_BY_SOURCE_SQL, (source,), chunk_size)
+    
+    @staticmethod
+    def _fetch_rows(conn: sqlite3.Connection, sql: str, params: Tuple) -> List[NutrientRow]:
+        """Run a nutrient_row SELECT on an existing connection and build rows positionally"""
+        return [NutrientRow(*row) for row in conn.execute(sql, params)]
     
     def get_nutrient_rows_for_food(self, food_id: str) -> List[NutrientRow]:
         """Get all nutrient rows for a specific food"""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, food_id, nutrient_id, amount, unit, original_amount, original_unit,
-                       original_nutrient_id, conversion_factor, source, confidence, notes, created_at,
-                       nutrient_name, nutrient_class
-                FROM nutrient_row
-                WHERE food_id = ?
-                ORDER BY nutrient_id
-            """, (food_id,))
-            
-            rows = cursor.fetchall()
-            return [
-                NutrientRow(
-                    id=row[0],
-                    food_id=row[1],
-                    nutrient_id=row[2],
-                    amount=row[3],
-                    unit=row[4],
-                    original_amount=row[5],
-                    original_unit=row[6],
-                    original_nutrient_id=row[7],
-                    conversion_factor=row[8],
-                    source=row[9],
-                    confidence=row[10],
-                    notes=row[11],
-                    created_at=row[12],
-                    nutrient_name=row[13],
-                    nutrient_class=row[14]
-                )
-                for row in rows
-            ]
+        return self._fetch_rows(self._conn(), _SELECT_ROWS_BY_FOOD_SQL, (food_id,))
     
     def get_nutrient_rows_by_nutrient(self, nutrient_id: str) -> List[NutrientRow]:
         """Get all nutrient rows for a specific nutrient"""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, food_id, nutrient_id, amount, unit, original_amount, original_unit,
-                       original_nutrient_id, conversion_factor, source, confidence, notes, created_at,
-                       nutrient_name, nutrient_class
-                FROM nutrient_row
-                WHERE nutrient_id = ?
-                ORDER BY food_id
-            """, (nutrient_id,))
-            
-            rows = cursor.fetchall()
-            return [
-                NutrientRow(
-                    id=row[0],
-                    food_id=row[1],
-                    nutrient_id=row[2],
-                    amount=row[3],
-                    unit=row[4],
-                    original_amount=row[5],
-                    original_unit=row[6],
-                    original_nutrient_id=row[7],
-                    conversion_factor=row[8],
-                    source=row[9],
-                    confidence=row[10],
-                    notes=row[11],
-                    created_at=row[12],
-                    nutrient_name=row[13],
-                    nutrient_class=row[14]
-                )
-                for row in rows
-            ]
+        return self._fetch_rows(self._conn(), _SELECT_ROWS_BY_NUTRIENT_SQL, (nutrient_id,))
     
     def get_nutrient_rows_by_source(self, source: str) -> List[NutrientRow]:
         """Get all nutrient rows from a specific source"""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, food_id, nutrient_id, amount, unit, original_amount, original_unit,
-                       original_nutrient_id, conversion_factor, source, confidence, notes, created_at,
-                       nutrient_name, nutrient_class
-                FROM nutrient_row
-                WHERE source = ?
-                ORDER BY food_id, nutrient_id
-            """, (source,))
-            
-            rows = cursor.fetchall()
-            return [
-                NutrientRow(
-                    id=row[0],
-                    food_id=row[1],
-                    nutrient_id=row[2],
-                    amount=row[3],
-                    unit=row[4],
-                    original_amount=row[5],
-                    original_unit=row[6],
-                    original_nutrient_id=row[7],
-                    conversion_factor=row[8],
-                    source=row[9],
-                    confidence=row[10],
-                    notes=row[11],
-                    created_at=row[12],
-                    nutrient_name=row[13],
-                    nutrient_class=row[14]
-                )
-                for row in rows
-            ]
+        return self._fetch_rows(self._conn(), _SELECT_ROWS_BY_SOURCE_SQL, (source,))
     
     def delete_nutrient_rows_for_food(self, food_id: str) -> None:
         """Delete all nutrient rows for a specific food"""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                DELETE FROM nutrient_row
-                WHERE food_id = ?
-            """, (food_id,))
-            
-            conn.commit()
+        with self._lock:
+            self._conn().execute(_DELETE_ROWS_BY_FOOD_SQL, (food_id,))
+    
+    def delete_nutrient_rows_for_foods(self, food_ids: Iterable[str]) -> None:
+        """Delete all nutrient rows for many foods in one transaction"""
+        food_ids = list(dict.fromkeys(food_ids))
+        if not food_ids:
+            return
+        
+        with self._lock:
+            conn = self._conn()
+            if len(food_ids) <= _DELETE_IN_LIST_MAX:
+                # One statement; IN (...) probes the food_id index once per id
+                placeholders = ",".join("?" * len(food_ids))
+                conn.execute(f"DELETE FROM nutrient_row WHERE food_id IN ({placeholders})", food_ids)
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(_DELETE_ROWS_BY_FOOD_SQL, ((food_id,) for food_id in food_ids))
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
     
     def get_nutrient_summary(self, food_id: str) -> Dict[str, Any]:
         """Get nutrient summary for a food"""
-        nutrient_rows = self.get_nutrient_rows_for_food(food_id)
+        # Both queries run on the one connection and share its page cache
+        conn = self._conn()
+        nutrient_count, avg_confidence, sources = conn.execute(_SUMMARY_AGGREGATE_SQL, (food_id,)).fetchone()
         
-        if not nutrient_rows:
+        if not nutrient_count:
             return {
                 'food_id': food_id,
                 'nutrient_count': 0,
@@ -282,62 +415,50 @@ class NutrientStore:
                 'avg_confidence': 0.0
             }
         
-        sources = list(set(row.source for row in nutrient_rows))
-        avg_confidence = sum(row.confidence for row in nutrient_rows) / len(nutrient_rows)
+        nutrients = conn.execute(_SUMMARY_NUTRIENTS_SQL, (food_id,))
         
         return {
             'food_id': food_id,
-            'nutrient_count': len(nutrient_rows),
-            'sources': sources,
+            'nutrient_count': nutrient_count,
+            'sources': sources.split(','),
             'avg_confidence': avg_confidence,
             'nutrients': [
                 {
-                    'nutrient_id': row.nutrient_id,
-                    'amount': row.amount,
-                    'unit': row.unit,
-                    'confidence': row.confidence
+                    'nutrient_id': nutrient_id,
+                    'amount': amount,
+                    'unit': unit,
+                    'confidence': confidence
                 }
-                for row in nutrient_rows
+                for nutrient_id, amount, unit, confidence in nutrients
             ]
         }
     
     def map_fdc_nutrients(self, fdc_nutrients: List[Dict[str, Any]], 
                          nutrient_mapping: Dict[str, str]) -> List[NutrientRow]:
         """Map FDC nutrients to canonical nutrients and create nutrient rows"""
-        nutrient_rows = []
+        if len(fdc_nutrients) < PARALLEL_MAPPING_THRESHOLD:
+            return _map_fdc_chunk(fdc_nutrients, nutrient_mapping)
         
-        for fdc_nutrient in fdc_nutrients:
-            fdc_id = fdc_nutrient.get('fdc_id', fdc_nutrient.get('food_id', ''))
-            nutrient_id = fdc_nutrient.get('nutrient_id', '')
-            amount = float(fdc_nutrient.get('amount', 0))
-            unit = fdc_nutrient.get('unit', 'g')
-            
-            # Map to canonical nutrient ID
-            canonical_nutrient_id = nutrient_mapping.get(nutrient_id, nutrient_id)
-            
-            # Create nutrient row with original values (legacy method for backward compatibility)
-            nutrient_row = NutrientRow(
-                id=f"{fdc_id}_{canonical_nutrient_id}",
-                food_id=fdc_id,
-                nutrient_id=canonical_nutrient_id,
-                amount=amount,
-                unit=unit,
-                original_amount=amount,
-                original_unit=unit,
-                original_nutrient_id=nutrient_id,
-                conversion_factor=1.0,
-                source='fdc_foundation',
-                confidence=0.9,  # High confidence for FDC data
-                notes=f"FDC nutrient: {nutrient_id}"
-            )
-            
-            nutrient_rows.append(nutrient_row)
-        
-        return nutrient_rows
+        # Pure-Python row building: spread chunks over processes (threads would share the GIL)
+        from .parallel_mapping import map_chunks_parallel
+        return list(chain.from_iterable(
+            map_chunks_parallel(_map_fdc_chunk, fdc_nutrients, _MAPPING_CHUNK_SIZE, nutrient_mapping)
+        ))
     
     def map_fdc_nutrients_with_mapper(self, fdc_nutrients: List[Dict[str, Any]], 
                                     nutrient_mapper) -> Tuple[List[NutrientRow], List[Any]]:
         """Map FDC nutrients using the comprehensive nutrient mapper"""
+        if len(fdc_nutrients) >= PARALLEL_MAPPING_THRESHOLD:
+            # Workers rebuild the mapper from nutrients.json; unmapped rows are
+            # recorded on the caller's mapper just as the sequential path does
+            from .parallel_mapping import map_nutrient_list_parallel
+            row_dicts, unmapped_nutrients = map_nutrient_list_parallel(
+                fdc_nutrients, nutrient_mapper.nutrients_json_path, chunk_size=_MAPPING_CHUNK_SIZE
+            )
+            for unmapped in unmapped_nutrients:
+                nutrient_mapper.record_unmapped(unmapped)
+            return [NutrientRow(**row) for row in row_dicts], unmapped_nutrients
+        
         nutrient_rows = []
         unmapped_nutrients = []
         
@@ -345,79 +466,60 @@ class NutrientStore:
             result = nutrient_mapper.map_fdc_nutrient(fdc_nutrient)
             if result.mapped:
                 # Convert the nutrient row data to NutrientRow object
-                nutrient_row = NutrientRow(
-                    id=result.nutrient_row['id'],
-                    food_id=result.nutrient_row['food_id'],
-                    nutrient_id=result.nutrient_row['nutrient_id'],
-                    amount=result.nutrient_row['amount'],
-                    unit=result.nutrient_row['unit'],
-                    original_amount=result.nutrient_row['original_amount'],
-                    original_unit=result.nutrient_row['original_unit'],
-                    original_nutrient_id=result.nutrient_row['original_nutrient_id'],
-                    conversion_factor=result.nutrient_row['conversion_factor'],
-                    source=result.nutrient_row['source'],
-                    confidence=result.nutrient_row['confidence'],
-                    notes=result.nutrient_row['notes'],
-                    nutrient_name=result.nutrient_row.get('nutrient_name'),
-                    nutrient_class=result.nutrient_row.get('nutrient_class')
-                )
-                nutrient_rows.append(nutrient_row)
+                nutrient_rows.append(NutrientRow(**result.nutrient_row))
             else:
                 unmapped_nutrients.append(result.unmapped_info)
         
         return nutrient_rows, unmapped_nutrients
     
-    def get_canonical_nutrients(self) -> List[Dict[str, Any]]:
-        """Get canonical nutrients from the database"""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, name, unit
-                FROM nutrients
-                ORDER BY id
-            """)
-            
-            rows = cursor.fetchall()
-            return [
-                {
-                    'id': row[0],
-                    'name': row[1],
-                    'unit': row[2]
-                }
-                for row in rows
-            ]
+    def _db_version(self) -> int:
+        """
+        PRAGMA data_version of the store's connection, used as the cache key
+        
+        It changes only when another connection commits, so the store's own
+        nutrient_row writes never invalidate the canonical nutrient cache.
+        """
+        return self._conn().execute("PRAGMA data_version").fetchone()[0]
     
-    def create_nutrient_mapping(self) -> Dict[str, str]:
-        """Create mapping from FDC nutrient IDs to canonical nutrient IDs"""
-        canonical_nutrients = self.get_canonical_nutrients()
+    def _load_canonical_nutrients(self, db_version: int) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(_SELECT_CANONICAL_NUTRIENTS_SQL)
+        return [
+            {
+                'id': row[0],
+                'name': row[1],
+                'unit': row[2]
+            }
+            for row in rows
+        ]
+    
+    def _build_nutrient_mapping(self, db_version: int) -> Dict[str, str]:
         mapping = {}
         
-        # Simple mapping based on nutrient names (can be enhanced)
-        for nutrient in canonical_nutrients:
-            nutrient_id = nutrient['id']
+        # Simple mapping based on nutrient names (extend via _NAME_RULES)
+        for nutrient in self._cached_canonical_nutrients(db_version):
             name = nutrient['name'].lower()
-            
-            # Map common FDC nutrient names to canonical IDs
-            if 'energy' in name and 'kcal' in nutrient['unit']:
-                mapping['1008'] = nutrient_id  # Energy (kcal)
-            elif 'protein' in name:
-                mapping['1003'] = nutrient_id  # Protein
-            elif 'fat' in name and 'total' in name:
-                mapping['1004'] = nutrient_id  # Total fat
-            elif 'carbohydrate' in name and 'total' in name:
-                mapping['1005'] = nutrient_id  # Total carbohydrate
-            elif 'fiber' in name and 'dietary' in name:
-                mapping['1079'] = nutrient_id  # Dietary fiber
-            elif 'sugar' in name and 'total' in name:
-                mapping['2000'] = nutrient_id  # Total sugars
-            elif 'sodium' in name:
-                mapping['1093'] = nutrient_id  # Sodium
-            elif 'calcium' in name:
-                mapping['1087'] = nutrient_id  # Calcium
-            elif 'iron' in name:
-                mapping['1089'] = nutrient_id  # Iron
-            elif 'vitamin c' in name:
-                mapping['1162'] = nutrient_id  # Vitamin C
+            unit = nutrient['unit']
+            for name_terms, unit_term, fdc_id in _NAME_RULES:
+                if all(term in name for term in name_terms) and (unit_term is None or unit_term in unit):
+                    mapping[fdc_id] = nutrient['id']
+                    break
         
         return mapping
+    
+    def get_canonical_nutrients(self) -> List[Dict[str, Any]]:
+        """Get canonical nutrients from the database (cached until another connection writes to it)"""
+        return self._cached_canonical_nutrients(self._db_version())
+    
+    def create_nutrient_mapping(self) -> Dict[str, str]:
+        """
+        Create mapping from FDC nutrient IDs to canonical nutrient IDs
+        
+        Cached per database data_version; the returned dict is shared
+        between calls and must not be mutated.
+        """
+        return self._cached_nutrient_mapping(self._db_version())
+    
+    def refresh_nutrient_mapping(self) -> None:
+        """Drop cached canonical nutrients and the derived FDC mapping"""
+        self._cached_canonical_nutrients.cache_clear()
+        self._cached_nutrient_mapping.cache_clear()
@@ -7,654 +7,824 @@ These prompts leverage our specific taxonomic structure, part taxonomy,
 and transform patterns to improve accuracy and consistency.
 """
 
-from typing import Any, List
-
+import heapq
+import json
+import sys
+from functools import lru_cache
+from operator import attrgetter
+from pathlib import Path
+from string import Template
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import tiktoken
+except ImportError:  # token estimates fall back to ~4 chars/token
+    tiktoken = None
+
+
+# Single-tier system prompt used by map.py (and as the call_llm fallback)
+DEFAULT_SYSTEM = """
+You will receive a STATIC BLOCK followed by one ITEM per request.
+Return STRICT JSON for that item only—no prose, no markdown, no extra keys.
+
+Rules (critical):
+- Prefer existing taxon_id from the graph; only emit new_taxa if none fits (with full contiguous parents).
+- Follow the kingdom-specific ladders exactly; do not skip intermediate ranks.
+- Hybrids: use x_ prefix in the species segment (e.g., x_ananassa).
+- Only cultivar/variety are permitted in plant suffixes; animals may append [breed]. Otherwise, back off rank.
+- Ignore marketing tokens (colors/grades/size) in taxon_id.
+- Non-biological items (minerals/water) => disposition="skip" with null IDs.
+- Processed meat products (frankfurters, sausages, hot dogs, deli meats) are typically multi-ingredient and should be disposition="skip".
+- When in doubt about multi-ingredient status, prefer "skip" over forcing a single-species mapping.
+- If label implies process (frozen, pasteurized, cooked, ground), you MUST include those transforms (if present in the registry) and set node_kind="tpt"; if missing, return disposition="ambiguous".
+""".strip()
 
-def get_optimized_taxon_system_prompt() -> str:
-    """Enhanced Tier 1 system prompt leveraging ontology patterns."""
-    return """
-You are a taxonomic expert specializing in food identification with access to a comprehensive NCBI-verified taxonomy database.
 
+# Shared opening of the Tier 1/2/3 system prompts: every tier's requests start
+# with the same tokens, so provider prefix caches can serve them across tiers
+_COMMON_ONTOLOGY_CONTEXT = """
 ONTOLOGY CONTEXT:
+- Taxa: tx:{k}:{genus}:{species}[:{cultivar/breed}] where k ∈ {p=plantae, a=animalia, f=fungi}
 - We maintain 100% NCBI verification for all taxa
-- Format: tx:{k}:{genus}:{species}[:{cultivar/breed}] where k ∈ {p=plantae, a=animalia, f=fungi}
 - We handle hybrid species (×), cultivar varieties, and wild vs cultivated forms
-- All taxa are verified against NCBI taxonomy for accuracy
-
-TAXONOMIC HIERARCHY PATTERNS:
-- Kingdom → Phylum → Class → Order → Family → Genus → Species
-- Common plant families: Fabaceae, Poaceae, Solanaceae, Brassicaceae, Rosaceae
-- Common animal families: Bovidae, Suidae, Salmonidae, Phasianidae
-- Common fungal families: Agaricaceae, Boletaceae, Russulaceae
-
-EDGE CASE HANDLING:
-- Hybrid species: Use × in latin_name, map to parent species NCBI taxon
-- Cultivar varieties: Map to parent species, note cultivar in description
-- Wild vs cultivated: Distinguish between wild species and cultivated varieties
-- Processed foods: Identify base biological source, not processing method
-
-NCBI VERIFICATION BENEFITS:
-- All resolved taxa are automatically verified against NCBI
-- NCBI taxon IDs provide additional confidence scoring
-- Taxonomic hierarchy is validated for consistency
-- Scientific names are standardized and verified
-
-CONSERVATIVE RESOLUTION STRATEGY:
-1. Start with species level if confident
-2. Fall back to genus if species uncertain
-3. Use family level only if genus uncertain
-4. Skip if no clear biological source
-
-SKIP CRITERIA (Leveraging our data quality insights):
-- Processed mixtures where base biological source is unclear
-- Multi-ingredient products with significant nutritional alteration
-- Non-biological items (minerals, water, synthetic compounds)
-- Foods where taxonomic placement would be ambiguous
-
-ALWAYS SKIP THESE CATEGORIES:
-1. Processed Meat Products (multi-species blends):
-   - Frankfurters, hot dogs, sausages (beef + pork fat + spices + binders)
-   - Deli meats, lunch meats, cold cuts (mixed meats + preservatives)
-   - Bologna, salami, pepperoni (multiple species + fat + curing agents)
-   - Reason: Cannot assign to single taxon; fat and binders alter nutrition significantly
-
-2. Condiments & Sauces (complex multi-ingredient):
-   - Ketchup, mayonnaise, salad dressing (tomato/egg + oil + sugar + vinegar)
-   - BBQ sauce, hot sauce, soy sauce (multiple ingredients + fermentation)
-   - Hummus, pesto, tapenade (chickpea + tahini + oil OR basil + pine nuts + cheese)
-   - Reason: Multiple distinct biological sources with processing
-
-3. Baked Goods (unless simple single-grain):
-   - Bread, cookies, cake, muffins, pastries (wheat + sugar + fat + eggs + leavening)
-   - Exception: Simple items like "wheat flour" or "whole oat groats" are OK
-   - Reason: Multiple ingredients plus chemical/biological leavening
-
-4. Prepared Meals & Combinations:
-   - Pizza, sandwiches, burgers, tacos (multiple distinct components)
-   - Stir-fry, casseroles, stews (multiple vegetables/proteins)
-   - Reason: Multiple distinct biological sources
-
-5. Non-Biological Items:
-   - Table salt, baking soda, water, minerals
-   - Synthetic supplements, artificial flavors
-   - Reason: No biological taxon
-
-EXAMPLES FROM OUR ONTOLOGY:
-✅ ACCEPT:
-- "Apple, raw" → tx:p:malus:domestica (single species)
-- "Beef steak" → tx:a:bos:taurus (single species, single part)
-- "Button mushroom" → tx:f:agaricus:bisporus (single species)
-- "Milk, 2% fat" → tx:a:bos:taurus (single species, processing OK)
-- "Wheat flour" → tx:p:triticum:aestivum (single species, milling OK)
-- "Tomato, grape, raw" → tx:p:solanum:lycopersicum (single species, cultivar OK)
-
-❌ SKIP:
-- "Hummus, commercial" → disposition: "skip" (chickpea + tahini + oil)
-- "Frankfurter, beef" → disposition: "skip" (beef + pork fat + spices + binders)
-- "Bologna, beef and pork" → disposition: "skip" (multiple species blend)
-- "Bread, whole wheat" → disposition: "skip" (wheat + yeast + salt + water + sugar)
-- "Pizza, pepperoni" → disposition: "skip" (wheat + cheese + tomato + meat)
-- "Table salt" → disposition: "skip" (non-biological)
-
-Return valid JSON only.
-""".strip()
-
-def get_optimized_tpt_system_prompt() -> str:
-    """Enhanced Tier 2 system prompt leveraging part and transform patterns."""
-    return """
-You are a food science expert specializing in biological structure and processing with access to a comprehensive ontology of verified parts and transforms.
-
-ONTOLOGY CONTEXT:
 - Parts are organized by biological structure and taxonomic applicability
-- Transforms have explicit processing order and parameter schemas
 - Derived parts have clear parent-child relationships
+- Transforms have explicit processing order and parameter schemas
 - All parts and transforms are validated for biological accuracy
-
-BIOLOGICAL PART SELECTION (Leveraging our part taxonomy):
-PLANT PARTS:
-- part:fruit - Fleshy fruit tissue (apples, tomatoes, berries)
-- part:seed - Seeds and nuts (almonds, sunflower seeds)
-- part:grain - Grass family grains (wheat, rice, oats) with applies_to: ["tx:plantae:poaceae"]
-- part:leaf - Leafy greens (lettuce, spinach, kale)
-- part:stem - Plant stems (asparagus, celery, broccoli stems)
-- part:flower - Flower buds (broccoli florets, cauliflower)
-- part:root - Root vegetables (carrots, beets, radishes)
-- part:tuber - Tubers (potatoes, sweet potatoes)
-- part:bulb - Bulbs (onions, garlic)
-- part:rhizome - Rhizomes (ginger, turmeric)
-
-ANIMAL PARTS:
-- part:muscle - Muscle tissue (beef, pork, chicken breast)
-- part:organ - Organs (liver, kidney, heart)
-- part:fat - Fat tissue (subcutaneous, leaf fat)
-- part:milk - Animal secretions (cow milk, goat milk)
-- part:cheese - Fermented milk products
-
-DERIVED PARTS (Parent-child relationships):
-- part:flour → part:grain (milled grain product)
-- part:bran → part:grain (grain outer layer)
-- part:germ → part:grain (grain embryo)
-- part:endosperm → part:grain (grain starchy center)
-
-TRANSFORM PROCESSING ORDER (Critical for accurate TPT construction):
-1. Order 10-30: Preparation (trim, cure, brine)
-2. Order 30-50: Processing (strain, press, dry)
-3. Order 50-70: Refinement (mill, enrich)
-4. Order 70-90: Cooking (cook, roast, grill)
-
-TRANSFORM PARAMETER SCHEMAS (WITH STRICT VALIDATION):
-
-tf:cook (Cooking/heating):
-  - method: ENUM["boil", "steam", "bake", "roast", "grill", "saute", "stir_fry", "deep_fry", "pressure_cook", "sous_vide"] (REQUIRED)
-  - core_temp_C: number (optional)
-  - time_min: number (optional)
-  Example: {"id": "tf:cook", "params": {"method": "roast", "core_temp_C": 65}}
-
-tf:mill (Grain milling - ONLY for grains like wheat, rice, oats):
-  - refinement: ENUM["whole", "refined", "pearled", "00"]
-  - oat_form: ENUM["rolled", "steel_cut"] (only for oats)
-  - extraction_pct: number (optional)
-  - target: ENUM["wholemeal", "white", "semolina", "meal", "flour"] (optional)
-  APPLIES TO: Grains only (Poaceae family)
-  Example: {"id": "tf:mill", "params": {"refinement": "refined"}}
-
-tf:cure (Curing - meat preservation):
-  - style: ENUM["dry", "wet"] (REQUIRED - these are the ONLY valid values)
-  - nitrite_ppm: number (optional)
-  - salt_pct: number (optional)
-  - sugar_pct: number (optional)
-  - time_d: number (optional)
-  CRITICAL: Do NOT invent values like "nitrite_cure" - use ONLY "dry" or "wet"
-  Example: {"id": "tf:cure", "params": {"style": "wet", "nitrite_ppm": 120}}
-
-tf:dry (Dehydration):
-  - method: ENUM["air", "oven", "dehydrator", "sun", "freeze_dry"] (REQUIRED)
-  - target_moisture_pct: number (optional)
-  Example: {"id": "tf:dry", "params": {"method": "sun"}}
-
-tf:brine (Brining/canning with salt):
-  - salt_level: ENUM["no_salt", "low_salt", "regular"] (REQUIRED)
-  Example: {"id": "tf:brine", "params": {"salt_level": "regular"}}
-
-tf:trim (Fat standardization - meat only):
-  - lean_pct: number (REQUIRED - percentage lean meat, e.g., 85 for 85% lean)
-  Example: {"id": "tf:trim", "params": {"lean_pct": 85}}
-
-tf:standardize_fat (Dairy fat standardization):
-  - fat_pct: number (REQUIRED - target fat percentage, e.g., 2.0 for 2% milk)
-  Example: {"id": "tf:standardize_fat", "params": {"fat_pct": 2.0}}
-
-tf:roast (Roasting/toasting):
-  - temp_C: number (optional)
-  - time_min: number (optional)
-  Example: {"id": "tf:roast", "params": {"temp_C": 175, "time_min": 30}}
-
-tf:grind (Grinding/pulverizing - seeds/nuts ONLY):
-  - fineness: ENUM["coarse", "fine", "slurry"] (REQUIRED)
-  APPLIES TO: part:seed and part:kernel only (via applies_to rules)
-  Example: {"id": "tf:grind", "params": {"fineness": "fine"}}
-
-tf:oil_extraction_defatting (Oil extraction/defatting):
-  - method: ENUM["expeller", "solvent", "hybrid"] (REQUIRED)
-  - target_residual_oil_pct: number (optional)
-  APPLIES TO: part:seed, part:kernel, part:flour (via applies_to rules)
-  Example: {"id": "tf:oil_extraction_defatting", "params": {"method": "solvent", "target_residual_oil_pct": 0.5}}
-
-tf:enrich (Fortification - adding vitamins/minerals - IDENTITY-BEARING):
-  - enrichment: ENUM["none", "std_enriched", "custom"] (REQUIRED)
-  
-  ⚠️ BUCKETING GUIDANCE - Fight Drift:
-  - Use 'std_enriched' for common fortifications (milk + A/D, flour + B/Fe, OJ + Ca/D)
-  - Use 'custom' only for unusual fortification combinations
-  - DO NOT try to specify which vitamins/minerals (e.g., NO dicts, NO 'vitamin_A' param)
-  - Fortified foods bucket by enrichment LEVEL, not specific vitamins
-  
-  Example: {"id": "tf:enrich", "params": {"enrichment": "std_enriched"}}
-
-tf:pasteurize (Pasteurization - NOT identity-bearing):
-  - regime: ENUM["LTLT", "HTST", "UHT", "thermize"]
-  - temp_C: number (optional)
-  - time_s: number (optional)
-  Example: {"id": "tf:pasteurize", "params": {"regime": "HTST"}}
-
-tf:homogenize (Homogenization - NOT identity-bearing):
-  - pressure_MPa: number (optional)
-  - passes: number (optional)
-  Example: {"id": "tf:homogenize", "params": {"pressure_MPa": 15}}
-
-tf:ferment (Fermentation - IDENTITY-BEARING):
-  - starter: ENUM["yogurt_thermo", "yogurt_meso", "kefir", "culture_generic"] (REQUIRED)
-  - temp_C: number (optional)
-  - time_h: number (optional)
-  
-  ⚠️ BUCKETING GUIDANCE - Fight Drift:
-  - Use 'culture_generic' for ALL cheese, sauerkraut, kimchi, and other fermented foods
-  - Use 'yogurt_thermo' ONLY for actual yogurt (thermophilic cultures ~42-45°C)
-  - Use 'yogurt_meso' ONLY for actual yogurt or buttermilk (mesophilic cultures ~20-30°C)
-  - Use 'kefir' ONLY for actual kefir products
-  - DO NOT invent values like 'lactic_cultures', 'cheese_cultures', 'thermophilic lactic cultures'
-  - Different culture strains producing similar nutrients MUST bucket together
-  
-  Example: {"id": "tf:ferment", "params": {"starter": "culture_generic"}}
-
-tf:coagulate (Coagulation/Curdling - IDENTITY-BEARING):
-  - agent: ENUM["acid", "rennet", "cultured_acid"] (REQUIRED)
-  - substrate: ENUM["milk", "whey", "cream"] (REQUIRED)
-  - temp_C: number (optional)
-  - time_min: number (optional)
-  
-  ⚠️ BUCKETING GUIDANCE - Fight Drift:
-  - Use 'milk' for whole milk, skim milk, 2% milk, etc. (fat % handled by tf:standardize_fat)
-  - Use 'whey' for ricotta and other whey-based cheeses
-  - Use 'cream' for mascarpone and cream-based products
-  - DO NOT specify fat content in substrate (e.g., NO 'whole_milk', 'skim_milk')
-  - Coagulated products bucket by substrate TYPE, not fat percentage
-  
-  Example: {"id": "tf:coagulate", "params": {"agent": "rennet", "substrate": "milk"}}
-
-CRITICAL VALIDATION RULES:
-1. ONLY use enum values EXACTLY as listed above - DO NOT invent new values
-2. Check transform applicability - tf:mill is for GRAINS only, tf:grind is for SEEDS/KERNELS only
-3. Meat grinding is NOT identity-bearing - do NOT use transforms for ground meat
-4. When uncertain about a parameter value, prefer to omit it rather than guess
-5. NEVER use transforms inappropriately (e.g., tf:mill for meat emulsification)
-6. For missing transforms: Include what you can, note what's missing in reason, mark as "ambiguous" disposition
-
-RULES FOR TPT CONSTRUCTION:
-1. Select most appropriate biological part for the food's structure
-2. Include transforms in correct processing order (only if available)
-3. Use ONLY provided applicable parts and available transforms
-4. ONLY use enum values exactly as defined - no custom values
-5. Consider taxonomic applicability rules (applies_to)
-6. Leverage derived part relationships when appropriate
-7. If a critical transform is missing (e.g., grinding/grating), create partial TPT and mark disposition as "ambiguous"
-8. Partial TPTs will be curated by Tier 3 to determine if they should be accepted or if overlay expansion is needed
-
-EXAMPLE: For "peanut butter":
-- Use part:kernel with tf:grind
-- {"id": "tf:grind", "params": {"fineness": "fine"}}
-- tf:grind applies to seeds/kernels via applicability rules
-
-EXAMPLES FROM OUR ONTOLOGY:
-- "Raw apple" → part:fruit, transforms: []
-- "Broccoli, raw" → part:flower, transforms: []
-- "Cooked beef" → part:muscle, transforms: [{"id": "tf:cook", "params": {"method": "roast"}}]
-- "Ground beef" → part:muscle, transforms: [] (grinding meat is NOT identity-bearing)
-- "Peanut butter" → part:kernel, transforms: [{"id": "tf:grind", "params": {"fineness": "fine"}}]
-- "Wheat flour" → part:flour, transforms: [{"id": "tf:mill", "params": {"refinement": "refined"}}]
-- "Pasteurized milk" → part:milk, transforms: [{"id": "tf:pasteurize", "params": {}}]
-
-Return valid JSON only.
 """.strip()
 
-def get_optimized_curation_system_prompt() -> str:
-    """Enhanced Tier 3 system prompt for curating ambiguous/failed TPTs."""
-    return """
-You are a senior food ontology curator specializing in completing partial TPT constructions and making intelligent decisions about missing transforms.
-
-YOUR MISSION: Tier 2 sometimes can't complete a TPT because critical transforms are missing from the ontology. Your job is to:
-
-1. ACCEPT: If the partial TPT is acceptable without the missing transform (e.g., grinding doesn't meaningfully change nutrition)
-2. PROPOSE OVERLAY: If the missing transform is nutritionally significant and should be added to ontology
-3. REJECT: If Tier 2 made fundamental errors
-
-KEY DECISION FACTORS:
-
-**Missing Mechanical Processing (Critical):**
-- Grating/Shredding (parmesan, etc.): NOT identity-bearing → ACCEPT without transform
-  - Volume changes, not nutrient composition
-  - DO NOT create transforms for mechanical size reduction
-  - DO NOT invent transforms like tf:grate, tf:shred, tf:drain
-  
-- Grinding meat: NOT identity-bearing → ACCEPT without transform
-  - Same nutrition, just minced
-  - DO NOT use transforms for ground meat
-  
-- Grinding nuts/seeds: IS identity-bearing → USE tf:grind with fineness param
-  - Produces paste/slurry from whole seeds
-  - Chemically changes texture and nutrient availability
-  - Available transform: tf:grind
-
-**CRITICAL FORMAT REQUIREMENTS:**
-Return transforms as SIMPLE ARRAY: [{"id": "tf:xxx", "params": {...}}]
-DO NOT use custom fields like: {"step": N, "label": "...", "transform_id": "..."}
-ONLY use transforms that exist in the provided list - DO NOT invent new transforms
-
-**Missing Processing Transforms:**
-- Identity-preserving steps (like grating, grinding meat): ACCEPT without transform
-- Identity-bearing steps (like oil extraction): PROPOSE OVERLAY
-
-BUCKETING PHILOSOPHY:
-- Default to ACCEPT if missing transform doesn't materially affect nutrients
-- Only PROPOSE OVERLAY if:
-  * Missing transform is truly identity-bearing
-  * Multiple foods would benefit
-  * Clear nutritional distinction
-
-CRITICAL: You MUST return transforms in this EXACT format:
-CORRECT FORMAT:
-{
-  "strategy": "complete",
-  "corrected_tpt": {
-    "part_id": "part:cheese:hard",
-    "transforms": [
-      {"id": "tf:coagulate", "params": {"agent": "rennet", "substrate": "milk"}},
-      {"id": "tf:ferment", "params": {"starter": "culture_generic"}}
-    ]
-  },
-  "reasoning": "...",
-  "confidence": 0.95
+# Static system prompt bodies live in prompts/*.txt and are read on first use,
+# so workers that import this module but run a single tier only load that tier's text.
+# Rendered system prompts are interned: re-renders after clear_prompt_caches()
+# return the same object, so lookups keyed on them (llm.py's request-key digest,
+# token counts) hit on identity instead of comparing kilobytes of text.
+_PROMPTS_DIR = Path(__file__).parent / "prompts"
+
+@lru_cache(maxsize=None)
+def _load_prompt(name: str) -> str:
+    return sys.intern((_PROMPTS_DIR / f"{name}.txt").read_text(encoding="utf-8").strip())
+
+# Prompt files are string.Template bodies: $slot placeholders mark sections
+# filled at render time (e.g. Tier 2's ontology-derived transform schemas), so
+# sections can be swapped without re-splicing the surrounding text
+@lru_cache(maxsize=None)
+def _prompt_template(name: str) -> Template:
+    return Template(_load_prompt(name))
+
+def _render_tier_prompt(name: str, **slots: str) -> str:
+    """A tier's prompt body, slots substituted, behind the shared ontology-context preamble"""
+    return sys.intern(_COMMON_ONTOLOGY_CONTEXT + "\n\n" + _prompt_template(name).substitute(slots))
+
+@lru_cache(maxsize=None)
+def _tier_system_prompt(name: str) -> str:
+    """A tier's prompt body (with no slots) behind the shared ontology-context preamble"""
+    return _render_tier_prompt(name)
+
+def get_optimized_taxon_system_prompt(return_tokens: bool = False) -> Union[str, Tuple[str, int]]:
+    """Enhanced Tier 1 system prompt leveraging ontology patterns."""
+    return _with_tokens(_tier_system_prompt("taxon_system"), return_tokens)
+
+# Transform schemas in the Tier 2 system prompt are rendered from the transforms
+# the tier is given (the graph's transform_def, overlays included) and narrowed by
+# rules/transform_applicability.jsonl, so they cannot drift from the ontology.
+# Which params Tier 2 must always fill is prompt policy, kept here.
+_REQUIRED_PARAMS = {
+    "tf:cook": ("method",),
+    "tf:cure": ("style",),
+    "tf:dry": ("method",),
+    "tf:brine": ("salt_level",),
+    "tf:trim": ("lean_pct",),
+    "tf:standardize_fat": ("fat_pct",),
+    "tf:grind": ("fineness",),
+    "tf:oil_extraction_defatting": ("method",),
+    "tf:enrich": ("enrichment",),
+    "tf:ferment": ("starter",),
+    "tf:coagulate": ("agent", "substrate"),
 }
 
-WRONG FORMAT (DO NOT DO THIS):
-{
-  "transforms": [
-    {"step": 1, "label": "...", "transform_id": "tf:xxx", "status": "mapped"},
-    {"transform_id": "...", "order": 2}
-  ]
+# Taxon ID kingdom code → the prefix applicability rules use for it
+_KINGDOM_PREFIXES = {"p": "tx:plantae", "a": "tx:animalia", "f": "tx:fungi"}
+
+def taxon_kingdom_code(taxon_id: Optional[str]) -> Optional[str]:
+    """'p', 'a' or 'f' for tx:p:..., tx:animalia:..., etc.; None if unknown"""
+    parts = (taxon_id or "").split(":")
+    kingdom = parts[1][:1] if len(parts) > 1 and parts[0] == "tx" else ""
+    return kingdom if kingdom in _KINGDOM_PREFIXES else None
+
+def _ontology_file(relative: str) -> Path:
+    try:
+        from etl.lib.config import find_project_root, resolve_path
+    except ImportError:
+        from lib.config import find_project_root, resolve_path
+    return resolve_path(relative, find_project_root())
+
+@lru_cache(maxsize=1)
+def _ontology_transforms() -> Tuple[Dict[str, Any], ...]:
+    """transforms.json, for rendering the Tier 2 prompt when no transforms are passed (errors propagate)"""
+    with open(_ontology_file("data/ontology/transforms.json"), 'r') as f:
+        transforms = json.load(f)
+    return tuple(t for t in transforms if isinstance(t, dict) and "id" in t)
+
+@lru_cache(maxsize=1)
+def _transform_applicability() -> Dict[str, Tuple[str, ...]]:
+    """transform id → taxon prefixes it applies to; transforms without rules apply everywhere"""
+    rules_file = _ontology_file("data/ontology/rules/transform_applicability.jsonl")
+    prefixes: Dict[str, List[str]] = {}
+    if rules_file.exists():
+        with open(rules_file, 'r') as f:
+            for line in f:
+                if line.strip():
+                    rule = json.loads(line)
+                    prefixes.setdefault(rule.get("transform"), []).extend(
+                        str(row.get("taxon_prefix", "")) for row in rule.get("applies_to") or ()
+                    )
+    return {transform_id: tuple(p) for transform_id, p in prefixes.items()}
+
+def _applies_to_kingdom(prefixes: Tuple[str, ...], kingdom: Optional[str]) -> bool:
+    """Transforms without applicability rules apply everywhere"""
+    if kingdom is None or not prefixes:
+        return True
+    short, long = "tx:" + kingdom, _KINGDOM_PREFIXES[kingdom]
+    return any(p in (short, long) or p.startswith((short + ":", long + ":")) for p in prefixes)
+
+def _schema_line(transform_id: str, params: Tuple[Tuple[str, Tuple[str, ...]], ...], identity: Any) -> str:
+    """tf:cook method!∈{boil,steam} [core_temp_C] -- required params carry '!'"""
+    required = _REQUIRED_PARAMS.get(transform_id, ())
+    fields = [transform_id]
+    for key, enum in params:
+        spec = f"{key}∈{{{','.join(enum)}}}" if enum else key
+        fields.append(spec.replace(key, key + "!", 1) if key in required else f"[{spec}]")
+    if identity is False:
+        fields.append("(not identity-bearing)")
+    return " ".join(fields)
+
+# (transforms, their schema key): the prepare_transforms tuple is reused for every row
+_last_schema_key: Tuple[Any, Tuple[Tuple[Any, ...], ...]] = ((), ())
+
+def _schema_key(available_transforms) -> Tuple[Tuple[Any, ...], ...]:
+    """(id, params as (key, enum), identity) per transform in processing order; the Tier 2 prompt's cache key"""
+    global _last_schema_key
+    if available_transforms is None:
+        available_transforms = _ontology_transforms()
+    cached_transforms, cached_key = _last_schema_key
+    if available_transforms is cached_transforms:
+        return cached_key
+    key = tuple(
+        (_field(t, 'id'),
+         tuple((p["key"], tuple(p.get("enum") or ())) for p in _field(t, 'params') or ()),
+         _field(t, 'identity'))
+        for t in sorted(available_transforms, key=lambda t: _field(t, 'order') or 999)
+    )
+    if isinstance(available_transforms, tuple):
+        _last_schema_key = (available_transforms, key)
+    return key
+
+# One compact JSON library of example params, instead of a full
+# {"id": ..., "params": ...} object repeated inside every Tier 2 example
+_TPT_PARAM_EXAMPLES = {
+    "tf:cook": {"method": "roast"},
+    "tf:grind": {"fineness": "fine"},
+    "tf:mill": {"refinement": "refined"},
+    "tf:pasteurize": {},
 }
 
-Return JSON with:
-{
-  "strategy": "complete" | "expand" | "reject",
-  "corrected_tpt": {
-    "part_id": "...",
-    "transforms": [{"id": "tf:xxx", "params": {...}}]  // SIMPLE ARRAY
-  },
-  "reasoning": "...",
-  "confidence": 0.0-1.0,
-  "overlay_proposal": {...}  // Only if strategy="expand"
-}
-""".strip()
+@lru_cache(maxsize=16)
+def _tpt_system_prompt(kingdom: Optional[str], schema_key: Tuple[Tuple[Any, ...], ...]) -> str:
+    applicability = _transform_applicability()
+    schema_lines = [_schema_line(*schema) for schema in schema_key
+                    if _applies_to_kingdom(applicability.get(schema[0], ()), kingdom)]
+    schemas = "\n".join([
+        "TRANSFORM SCHEMAS (param! = required, [param] = optional; numbers unless an enum is shown):",
+        *schema_lines,
+    ])
+    examples = json.dumps(_TPT_PARAM_EXAMPLES, ensure_ascii=False, separators=(",", ":"))
+    return _render_tier_prompt("tpt_system", transform_schemas=schemas, param_examples=examples)
+
+def get_optimized_tpt_system_prompt(return_tokens: bool = False, taxon_kingdom: Optional[str] = None,
+                                    available_transforms=None) -> Union[str, Tuple[str, int]]:
+    """
+    Enhanced Tier 2 system prompt leveraging part and transform patterns.
+    
+    Transform schemas are rendered from available_transforms (Tier 2's own
+    transforms), or from transforms.json when none are given. With
+    taxon_kingdom ('p', 'a' or 'f') only the transforms applicable to that
+    kingdom are listed; each kingdom's prompt is rendered once per snapshot.
+    """
+    return _with_tokens(_tpt_system_prompt(taxon_kingdom, _schema_key(available_transforms)), return_tokens)
+
+def get_optimized_curation_system_prompt(return_tokens: bool = False) -> Union[str, Tuple[str, int]]:
+    """Enhanced Tier 3 system prompt for curating ambiguous/failed TPTs."""
+    return _with_tokens(_tier_system_prompt("curation_system"), return_tokens)
 
-def get_optimized_full_curation_system_prompt() -> str:
+def get_optimized_full_curation_system_prompt(return_tokens: bool = False) -> Union[str, Tuple[str, int]]:
     """Enhanced Tier 3 system prompt leveraging ontology patterns and data quality insights."""
-    return """
-You are a senior ontology curator specializing in food taxonomy and processing systems with access to a comprehensive, NCBI-verified ontology.
+    return _with_tokens(_tier_system_prompt("full_curation_system"), return_tokens)
+
+# Enhanced user prompts: the invariant instructions come first and the per-row
+# values last, so consecutive calls share the longest possible prompt prefix
+# (provider prompt caching only matches identical prefixes).
+
+# Per-tier instruction and "Return JSON with" field blocks, composed once into
+# the single-row and marshaled prefixes below
+_TAXON_CONSIDER_BLOCK = """
+Consider:
+- Is this a hybrid species (×) or cultivar variety?
+- What is the base biological source (not processing method)?
+- Can you identify to species level, or should you fall back to genus/family?
+- Is this a processed mixture that should be skipped?
+""".strip()
 
-ONTOLOGY CONTEXT:
-- 100% NCBI verification for all taxa
-- Structured part taxonomy with biological accuracy
-- Transform families with explicit processing order
-- Derived part relationships and taxonomic applicability rules
-- Data quality patterns and validation systems
-
-CURATION ANALYSIS FRAMEWORK:
-
-1. **Part Analysis** (Leveraging our part taxonomy):
-   - Biological accuracy: Does the part reflect actual biological structure?
-   - Taxonomic applicability: Should applies_to rules be updated?
-   - Derived relationships: Are parent-child relationships correct?
-   - Category consistency: Does the part fit its category?
-
-2. **Transform Analysis** (Leveraging our transform patterns):
-   - Processing order: Does the transform order make biological sense?
-   - Parameter schemas: Are parameters appropriate and well-typed?
-   - Transform families: Should transforms be grouped differently?
-   - Identity preservation: Does the transform preserve nutritional identity?
-   - Applicability: Should transform be restricted to specific taxa/parts via applies_to rules?
-   - Generalization: Can we use one transform with applies_to instead of substrate-specific transforms?
-
-3. **Taxonomic Analysis** (Leveraging our NCBI verification):
-   - NCBI consistency: Are taxonomic relationships NCBI-verified?
-   - Hierarchy accuracy: Does the taxon fit the correct hierarchy level?
-   - Edge case handling: Are hybrid species and cultivars handled correctly?
-   - Data quality: Are there any orphaned or divergent taxa?
-
-4. **Ontology Optimization** (Leveraging our quality patterns):
-   - Consistency: Are there conflicting rules or patterns?
-   - Completeness: Are there gaps in the taxonomy or processing?
-   - Efficiency: Can the ontology be simplified or optimized?
-   - Validation: Are there validation rules that could be improved?
-
-DATA QUALITY INSIGHTS TO APPLY:
-- Prioritize NCBI-verified taxa over unverified ones
-- Flag orphaned taxa for review or removal
-- Ensure taxonomic hierarchy consistency
-- Validate part applicability against taxonomic rules
-- Check for processing order consistency
-
-VALIDATION RULES TO ENFORCE:
-- All taxa must have valid NCBI taxon IDs
-- Parts must have appropriate taxonomic applicability
-- Transforms must have correct processing order
-- Derived parts must have valid parent relationships
-- Parameter schemas must be well-typed and documented
-- Transform applicability must be properly defined
-
-**TRANSFORM APPLICABILITY STRATEGY:**
-
-BEFORE proposing new transforms, consider:
-1. Does a general transform exist that could work with applies_to restrictions?
-   ✓ Example: Use tf:grind with applies_to: [{"parts": ["part:seed", "part:kernel"]}] 
-   ✗ Avoid: tf:grind_nuts vs tf:grind_meat vs tf:grind_spices
-
-2. Can we constrain an existing transform via applies_to rules?
-   ✓ Yes: Add applies_to to existing tf:grind
-   ✗ No: Only create new transform if fundamentally different process
-
-3. Transform applicability is defined in data/ontology/rules/transform_applicability.jsonl
-   Format: {"transform": "tf:xxx", "applies_to": [{"taxon_prefix": "tx:p:...", "parts": ["part:xxx"]}]}
-
-EXAMPLES OF GOOD CURATION:
-- Adding applies_to rules for parts with specific taxonomic requirements
-- Adding applies_to rules for transforms to restrict to specific substrates
-- Grouping related transforms into families
-- Creating derived parts for common processing outcomes
-- Updating taxonomic relationships based on NCBI verification
-- Removing orphaned or obsolete taxa
-
-Return JSON with this exact structure:
-{
-  "new_parts": [{"id": "part:new_id", "name": "New Part", "kind": "plant", "category": "fruit", "applies_to": ["tx:p:genus:species"], "parent_id": "part:parent", "notes": "..."}],
-  "modify_parts": [{"id": "part:existing", "modifications": {"name": "Updated Name", "applies_to": ["tx:p:genus:species"]}}],
-  "part_applies_to_rules": [{"part_id": "part:existing", "add_taxa": ["tx:p:genus:species"], "remove_taxa": []}],
-  "new_transforms": [{"id": "tf:new_id", "name": "New Transform", "description": "...", "order": 50, "params": [{"key": "param", "kind": "enum", "enum": ["val1", "val2"]}], "applies_to": [{"taxon_prefix": "tx:p:...", "parts": ["part:xxx"]}]}],
-  "modify_transforms": [{"id": "tf:existing", "modifications": {"order": 45, "params": [{"key": "new_param", "kind": "number"}]}}],
-  "transform_param_schemas": [{"transform_id": "tf:existing", "new_params": [{"key": "param", "kind": "enum", "enum": ["val1", "val2"], "description": "..."}]}],
-  "transform_applicability_rules": [{"transform": "tf:grind", "applies_to": [{"taxon_prefix": "tx:p", "parts": ["part:seed", "part:kernel"]}]}],
-  "derived_part_rules": [{"base_part": "part:base", "derived_part": "part:derived", "transform": "tf:transform", "conditions": {}}],
-  "modify_rules": [{"rule_id": "rule_id", "modifications": {...}}],
-  "optimization_suggestions": ["General optimization recommendation 1", "General optimization recommendation 2"],
-  "confidence": 0.8,
-  "reasoning": "Detailed explanation of all recommendations and their rationale"
+_TPT_CONSIDER_BLOCK = """
+Consider the biological structure and processing history:
+- What is the primary biological part (fruit, seed, muscle, etc.)?
+- What processing transforms have been applied?
+- Are there derived parts that would be more appropriate?
+- What is the correct processing order?
+""".strip()
+
+# "Return JSON with" field blocks (with each tier's disposition enum), keyed by
+# tier and shared by the single-row and marshaled prompts
+_RETURN_FIELDS = {
+    "taxon": """
+- taxon_id: tx:{k}:{genus}:{species}[:{cultivar/breed}] or null
+- confidence: 0.0-1.0
+- disposition: 'resolved', 'ambiguous', or 'skip'
+- reason: brief explanation including NCBI verification status
+- new_taxa: [] (if proposing new taxa)
+""".strip(),
+    "tpt": """
+- part_id: selected part ID or null
+- transforms: list of transform objects with id and params
+- confidence: 0.0-1.0
+- disposition: 'constructed', 'ambiguous', or 'skip'
+- reason: brief explanation including biological reasoning
+- new_parts: [] (if proposing new parts)
+- new_transforms: [] (if proposing new transforms)
+""".strip(),
 }
 
-Be conservative but thorough. Only recommend changes that are clearly needed and well-justified based on our ontology patterns and data quality insights.
-""".strip()
+# Marshaled prompts return one object per row under "results"
+_BATCH_RETURN_JSON_HEADER = 'Return JSON {"results": [...]} with one object per row, in input order, each with:\n- row: the row number\n'
+
+def marshaled_results(response: Any, count: int) -> List[Dict[str, Any]]:
+    """
+    The result objects of a marshaled response for rows 1..count, in row order
+    
+    Raises ValueError unless every item is an object and each row number
+    appears exactly once, so a reordered, dropped or repeated row never
+    attaches an answer to the wrong food.
+    """
+    items = response.get('results') if isinstance(response, dict) else None
+    if not isinstance(items, list) or len(items) != count:
+        raise ValueError(f"expected {count} results, got {len(items) if isinstance(items, list) else 'none'}")
+    by_row: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError(f"result is {type(item).__name__}, not an object")
+        row = item.get('row')
+        if isinstance(row, str) and row.strip().isdigit():
+            row = int(row)
+        if isinstance(row, bool) or not isinstance(row, int) or not 1 <= row <= count or row in by_row:
+            raise ValueError(f"invalid or repeated row {item.get('row')!r}")
+        by_row[row] = item
+    return [by_row[row] for row in range(1, count + 1)]
+
+_TAXON_USER_PREFIX = (
+    "Identify the biological taxon for the food item below using our NCBI-verified taxonomy.\n\n"
+    + _TAXON_CONSIDER_BLOCK + "\n\nReturn JSON with:\n" + _RETURN_FIELDS["taxon"]
+)
+
+# Precompiled segments for the Tier 1 hot path: one join, no per-call format parsing
+_TAXON_FOOD_HEAD = _TAXON_USER_PREFIX + "\n\nFood: "
+_TAXON_DESC_HEAD = "\nDescription: "
 
 def get_enhanced_taxon_prompt(food_name: str, food_description: str = "") -> str:
     """Enhanced Tier 1 user prompt with better context."""
-    prompt = f"Food: {food_name}"
     if food_description:
-        prompt += f"\nDescription: {food_description}"
-    
-    prompt += "\n\nIdentify the biological taxon for this food item using our NCBI-verified taxonomy."
-    prompt += "\n\nConsider:"
-    prompt += "\n- Is this a hybrid species (×) or cultivar variety?"
-    prompt += "\n- What is the base biological source (not processing method)?"
-    prompt += "\n- Can you identify to species level, or should you fall back to genus/family?"
-    prompt += "\n- Is this a processed mixture that should be skipped?"
-    
-    prompt += "\n\nReturn JSON with:"
-    prompt += "\n- taxon_id: tx:{k}:{genus}:{species}[:{cultivar/breed}] or null"
-    prompt += "\n- confidence: 0.0-1.0"
-    prompt += "\n- disposition: 'resolved', 'ambiguous', or 'skip'"
-    prompt += "\n- reason: brief explanation including NCBI verification status"
-    prompt += "\n- new_taxa: [] (if proposing new taxa)"
-    
-    return prompt
+        return "".join((_TAXON_FOOD_HEAD, str(food_name), _TAXON_DESC_HEAD, str(food_description)))
+    return _TAXON_FOOD_HEAD + str(food_name)
 
-def get_enhanced_tpt_prompt(taxon_resolution, applicable_parts, available_transforms) -> str:
-    """Enhanced Tier 2 user prompt with better context."""
-    prompt = f"Food: {taxon_resolution.food_name}\n"
-    prompt += f"Taxon: {taxon_resolution.taxon_id}\n"
-    prompt += f"NCBI Confidence: {taxon_resolution.confidence:.2f}\n\n"
-    
-    prompt += "Consider the biological structure and processing history:\n"
-    prompt += "- What is the primary biological part (fruit, seed, muscle, etc.)?\n"
-    prompt += "- What processing transforms have been applied?\n"
-    prompt += "- Are there derived parts that would be more appropriate?\n"
-    prompt += "- What is the correct processing order?\n\n"
-    
-    prompt += "Applicable Parts:\n"
-    for part in applicable_parts:
-        applies_to = part.applies_to or []
-        applies_to_str = f" (applies to: {', '.join(applies_to)})" if applies_to else ""
-        prompt += f"- {part.id}: {part.name} ({part.kind or 'unknown'}){applies_to_str}\n"
-    
-    prompt += "\nAvailable Transforms (ordered by processing sequence):\n"
-    for transform in available_transforms:
-        order = transform.order or 999
-        params = transform.params or []
-        param_str = f" (params: {', '.join([p['key'] for p in params])})" if params else ""
-        prompt += f"- {transform.id}: {transform.name} (order: {order}){param_str}\n"
+# Tier 1 system prompt with the user-prompt instructions folded in, so the
+# whole invariant text is one system block and the user message is data only
+@lru_cache(maxsize=1)
+def _taxon_static_system() -> str:
+    return sys.intern(_tier_system_prompt("taxon_system") + "\n\n" + _TAXON_USER_PREFIX)
+
+def get_taxon_prompt_pair(food_name: str, food_description: str = "") -> Tuple[str, str]:
+    """(static system, dynamic user) messages for one Tier 1 food"""
+    if food_description:
+        return _taxon_static_system(), "".join(("Food: ", str(food_name), _TAXON_DESC_HEAD, str(food_description)))
+    return _taxon_static_system(), "Food: " + str(food_name)
+
+_TAXON_BATCH_PREFIX = (
+    "Identify the biological taxon for each numbered food row below using our NCBI-verified taxonomy.\n"
+    "Rows are independent; apply the same reasoning to each as you would to a single food.\n\n"
+    + _TAXON_CONSIDER_BLOCK + "\n\n" + _BATCH_RETURN_JSON_HEADER + _RETURN_FIELDS["taxon"]
+)
+
+def get_enhanced_taxon_prompt_batch(items: List[Tuple[str, str]]) -> str:
+    """Tier 1 user prompt covering several foods in one call (row marshaling)."""
+    rows = [
+        f"{i}. Food: {food_name}" + (f" | Description: {food_description}" if food_description else "")
+        for i, (food_name, food_description) in enumerate(items, 1)
+    ]
+    return "\n".join([_TAXON_BATCH_PREFIX, "", "Rows:", *rows, "", f"Return exactly {len(items)} results."])
+
+_TPT_USER_PREFIX = (
+    _TPT_CONSIDER_BLOCK + "\n\n"
+    "Construct a TPT combination for the food below from its applicable parts and\n"
+    "the available transforms. Return JSON with:\n" + _RETURN_FIELDS["tpt"]
+)
+
+# Ontology listings are emitted compactly; the headers carry the legend.
+# Parts are JSON lines with short keys; the transform catalog is a single
+# "TFS:" manifest line of id@order(param,...) entries, since transform names
+# add little over their IDs and most of the old per-line overhead was keys.
+_COMPACT = (",", ":")
+
+def _json_line(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=_COMPACT)
+
+@lru_cache(maxsize=64)
+def _render_transforms_block(transforms_key: Tuple[Tuple[Any, ...], ...]) -> str:
+    """TFS manifest for the TPT prompt; ontology snapshots repeat across foods"""
+    return "TFS: " + ";".join(
+        f"{transform_id}@{order or 999}({','.join(param_keys)})"
+        for transform_id, order, param_keys in transforms_key
+    )
+
+# Part groups overlap heavily (most parts appear in every plant or animal
+# group), so each part's line is rendered once and shared between blocks
+@lru_cache(maxsize=1024)
+def _part_line(part_id: str, name: str, kind: Optional[str], applies_to: Tuple[str, ...]) -> str:
+    return _json_line({"id": part_id, "n": name, "k": kind or "unknown", "a": list(applies_to)})
+
+@lru_cache(maxsize=64)
+def _render_parts_block(parts_key: Tuple[Tuple[Any, ...], ...]) -> str:
+    """Applicable-part listing for the TPT prompt (cached like the transforms block)"""
+    return "\n".join([_part_line(*part) for part in parts_key])
+
+# transform id → its param keys; transforms change only when the ontology is reloaded
+_transform_param_keys: Dict[str, Tuple[str, ...]] = {}
+
+def _param_keys(transform) -> Tuple[str, ...]:
+    keys = _transform_param_keys.get(transform.id)
+    if keys is None:
+        keys = _transform_param_keys[transform.id] = tuple(p['key'] for p in transform.params or ())
+    return keys
+
+def clear_prompt_caches() -> None:
+    """Forget cached ontology renderings (call after the ontology is reloaded or extended)"""
+    global _last_transforms_key, _last_parts_key, _last_schema_key
+    _transform_param_keys.clear()
+    _last_transforms_key = ((), ())
+    _last_parts_key = ((), ())
+    _last_schema_key = ((), ())
+    _ontology_transforms.cache_clear()
+    _transform_applicability.cache_clear()
+    _tpt_system_prompt.cache_clear()
+    _tpt_static_system.cache_clear()
+    _render_transforms_block.cache_clear()
+    _render_parts_block.cache_clear()
+    _part_line.cache_clear()
+    _render_catalog.cache_clear()
+    _tpt_builder.cache_clear()
+    _curation_part_row.cache_clear()
+    _curation_transform_row.cache_clear()
+
+def _field(obj: Any, key: str, default: Any = None) -> Any:
+    """Read a field from an ontology record given as a dict or an object"""
+    return obj.get(key, default) if isinstance(obj, dict) else getattr(obj, key, default)
+
+def prepare_transforms(transforms) -> Tuple[Any, ...]:
+    """
+    Sort transforms by processing order once per ontology load
     
-    prompt += "\nConstruct TPT combination. Return JSON with:"
-    prompt += "\n- part_id: selected part ID or null"
-    prompt += "\n- transforms: list of transform objects with id and params"
-    prompt += "\n- confidence: 0.0-1.0"
-    prompt += "\n- disposition: 'constructed', 'ambiguous', or 'skip'"
-    prompt += "\n- reason: brief explanation including biological reasoning"
-    prompt += "\n- new_parts: [] (if proposing new parts)"
-    prompt += "\n- new_transforms: [] (if proposing new transforms)"
+    get_enhanced_tpt_prompt lists transforms in the order given (it does not
+    re-sort per row), so pass it the tuple returned here. Transforms without
+    an order sort last, matching the 999 shown in the prompt.
+    """
+    return tuple(sorted(transforms, key=lambda t: _field(t, 'order') or 999))
+
+_PART_FIELDS = attrgetter('id', 'name', 'kind', 'applies_to')
+_TRANSFORM_FIELDS = attrgetter('id', 'order')
+
+# (transforms tuple, its listing key): the prepare_transforms tuple is reused for every row
+_last_transforms_key: Tuple[Any, Tuple[Tuple[Any, ...], ...]] = ((), ())
+
+def _transforms_key(available_transforms) -> Tuple[Tuple[Any, ...], ...]:
+    global _last_transforms_key
+    cached_transforms, cached_key = _last_transforms_key
+    if available_transforms is cached_transforms:
+        return cached_key
+    key = tuple((*_TRANSFORM_FIELDS(t), _param_keys(t)) for t in available_transforms)
+    if isinstance(available_transforms, tuple):
+        _last_transforms_key = (available_transforms, key)
+    return key
+
+# Same identity shortcut for parts: construct_batch passes one tuple per part group
+_last_parts_key: Tuple[Any, Tuple[Tuple[Any, ...], ...]] = ((), ())
+
+def _parts_key(applicable_parts) -> Tuple[Tuple[Any, ...], ...]:
+    global _last_parts_key
+    cached_parts, cached_key = _last_parts_key
+    if applicable_parts is cached_parts:
+        return cached_key
+    key = tuple(
+        (part_id, name, kind, tuple(applies_to or ()))
+        for part_id, name, kind, applies_to in map(_PART_FIELDS, applicable_parts)
+    )
+    if isinstance(applicable_parts, tuple):
+        _last_parts_key = (applicable_parts, key)
+    return key
+
+@lru_cache(maxsize=64)
+def _render_catalog(parts_key: Tuple[Tuple[Any, ...], ...], transforms_key: Tuple[Tuple[Any, ...], ...]) -> str:
+    """Whole transform + part listing; foods sharing an ontology snapshot and part set reuse it"""
+    transform_lines = [_render_transforms_block(transforms_key)] if transforms_key else []
+    part_lines = [_render_parts_block(parts_key)] if parts_key else []
+    return "\n".join([
+        "Available Transforms (ordered by processing sequence):",
+        *transform_lines,
+        "",
+        "Applicable Parts (JSON lines: id, n=name, k=kind, a=applies_to):",
+        *part_lines,
+    ])
+
+def _tpt_listing_lines(applicable_parts, available_transforms) -> List[str]:
+    """Transform and part listings shared by the single- and multi-row TPT prompts"""
+    return [_render_catalog(_parts_key(applicable_parts), _transforms_key(available_transforms))]
+
+# (food_name, taxon_id, confidence) in one call per resolution on the per-food path
+_RESOLUTION_FIELDS = attrgetter('food_name', 'taxon_id', 'confidence')
+
+@lru_cache(maxsize=64)
+def _tpt_builder(parts_key: Tuple[Tuple[Any, ...], ...], transforms_key: Tuple[Tuple[Any, ...], ...],
+                 head: str) -> Callable[[Any], str]:
+    # Everything up to the food name is fixed for a snapshot, so it is joined once
+    prefix = head + _render_catalog(parts_key, transforms_key) + "\n\nFood: "
+
+    def build(taxon_resolution) -> str:
+        food_name, taxon_id, confidence = _RESOLUTION_FIELDS(taxon_resolution)
+        return f"{prefix}{food_name}\nTaxon: {taxon_id}\nNCBI Confidence: {confidence:.2f}"
+
+    return build
+
+def compile_tpt_prompt_builder(applicable_parts, available_transforms,
+                               include_instructions: bool = True) -> Callable[[Any], str]:
+    """
+    Tier 2 user-prompt builder specialized to one part/transform snapshot
     
-    return prompt
+    The returned callable takes a taxon resolution and only substitutes its
+    food name, taxon and confidence into a precomputed string. Builders are
+    cached by snapshot content, so compiling again for the same listings is
+    cheap. With include_instructions=False the result is the user half of
+    get_tpt_prompt_pair (the instructions live in its system message).
+    """
+    head = _TPT_USER_PREFIX + "\n\n" if include_instructions else ""
+    return _tpt_builder(_parts_key(applicable_parts), _transforms_key(available_transforms), head)
 
-def get_remediation_system_prompt() -> str:
+def get_enhanced_tpt_prompt(taxon_resolution, applicable_parts, available_transforms) -> str:
+    """Enhanced Tier 2 user prompt with better context (transforms pre-sorted via prepare_transforms)."""
+    return compile_tpt_prompt_builder(applicable_parts, available_transforms)(taxon_resolution)
+
+@lru_cache(maxsize=16)
+def _tpt_static_system(kingdom: Optional[str], schema_key: Tuple[Tuple[Any, ...], ...]) -> str:
+    return sys.intern(_tpt_system_prompt(kingdom, schema_key) + "\n\n" + _TPT_USER_PREFIX)
+
+def get_tpt_prompt_pair(taxon_resolution, applicable_parts, available_transforms) -> Tuple[str, str]:
+    """(static system, dynamic user) messages for one Tier 2 food; the listings stay in the user message"""
+    build = compile_tpt_prompt_builder(applicable_parts, available_transforms, include_instructions=False)
+    system = _tpt_static_system(taxon_kingdom_code(taxon_resolution.taxon_id), _schema_key(available_transforms))
+    return system, build(taxon_resolution)
+
+_TPT_BATCH_PREFIX = (
+    _TPT_CONSIDER_BLOCK + "\n\n"
+    "Construct a TPT combination for each numbered food row below. All rows share the\n"
+    "applicable parts and available transforms listed here; rows are independent.\n"
+    + _BATCH_RETURN_JSON_HEADER + _RETURN_FIELDS["tpt"]
+)
+
+def get_enhanced_tpt_prompt_batch(taxon_resolutions, applicable_parts, available_transforms) -> str:
+    """Tier 2 user prompt for several foods sharing one part/transform listing (row marshaling)."""
+    rows = [
+        f"{i}. Food: {food_name} | Taxon: {taxon_id} | NCBI Confidence: {confidence:.2f}"
+        for i, (food_name, taxon_id, confidence) in enumerate(map(_RESOLUTION_FIELDS, taxon_resolutions), 1)
+    ]
+    return "\n".join([
+        _TPT_BATCH_PREFIX,
+        "",
+        *_tpt_listing_lines(applicable_parts, available_transforms),
+        "",
+        "Rows:",
+        *rows,
+        "",
+        f"Return exactly {len(rows)} results.",
+    ])
+
+def get_remediation_system_prompt(return_tokens: bool = False) -> Union[str, Tuple[str, int]]:
     """System prompt for Tier 3 validation error remediation"""
-    return """
-You are a senior food ontology curator specializing in validation error remediation and ontology bucketing strategy.
-
-YOUR MISSION: When Tier 2 creates a TPT that fails schema validation, you must decide whether to:
-1. MAP to existing broad values (preferred - fights drift)
-2. PROPOSE ontology expansion (high bar - only if nutritionally meaningful)
-3. REJECT (last resort - fundamentally wrong)
-
-BUCKETING PHILOSOPHY (CRITICAL):
-- Foods with similar nutrient profiles MUST map to the same TPT hash
-- Parameter values create buckets - too many values = bucket fragmentation = poor aggregation
-- Default to BROADER groupings, not narrower ones
-- Expansion requires: nutritional distinction + multiple foods + clear benefit
-
-REMEDIATION STRATEGIES:
-
-Strategy 1: MAP TO BROAD GROUP (90% of cases)
-Use when the invalid value is just "too specific" for an existing concept.
-
-Examples:
-- 'lactic_cultures' → 'culture_generic' (all generic fermentation)
-- 'thermophilic lactic cultures' → 'culture_generic' (unless actually yogurt)
-- 'whole_milk' → 'milk' (fat handled by tf:standardize_fat)
-- {'vitamin_A': 'added', 'vitamin_D': 'added'} → 'std_enriched'
-
-Strategy 2: PROPOSE EXPANSION (10% of cases, high bar)
-Use ONLY when ALL of:
-- Nutritional profiles are meaningfully different
-- Multiple foods (≥3) need this distinction
-- Current bucketing loses important nutritional signal
-- Clear use case for separate aggregation
-
-Strategy 3: REJECT (<1% of cases)
-Use when Tier 2 is fundamentally wrong (wrong transform, impossible combination, etc.)
-
-CRITICAL: corrected_tpt.transforms MUST be simple array: [{"id": "tf:xxx", "params": {...}}]
-DO NOT use custom fields like "step", "label", "transform_id", "status", "notes"
-ONLY use transforms that exist - DO NOT invent tf:drain, tf:salting, tf:separate_milk
-
-Return JSON with:
-{
-  "strategy": "map" | "expand" | "reject",
-  "corrected_tpt": {
-    "part_id": "...",
-    "transforms": [{"id": "tf:coagulate", "params": {"agent": "rennet", "substrate": "milk"}}]
-  },
-  "reasoning": "...",
-  "confidence": 0.0-1.0,
-  "overlay_proposal": {...}          // Only if strategy="expand"
-}
-""".strip()
+    return _with_tokens(_load_prompt("remediation_system"), return_tokens)
+
+def preload_system_prompts(available_transforms=None) -> None:
+    """
+    Render every static system prompt once, before LLM calls fan out
+
+    The tiers call the LLM from a thread pool in one process, so these cached
+    strings are shared by every worker; loading them up front keeps threads
+    from racing to read and render the same prompt files on their first call.
+    Pass the transforms Tier 2 will be given so its prompts match them.
+    """
+    _taxon_static_system()
+    schema_key = _schema_key(available_transforms)
+    for kingdom in (None, *_KINGDOM_PREFIXES):
+        _tpt_static_system(kingdom, schema_key)
+    for name in ("curation_system", "full_curation_system"):
+        _tier_system_prompt(name)
+    _load_prompt("remediation_system")
+
+# Static tail of the remediation user prompt, joined once at import
+_REMEDIATION_GUIDANCE = "\n".join([
+    "REMAPPING GUIDANCE:",
+    "tf:ferment 'starter':",
+    "  - 'lactic_cultures' → 'culture_generic'",
+    "  - 'thermophilic lactic cultures' → 'culture_generic' (for cheese)",
+    "  - 'mesophilic_starter' → 'culture_generic' (for cheese)",
+    "  - 'yogurt cultures' → 'yogurt_thermo' (only if actual yogurt)",
+    "",
+    "tf:enrich 'enrichment':",
+    "  - {dict with vitamins} → 'std_enriched'",
+    "  - individual vitamin params → remove, use 'std_enriched'",
+    "",
+    "tf:coagulate 'substrate':",
+    "  - 'whole_milk' / 'skim_milk' / '2%_milk' → 'milk'",
+    "",
+    "TASK: Remediate these errors using the bucketing philosophy. "
+    "Return corrected TPT with broad groupings.",
+    "",
+])
 
 def get_remediation_user_prompt(food_name: str, tpt_construction: Any, 
                                  validation_errors: List[Any]) -> str:
     """User prompt for Tier 3 remediation with validation error context"""
-    prompt = f"FOOD: {food_name}\n\n"
-    
-    prompt += "TIER 2 TPT (failed validation):\n"
-    prompt += f"  Taxon: {tpt_construction.taxon_id}\n"
-    prompt += f"  Part: {tpt_construction.part_id}\n"
-    prompt += f"  Transforms: {len(tpt_construction.transforms)}\n\n"
-    
-    prompt += "VALIDATION ERRORS:\n"
-    for i, error in enumerate(validation_errors, 1):
-        prompt += f"{i}. Transform {error.transform_index} ({error.transform_id}):\n"
-        prompt += f"   - Parameter '{error.param_name}': invalid value '{error.attempted_value}'\n"
-        prompt += f"   - Valid values: {error.valid_values}\n"
-        prompt += f"   - Error: {error.message}\n\n"
+    error_blocks = [
+        f"{i}. Transform {error.transform_index} ({error.transform_id}):\n"
+        f"   - Parameter '{error.param_name}': invalid value '{error.attempted_value}'\n"
+        f"   - Valid values: {error.valid_values}\n"
+        f"   - Error: {error.message}\n"
+        for i, error in enumerate(validation_errors, 1)
+    ]
     
-    prompt += "REMAPPING GUIDANCE:\n"
-    prompt += "tf:ferment 'starter':\n"
-    prompt += "  - 'lactic_cultures' → 'culture_generic'\n"
-    prompt += "  - 'thermophilic lactic cultures' → 'culture_generic' (for cheese)\n"
-    prompt += "  - 'mesophilic_starter' → 'culture_generic' (for cheese)\n"
-    prompt += "  - 'yogurt cultures' → 'yogurt_thermo' (only if actual yogurt)\n\n"
+    return "\n".join([
+        f"FOOD: {food_name}",
+        "",
+        "TIER 2 TPT (failed validation):",
+        f"  Taxon: {tpt_construction.taxon_id}",
+        f"  Part: {tpt_construction.part_id}",
+        f"  Transforms: {len(tpt_construction.transforms)}",
+        "",
+        "VALIDATION ERRORS:",
+        *error_blocks,
+        _REMEDIATION_GUIDANCE,
+    ])
+
+_CURATION_USER_PREFIX = """
+Analyze the TPT construction below against the ontology listed in the system prompt for ontology improvements:
+
+1. **Part Analysis**:
+- Is the selected part biologically accurate?
+- Should there be applies_to rules for this taxon?
+- Are there derived parts that would be more appropriate?
+- Does the part category match the biological structure?
+
+2. **Transform Analysis**:
+- Is the processing order correct?
+- Are the transform parameters appropriate?
+- Should transforms be grouped into families?
+- Are there missing processing steps?
+
+3. **Taxonomic Analysis**:
+- Is the taxon NCBI-verified?
+- Are there any orphaned or divergent taxa?
+- Should taxonomic relationships be updated?
+
+4. **Ontology Optimization**:
+- Are there consistency issues?
+- Can the ontology be simplified?
+- Are there validation rules to improve?
+
+Provide comprehensive curation recommendations based on our ontology patterns and data quality insights.
+""".strip()
+
+# Static prefix joined once; each curation prompt only appends its per-TPT lines
+_CURATION_FOOD_HEAD = _CURATION_USER_PREFIX + "\n\nFood: "
+
+# Per-listing token budget for the ontology context in the Tier 3 system prompt
+CURATION_LISTING_TOKEN_BUDGET = 800
+
+def _kingdom_prefix(taxon_id: str) -> str:
+    """tx:p:malus:domestica → tx:p"""
+    return ":".join(taxon_id.split(":")[:2]) if taxon_id else ""
+
+def _applicability_rank(record: Any, kingdom: str) -> int:
+    """0: applies to the kingdom, 1: applies everywhere, 2: restricted elsewhere"""
+    applies_to = _field(record, 'applies_to') or ()
+    if not applies_to:
+        return 1
+    for rule in applies_to:
+        prefix = rule.get('taxon_prefix', '') if isinstance(rule, dict) else str(rule)
+        if not prefix or prefix.startswith(kingdom):
+            return 0
+    return 2
+
+def rank_by_relevance(records, taxon_id: str = "") -> List[Any]:
+    """
+    Order ontology records so those applicable to taxon_id's kingdom come first
     
-    prompt += "tf:enrich 'enrichment':\n"
-    prompt += "  - {dict with vitamins} → 'std_enriched'\n"
-    prompt += "  - individual vitamin params → remove, use 'std_enriched'\n\n"
+    Only the kingdom is used, so every food of a kingdom gets the same listing
+    (and system prompt prefix). The sort is stable, so ontology order is kept
+    within each rank.
+    """
+    kingdom = _kingdom_prefix(taxon_id)
+    if not kingdom:
+        return list(records)
+    return sorted(records, key=lambda record: _applicability_rank(record, kingdom))
+
+@lru_cache(maxsize=4096)
+def _line_tokens(line: str, model: str) -> int:
+    """Token cost of one listing line plus its newline; lines repeat across TPTs"""
+    if tiktoken is None:
+        return len(line) // 4 + 1
+    return len(_encoding(model).encode(line)) + 1
+
+def pack_within_budget(items, render_fn, budget_tokens: int, model: str = "gpt-4o-mini") -> List[str]:
+    """
+    Render items in order until the next line would exceed budget_tokens
     
-    prompt += "tf:coagulate 'substrate':\n"
-    prompt += "  - 'whole_milk' / 'skim_milk' / '2%_milk' → 'milk'\n\n"
+    Items should already be ranked by relevance; packing stops at the first
+    line that does not fit so the listing is always a prefix of the ranking.
+    """
+    lines = []
+    used = 0
+    for item in items:
+        line = render_fn(item)
+        cost = _line_tokens(line, model)
+        if used + cost > budget_tokens:
+            break
+        lines.append(line)
+        used += cost
+    return lines
+
+# Listing rows repeat for every TPT curated against the same ontology, so each
+# is formatted (and interned) once per distinct record
+@lru_cache(maxsize=4096)
+def _curation_part_row(part_id: Any, name: Any, kind: Any) -> str:
+    return sys.intern(_json_line({"id": part_id, "n": name, "k": kind}))
+
+@lru_cache(maxsize=4096)
+def _curation_transform_row(transform_id: Any, name: Any, order: Any) -> str:
+    return sys.intern(_json_line({"id": transform_id, "n": name, "o": order}))
+
+def _curation_part_line(part: Any) -> str:
+    return _curation_part_row(_field(part, 'id'), _field(part, 'name'), _field(part, 'kind'))
+
+def _curation_transform_line(transform: Any) -> str:
+    return _curation_transform_row(_field(transform, 'id'), _field(transform, 'name'), _field(transform, 'order', 999))
+
+def _unique_by_id(records) -> List[Any]:
+    """records with repeated ids dropped (first wins), so no listing line is paid for twice"""
+    seen = set()
+    unique = []
+    for record in records:
+        record_id = _field(record, 'id')
+        if record_id not in seen:
+            seen.add(record_id)
+            unique.append(record)
+    return unique
+
+def build_curation_system_prompt_with_context(available_parts, available_transforms, taxon_id: str = "",
+                                              budget_tokens: int = CURATION_LISTING_TOKEN_BUDGET,
+                                              model: str = "gpt-4o-mini") -> str:
+    """
+    Tier 3 system prompt with the (budgeted) ontology listings appended
     
-    prompt += "TASK: Remediate these errors using the bucketing philosophy. "
-    prompt += "Return corrected TPT with broad groupings.\n"
+    Every TPT curated against the same ontology snapshot (and kingdom) gets the
+    same system message, so the listings land in the provider-cached prefix
+    instead of being re-sent in each user message. Each listing is packed up
+    to budget_tokens, most relevant to taxon_id's kingdom first; records with a
+    repeated id are listed once.
+    """
+    part_lines = pack_within_budget(rank_by_relevance(_unique_by_id(available_parts), taxon_id),
+                                    _curation_part_line, budget_tokens, model)
+    transform_lines = pack_within_budget(rank_by_relevance(_unique_by_id(available_transforms), taxon_id),
+                                         _curation_transform_line, budget_tokens, model)
+    return _curation_system_with_listings(tuple(part_lines), tuple(transform_lines))
+
+@lru_cache(maxsize=16)
+def _curation_system_with_listings(part_lines: Tuple[str, ...], transform_lines: Tuple[str, ...]) -> str:
+    """One system prompt string per distinct listing (i.e. per kingdom and ontology snapshot)"""
+    return sys.intern("\n".join([
+        _tier_system_prompt("curation_system"),
+        "",
+        "Available Parts (JSON lines: id, n=name, k=kind):",
+        *part_lines,
+        "",
+        "Available Transforms (JSON lines: id, n=name, o=order):",
+        *transform_lines,
+    ]))
+
+# Mass units normalized to grams so top_nutrients can rank across units;
+# energy and IU rows rank after all mass rows
+_GRAMS_PER_UNIT = {"g": 1.0, "mg": 1e-3, "ug": 1e-6, "µg": 1e-6, "mcg": 1e-6}
+
+def _nutrient_grams(nutrient: Dict[str, Any]) -> Tuple[int, float]:
+    try:
+        amount = float(nutrient.get('amount') or 0)
+    except (TypeError, ValueError):
+        return (0, 0.0)
+    factor = _GRAMS_PER_UNIT.get(str(nutrient.get('unit', '')).lower())
+    return (1, amount * factor) if factor is not None else (0, amount)
+
+def top_nutrients(nutrient_data, k: int = 5) -> List[Dict[str, Any]]:
+    """
+    The k most abundant nutrients (by mass) for a curation prompt
     
-    return prompt
+    Single heap pass (O(n log k)) over FDC nutrient dicts; ties keep input order.
+    """
+    return heapq.nlargest(k, nutrient_data, key=_nutrient_grams)
 
 def get_enhanced_curation_prompt(tpt, available_parts, available_transforms, nutrient_data) -> str:
-    """Enhanced Tier 3 user prompt with better context."""
-    prompt = f"Food: {tpt.food_name}\n"
-    prompt += f"Taxon: {tpt.taxon_id}\n"
-    prompt += f"Part: {tpt.part_id}\n"
-    prompt += f"Transforms: {[t.get('id') for t in tpt.transforms]}\n"
-    prompt += f"Confidence: {tpt.confidence:.2f}\n\n"
-    
-    prompt += "Analyze this TPT construction for ontology improvements:\n\n"
+    """
+    Enhanced Tier 3 user prompt with better context.
     
-    prompt += "1. **Part Analysis**:\n"
-    prompt += "- Is the selected part biologically accurate?\n"
-    prompt += "- Should there be applies_to rules for this taxon?\n"
-    prompt += "- Are there derived parts that would be more appropriate?\n"
-    prompt += "- Does the part category match the biological structure?\n\n"
-    
-    prompt += "2. **Transform Analysis**:\n"
-    prompt += "- Is the processing order correct?\n"
-    prompt += "- Are the transform parameters appropriate?\n"
-    prompt += "- Should transforms be grouped into families?\n"
-    prompt += "- Are there missing processing steps?\n\n"
-    
-    prompt += "3. **Taxonomic Analysis**:\n"
-    prompt += "- Is the taxon NCBI-verified?\n"
-    prompt += "- Are there any orphaned or divergent taxa?\n"
-    prompt += "- Should taxonomic relationships be updated?\n\n"
-    
-    prompt += "4. **Ontology Optimization**:\n"
-    prompt += "- Are there consistency issues?\n"
-    prompt += "- Can the ontology be simplified?\n"
-    prompt += "- Are there validation rules to improve?\n\n"
-    
-    prompt += "Available Parts:\n"
-    for part in available_parts[:10]:  # Show first 10 to avoid token limits
-        prompt += f"- {part.id}: {part.name} ({part.kind})\n"
-    
-    prompt += "\nAvailable Transforms:\n"
-    for transform in available_transforms[:10]:  # Show first 10 to avoid token limits
-        prompt += f"- {transform.id}: {transform.name} (order: {transform.get('order', 999)})\n"
+    Only the per-TPT block is rendered here; pair it with
+    build_curation_system_prompt_with_context(available_parts, available_transforms).
+    """
+    nutrient_lines = [
+        f"- {nutrient.get('name', 'Unknown')}: {nutrient.get('amount', 0)} {nutrient.get('unit', '')}"
+        for nutrient in top_nutrients(nutrient_data, 5)
+    ]
+    transform_ids = [t.get('id') for t in tpt.transforms]
     
-    prompt += "\nNutrient Data:\n"
-    for nutrient in nutrient_data[:5]:  # Show first 5 to avoid token limits
-        prompt += f"- {nutrient.get('name', 'Unknown')}: {nutrient.get('amount', 0)} {nutrient.get('unit', '')}\n"
+    return "\n".join([
+        _CURATION_FOOD_HEAD + str(tpt.food_name),
+        f"Taxon: {tpt.taxon_id}",
+        f"Part: {tpt.part_id}",
+        f"Transforms: {transform_ids}",
+        f"Confidence: {tpt.confidence:.2f}",
+        "",
+        "Nutrient Data:",
+        *nutrient_lines,
+        "",
+    ])
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+@lru_cache(maxsize=32)
+def _static_token_count(text: str, model: str) -> int:
+    """BPE cost of a static preamble, paid once per process"""
+    return len(_encoding(model).encode(text))
+
+def prompt_token_count(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Token count of a static prompt, computed once per process
     
-    prompt += "\nProvide comprehensive curation recommendations based on our ontology patterns and data quality insights."
+    Uses the model's tiktoken encoding (o200k_base when unknown); without
+    tiktoken it is the usual ~4 chars/token approximation.
+    """
+    if tiktoken is None:
+        return len(text) // 4
+    return _static_token_count(text, model)
+
+def _with_tokens(prompt: str, return_tokens: bool) -> Union[str, Tuple[str, int]]:
+    return (prompt, prompt_token_count(prompt)) if return_tokens else prompt
+
+def system_prompt_token_counts(model: str = "gpt-4o-mini") -> Dict[str, int]:
+    """Token size of each tier's system prompt, e.g. for run logs or cache-prefix checks"""
+    return {
+        "tier1_taxon": prompt_token_count(_tier_system_prompt("taxon_system"), model),
+        "tier2_tpt": prompt_token_count(_tpt_system_prompt(None, _schema_key(None)), model),
+        "tier3_curation": prompt_token_count(_tier_system_prompt("curation_system"), model),
+        "tier3_full_curation": prompt_token_count(_tier_system_prompt("full_curation_system"), model),
+        "tier3_remediation": prompt_token_count(_load_prompt("remediation_system"), model),
+    }
+
+def estimate_prompt_tokens(prompt: str, static_prefix: str = "", model: str = "gpt-4o-mini") -> int:
+    """
+    Estimate the token count of a prompt built as static_prefix + dynamic tail
     
-    return prompt
+    The static prefix is tokenized once and cached, so per-call cost is only
+    the tail. Counts may differ by a token at the seam. Without tiktoken this
+    is the usual ~4 chars/token approximation.
+    """
+    if tiktoken is None:
+        return len(prompt) // 4
+    if static_prefix and prompt.startswith(static_prefix):
+        tail = prompt[len(static_prefix):]
+        return _static_token_count(static_prefix, model) + len(_encoding(model).encode(tail))
+    return len(_encoding(model).encode(prompt))
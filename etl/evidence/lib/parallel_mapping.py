@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Process-Parallel Mapping Helpers
+
+Shards FDC-to-INFOODS nutrient mapping, the bulk non-LLM part of evidence
+mapping, across worker processes. Each worker builds its own NutrientMapper
+once in the pool initializer, so per-item work is pure in-process lookups.
+"""
+
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple, TypeVar
+
+from .nutrient_mapper import NutrientMapper, UnmappedNutrientInfo
+
+# Per-process state populated by _init_worker
+_worker_mapper: Optional[NutrientMapper] = None
+
+T = TypeVar('T')
+
+# (food_id, nutrient_row dicts, unmapped nutrients)
+FoodNutrientResult = Tuple[str, List[Dict[str, Any]], List[UnmappedNutrientInfo]]
+
+def _init_worker(nutrients_json_path: Path) -> None:
+    """Pool initializer: build the mapper once per worker process"""
+    global _worker_mapper
+    # Unmapped rows are returned to the parent, so workers keep no spill file
+    _worker_mapper = NutrientMapper(nutrients_json_path, unmapped_path=Path(os.devnull))
+
+def _map_nutrient_chunk(fdc_nutrients: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[UnmappedNutrientInfo]]:
+    rows = []
+    unmapped = []
+    for fdc_nutrient in fdc_nutrients:
+        result = _worker_mapper.map_fdc_nutrient(fdc_nutrient)
+        if result.mapped:
+            rows.append(result.nutrient_row)
+        else:
+            unmapped.append(result.unmapped_info)
+    return rows, unmapped
+
+def _map_food_nutrients(item: Tuple[str, List[Dict[str, Any]]]) -> FoodNutrientResult:
+    food_id, fdc_nutrients = item
+    return (food_id, *_map_nutrient_chunk(fdc_nutrients))
+
+def _default_workers() -> int:
+    return min(8, os.cpu_count() or 1)
+
+def map_chunks_parallel(fn: Callable[..., T], items: List[Any], chunk_size: int, *args: Any,
+                        max_workers: Optional[int] = None, initializer: Optional[Callable[..., None]] = None,
+                        initargs: Tuple[Any, ...] = ()) -> List[T]:
+    """
+    Run fn over chunk_size slices of items across worker processes
+
+    Every call also receives args (pickled once per task). The one pool
+    helper for chunked work, so every caller shares the worker default.
+
+    Returns:
+        fn's result for each chunk, in input order
+    """
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    with ProcessPoolExecutor(max_workers=max_workers or _default_workers(),
+                             initializer=initializer, initargs=initargs) as ex:
+        return list(ex.map(fn, chunks, *(repeat(arg) for arg in args)))
+
+def map_nutrients_parallel(nutrients_by_food: Dict[str, List[Dict[str, Any]]], nutrients_json_path: Path,
+                           max_workers: Optional[int] = None, chunksize: int = 64) -> Dict[str, FoodNutrientResult]:
+    """
+    Map every food's FDC nutrients to INFOODS rows across worker processes
+
+    Args:
+        nutrients_by_food: FDC nutrient dicts grouped by food ID
+        nutrients_json_path: Path to nutrients.json
+        max_workers: Worker processes (default: min(8, CPU count))
+        chunksize: Foods sent to a worker per task
+
+    Returns:
+        food_id → (food_id, nutrient_row dicts, unmapped nutrients)
+    """
+    items: Iterable[Tuple[str, List[Dict[str, Any]]]] = nutrients_by_food.items()
+    with ProcessPoolExecutor(max_workers=max_workers or _default_workers(),
+                             initializer=_init_worker, initargs=(nutrients_json_path,)) as ex:
+        return {result[0]: result for result in ex.map(_map_food_nutrients, items, chunksize=chunksize)}
+
+def map_nutrient_list_parallel(fdc_nutrients: List[Dict[str, Any]], nutrients_json_path: Path,
+                               chunk_size: int = 2000, max_workers: Optional[int] = None
+                               ) -> Tuple[List[Dict[str, Any]], List[UnmappedNutrientInfo]]:
+    """
+    Map a flat list of FDC nutrient dicts across worker processes
+
+    Returns:
+        (nutrient_row dicts, unmapped nutrients), both in input order
+    """
+    rows: List[Dict[str, Any]] = []
+    unmapped: List[UnmappedNutrientInfo] = []
+    for chunk_rows, chunk_unmapped in map_chunks_parallel(_map_nutrient_chunk, fdc_nutrients, chunk_size,
+                                                          max_workers=max_workers, initializer=_init_worker,
+                                                          initargs=(nutrients_json_path,)):
+        rows.extend(chunk_rows)
+        unmapped.extend(chunk_unmapped)
+    return rows, unmapped
@@ -8,8 +8,12 @@ Uses NCBI lineage data to determine which parts are applicable to specific taxa.
 
 from __future__ import annotations
 import json
+import logging
+import re
+import sys
 from pathlib import Path
-from typing import Dict, Any, List, Set, Optional
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, Iterator, List, Set, Optional, Tuple
 from dataclasses import dataclass
 
 # Try absolute imports first, fall back to relative
@@ -19,14 +23,51 @@ except ImportError:
     # Fall back to relative imports when running from etl directory
     from evidence.db import Part
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+# Part-name keywords that select a specific lineage / derivation rule, in
+# priority order (a name containing both "fruit" and "seed" gets the fruit rule)
+_LINEAGE_RULE_KEYWORDS = ('fruit', 'seed', 'milk')
+_DERIVED_RULE_KEYWORDS = ('oil', 'flour', 'meal')
+
+@lru_cache(maxsize=1024)
+def _rule_keyword(part_name: str, keywords: Tuple[str, ...]) -> Optional[str]:
+    """First keyword contained in a lowercased part name (the same parts recur for every taxon)"""
+    return next((keyword for keyword in keywords if keyword in part_name), None)
+
+# Lineage rank substrings that identify angiosperms and seed plants, one
+# alternation each instead of a substring scan per name
+_ANGIOSPERM_CLASS_RE = re.compile(r'eudicot|monocot|magnoliopsida|liliopsida')
+_SEED_PLANT_CLASS_RE = re.compile(r'magnoliopsida|liliopsida|pinopsida|gnetopsida')
+_SEED_PLANT_PHYLUM_RE = re.compile(r'streptophyta|spermatophyta')
+
+# Biological part kind → the only kingdom it can apply to (absent applies_to)
+_KIND_KINGDOMS = {'plant': 'plantae', 'animal': 'animalia', 'fungus': 'fungi'}
+
+# Taxon ID kingdom codes and NCBI kingdom names → the kingdom names rules use
+_KINGDOM_CODES = {'p': 'plantae', 'a': 'animalia', 'f': 'fungi'}
+_NCBI_KINGDOMS = {'viridiplantae': 'plantae', 'metazoa': 'animalia', 'fungi': 'fungi'}
+
+# Slotted dataclasses need Python 3.10+; older interpreters keep a __dict__
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_SLOTS)
 class PartApplicability:
-    """Result of part applicability filtering"""
+    """Result of part applicability filtering (immutable, so results can be shared)"""
     part_id: str
     applicable: bool
     confidence: float
     reason: str
-    lineage_matches: List[str]
+    lineage_matches: Tuple[str, ...]
+
+@dataclass(frozen=True, **_SLOTS)
+class TaxonContext:
+    """A taxon's ID segments and lineage ranks, derived once and shared by every part check"""
+    taxon_id: str
+    segments: Tuple[str, ...]
+    kingdom: str
+    class_name: str
+    phylum: str
 
 class PartFilter:
     """Lineage-based part applicability filter"""
@@ -36,6 +77,16 @@ class PartFilter:
         self.graph_db_path = graph_db_path
         if not graph_db_path.exists():
             raise FileNotFoundError(f"Graph database not found: {graph_db_path}")
+        # Part-name keyword → rule, so each part takes one lookup instead of an if-cascade
+        self._lineage_rules = {'fruit': self._fruit_rule, 'seed': self._seed_rule, 'milk': self._milk_rule}
+        self._derived_rules = {'oil': self._oil_rule, 'flour': self._flour_rule, 'meal': self._flour_rule}
+        # (part_id, kingdom, class, phylum) → verdict; rejections carry no lineage
+        # matches, so the cached instance itself is shared by every taxon it covers
+        self._verdict_cache: Dict[Tuple[str, str, str, str], PartApplicability] = {}
+        # part_id → (applies_to list, its frozenset) for O(1) taxon/ancestor membership
+        self._applies_to_sets: Dict[str, Tuple[List[str], FrozenSet[str]]] = {}
+        # (parts list, kingdom → parts not ruled out by kingdom alone)
+        self._kingdom_candidates_cache: Tuple[Any, Dict[str, List[Part]]] = ((), {})
     
     def filter_parts_for_taxon(self, taxon_id: str, lineage: Dict[str, str], 
                              available_parts: List[Dict[str, Any]]) -> List[PartApplicability]:
@@ -50,34 +101,104 @@ class PartFilter:
         Returns:
             List of PartApplicability results
         """
-        results = []
+        ctx = self._taxon_context(taxon_id, lineage)
+        return [self._check_part_applicability(part, ctx) for part in available_parts]
+    
+    def batch_filter(self, taxa: List[str], lineages: List[Dict[str, str]],
+                     available_parts: List[Part], min_confidence: float = 0.5) -> List[List[bool]]:
+        """
+        Applicability matrix for many taxa against one parts list
         
-        for part in available_parts:
-            applicability = self._check_part_applicability(part, taxon_id, lineage)
-            results.append(applicability)
+        Args:
+            taxa: Taxon IDs
+            lineages: NCBI lineage data, one per taxon
+            available_parts: List of available parts from ontology
+            min_confidence: Threshold a part must reach to count as applicable
+        
+        Returns:
+            One row per taxon, one bool per part (same order as available_parts)
+        """
+        # Rule-based parts depend only on (kingdom, class, phylum), so their columns
+        # are computed once per distinct signature; applies_to parts need the taxon ID
+        rule_rows: Dict[Tuple[str, str, str], List[bool]] = {}
+        explicit = [(i, part) for i, part in enumerate(available_parts) if getattr(part, 'applies_to', None)]
+        matrix = []
+        for taxon_id, lineage in zip(taxa, lineages):
+            ctx = self._taxon_context(taxon_id, lineage)
+            signature = (ctx.kingdom, ctx.class_name, ctx.phylum)
+            rule_row = rule_rows.get(signature)
+            if rule_row is None:
+                rule_row = rule_rows[signature] = [
+                    False if getattr(part, 'applies_to', None) else self._is_applicable(part, ctx, min_confidence)
+                    for part in available_parts
+                ]
+            row = rule_row.copy()
+            for i, part in explicit:
+                row[i] = self._is_applicable(part, ctx, min_confidence)
+            matrix.append(row)
+        return matrix
+    
+    def _is_applicable(self, part: Part, ctx: TaxonContext, min_confidence: float) -> bool:
+        applicability = self._check_part_applicability(part, ctx)
+        return applicability.applicable and applicability.confidence >= min_confidence
+    
+    def _taxon_context(self, taxon_id: str, lineage: Dict[str, str]) -> TaxonContext:
+        """The taxon's split ID and lineage ranks; the same for every part, so derived once per taxon"""
+        segments = tuple(taxon_id.split(':')) if taxon_id else ()
+        return TaxonContext(taxon_id, segments, self._resolve_kingdom(segments, lineage),
+                            lineage.get('class', '').lower(), lineage.get('phylum', '').lower())
+    
+    def _kingdom_candidates(self, available_parts: List[Part], kingdom: str) -> List[Part]:
+        """
+        available_parts minus the biological parts ruled out by kingdom alone
         
-        return results
+        A plant/animal/fungus part with no applies_to list is never applicable
+        outside its kingdom, so those are dropped per kingdom once per parts list
+        (the mapper passes the same list for every food). Order is preserved.
+        """
+        cached_parts, by_kingdom = self._kingdom_candidates_cache
+        if cached_parts is not available_parts:
+            by_kingdom = {}
+            self._kingdom_candidates_cache = (available_parts, by_kingdom)
+        candidates = by_kingdom.get(kingdom)
+        if candidates is None:
+            candidates = by_kingdom[kingdom] = [
+                part for part in available_parts
+                if getattr(part, 'applies_to', None)
+                or _KIND_KINGDOMS.get(getattr(part, 'kind', ''), kingdom) == kingdom
+            ]
+        return candidates
     
-    def _check_part_applicability(self, part: Part, taxon_id: str, 
-                                lineage: Dict[str, str]) -> PartApplicability:
+    def _resolve_kingdom(self, segments: Tuple[str, ...], lineage: Dict[str, str]) -> str:
+        """Kingdom name (plantae/animalia/fungi) from lineage, else from the split taxon ID"""
+        kingdom = lineage.get('kingdom', '').lower()
+        if not kingdom and len(segments) > 1 and segments[0] == 'tx':
+            kingdom = _KINGDOM_CODES.get(segments[1], '')
+        
+        # Map NCBI kingdom names to our expected names
+        return _NCBI_KINGDOMS.get(kingdom, kingdom)
+    
+    def _check_part_applicability(self, part: Part, ctx: TaxonContext) -> PartApplicability:
         """Check if a specific part is applicable to a taxon"""
         part_id = part.id
+        taxon_id = ctx.taxon_id
         applies_to = getattr(part, 'applies_to', [])
         kind = getattr(part, 'kind', '')
         
         # If part has explicit applies_to list, check if taxon is included
         if applies_to:
+            applies_to = self._applies_to_set(part_id, applies_to)
             if taxon_id in applies_to:
                 return PartApplicability(
                     part_id=part_id,
                     applicable=True,
                     confidence=1.0,
                     reason="Explicitly listed in applies_to",
-                    lineage_matches=[taxon_id]
+                    lineage_matches=(taxon_id,)
                 )
             else:
                 # Check if any parent taxon is in applies_to
-                parent_matches = self._check_parent_applicability(taxon_id, applies_to)
+                parent_matches = self._check_parent_applicability(ctx.segments, applies_to)
                 if parent_matches:
                     return PartApplicability(
                         part_id=part_id,
@@ -92,30 +213,55 @@ class PartFilter:
                         applicable=False,
                         confidence=0.0,
                         reason="Not in applies_to list",
-                        lineage_matches=[]
+                        lineage_matches=()
                     )
         
+        # Without applies_to the verdict depends only on the part and the taxon's
+        # (kingdom, class, phylum), which many taxa in a run share
+        key = (part_id, ctx.kingdom, ctx.class_name, ctx.phylum)
+        verdict = self._verdict_cache.get(key)
+        if verdict is None:
+            verdict = self._verdict_cache[key] = self._check_rule_applicability(part, kind, ctx)
+            return verdict
+        if not verdict.lineage_matches:
+            return verdict
+        return PartApplicability(
+            part_id=part_id,
+            applicable=verdict.applicable,
+            confidence=verdict.confidence,
+            reason=verdict.reason,
+            lineage_matches=(taxon_id,)
+        )
+    
+    def _check_rule_applicability(self, part: Part, kind: str, ctx: TaxonContext) -> PartApplicability:
+        """Rule-based applicability for a part without an applies_to list"""
         # Use lineage-based rules for biological parts
         if kind in ['plant', 'animal', 'fungus']:
-            return self._check_lineage_based_applicability(part, taxon_id, lineage)
+            return self._check_lineage_based_applicability(part, ctx)
         
         # For derived parts, check if they can be derived from this taxon
         if kind == 'derived':
-            return self._check_derived_part_applicability(part, taxon_id, lineage)
+            return self._check_derived_part_applicability(part, ctx)
         
         # Default: applicable with low confidence
         return PartApplicability(
-            part_id=part_id,
+            part_id=part.id,
             applicable=True,
             confidence=0.3,
             reason="No specific rules, default applicable",
-            lineage_matches=[]
+            lineage_matches=()
         )
     
-    def _check_parent_applicability(self, taxon_id: str, applies_to: List[str]) -> List[str]:
-        """Check if any parent taxon is in the applies_to list"""
+    def _applies_to_set(self, part_id: str, applies_to: List[str]) -> FrozenSet[str]:
+        """applies_to as a set, built once per part (rebuilt if the list is replaced)"""
+        cached = self._applies_to_sets.get(part_id)
+        if cached is None or cached[0] is not applies_to:
+            cached = self._applies_to_sets[part_id] = (applies_to, frozenset(applies_to))
+        return cached[1]
+    
+    def _check_parent_applicability(self, segments: Tuple[str, ...], applies_to: FrozenSet[str]) -> Tuple[str, ...]:
+        """Check if any parent taxon (of the split taxon ID) is in the applies_to list"""
         matches = []
-        segments = taxon_id.split(':')
         
         # Check progressively shorter taxon IDs (parent, grandparent, etc.)
         for i in range(len(segments) - 1, 1, -1):  # Don't go below kingdom level
@@ -123,28 +269,13 @@ class PartFilter:
             if parent_id in applies_to:
                 matches.append(parent_id)
         
-        return matches
+        return tuple(matches)
     
-    def _check_lineage_based_applicability(self, part: Part, taxon_id: str, 
-                                         lineage: Dict[str, str]) -> PartApplicability:
+    def _check_lineage_based_applicability(self, part: Part, ctx: TaxonContext) -> PartApplicability:
         """Check applicability based on biological lineage rules"""
         part_id = part.id
         kind = part.kind or ''
-        
-        # Extract kingdom from lineage or taxon_id
-        kingdom = lineage.get('kingdom', '').lower()
-        if not kingdom and taxon_id and taxon_id.startswith('tx:'):
-            kingdom_code = taxon_id.split(':')[1] if len(taxon_id.split(':')) > 1 else ''
-            kingdom_map = {'p': 'plantae', 'a': 'animalia', 'f': 'fungi'}
-            kingdom = kingdom_map.get(kingdom_code, '').lower()
-        
-        # Map NCBI kingdom names to our expected names
-        kingdom_mapping = {
-            'viridiplantae': 'plantae',
-            'metazoa': 'animalia',
-            'fungi': 'fungi'
-        }
-        kingdom = kingdom_mapping.get(kingdom, kingdom)
+        kingdom = ctx.kingdom
         
         # Basic kingdom-level filtering
         if kind == 'plant' and kingdom != 'plantae':
@@ -153,7 +284,7 @@ class PartFilter:
                 applicable=False,
                 confidence=0.0,
                 reason="Plant part for non-plant taxon",
-                lineage_matches=[]
+                lineage_matches=()
             )
         
         if kind == 'animal' and kingdom != 'animalia':
@@ -162,7 +293,7 @@ class PartFilter:
                 applicable=False,
                 confidence=0.0,
                 reason="Animal part for non-animal taxon",
-                lineage_matches=[]
+                lineage_matches=()
             )
         
         if kind == 'fungus' and kingdom != 'fungi':
@@ -171,102 +302,13 @@ class PartFilter:
                 applicable=False,
                 confidence=0.0,
                 reason="Fungus part for non-fungus taxon",
-                lineage_matches=[]
+                lineage_matches=()
             )
         
-        # Apply specific biological rules based on part type
-        part_name = (part.name or '').lower()
-        
-        # Fruit parts - only for angiosperms
-        if 'fruit' in part_name:
-            if kingdom == 'plantae':
-                # Check if it's an angiosperm (has flowers/fruits)
-                class_name = lineage.get('class', '').lower()
-                if any(angiosperm_class in class_name for angiosperm_class in ['eudicot', 'monocot', 'magnoliopsida', 'liliopsida']):
-                    return PartApplicability(
-                        part_id=part_id,
-                        applicable=True,
-                        confidence=0.9,
-                        reason="Fruit part for angiosperm",
-                        lineage_matches=[taxon_id]
-                    )
-                else:
-                    return PartApplicability(
-                        part_id=part_id,
-                        applicable=False,
-                        confidence=0.0,
-                        reason="Fruit part for non-angiosperm",
-                        lineage_matches=[]
-                    )
-            else:
-                return PartApplicability(
-                    part_id=part_id,
-                    applicable=False,
-                    confidence=0.0,
-                    reason="Fruit part for non-plant",
-                    lineage_matches=[]
-                )
-        
-        # Seed parts - only for seed plants
-        if 'seed' in part_name:
-            if kingdom == 'plantae':
-                # Check if it's a seed plant (not mosses, ferns, etc.)
-                class_name = lineage.get('class', '').lower()
-                phylum = lineage.get('phylum', '').lower()
-                if any(seed_plant in class_name for seed_plant in ['magnoliopsida', 'liliopsida', 'pinopsida', 'gnetopsida']) or \
-                   any(seed_plant in phylum for seed_plant in ['streptophyta', 'spermatophyta']):
-                    return PartApplicability(
-                        part_id=part_id,
-                        applicable=True,
-                        confidence=0.9,
-                        reason="Seed part for seed plant",
-                        lineage_matches=[taxon_id]
-                    )
-                else:
-                    return PartApplicability(
-                        part_id=part_id,
-                        applicable=False,
-                        confidence=0.0,
-                        reason="Seed part for non-seed plant",
-                        lineage_matches=[]
-                    )
-            else:
-                return PartApplicability(
-                    part_id=part_id,
-                    applicable=False,
-                    confidence=0.0,
-                    reason="Seed part for non-plant",
-                    lineage_matches=[]
-                )
-        
-        # Milk parts - only for mammals
-        if 'milk' in part_name:
-            if kingdom == 'animalia':
-                class_name = lineage.get('class', '').lower()
-                if 'mammalia' in class_name or 'mammal' in class_name:
-                    return PartApplicability(
-                        part_id=part_id,
-                        applicable=True,
-                        confidence=0.9,
-                        reason="Milk part for mammal",
-                        lineage_matches=[taxon_id]
-                    )
-                else:
-                    return PartApplicability(
-                        part_id=part_id,
-                        applicable=False,
-                        confidence=0.0,
-                        reason="Milk part for non-mammal",
-                        lineage_matches=[]
-                    )
-            else:
-                return PartApplicability(
-                    part_id=part_id,
-                    applicable=False,
-                    confidence=0.0,
-                    reason="Milk part for non-animal",
-                    lineage_matches=[]
-                )
+        # Specific biological rules, selected by a keyword in the part name
+        rule = self._lineage_rules.get(_rule_keyword((part.name or '').lower(), _LINEAGE_RULE_KEYWORDS))
+        if rule is not None:
+            return rule(part_id, ctx)
         
         # Default: applicable with medium confidence
         return PartApplicability(
@@ -274,67 +316,16 @@ class PartFilter:
             applicable=True,
             confidence=0.7,
             reason="Lineage-based rules satisfied",
-            lineage_matches=[taxon_id]
+            lineage_matches=(ctx.taxon_id,)
         )
     
-    def _check_derived_part_applicability(self, part: Part, taxon_id: str, 
-                                        lineage: Dict[str, str]) -> PartApplicability:
+    def _check_derived_part_applicability(self, part: Part, ctx: TaxonContext) -> PartApplicability:
         """Check if a derived part can be derived from this taxon"""
         part_id = part.id
-        part_name = (part.name or '').lower()
-        
-        # Extract kingdom from lineage or taxon_id
-        kingdom = lineage.get('kingdom', '').lower()
-        if not kingdom and taxon_id and taxon_id.startswith('tx:'):
-            kingdom_code = taxon_id.split(':')[1] if len(taxon_id.split(':')) > 1 else ''
-            kingdom_map = {'p': 'plantae', 'a': 'animalia', 'f': 'fungi'}
-            kingdom = kingdom_map.get(kingdom_code, '').lower()
-        
-        # Map NCBI kingdom names to our expected names
-        kingdom_mapping = {
-            'viridiplantae': 'plantae',
-            'metazoa': 'animalia',
-            'fungi': 'fungi'
-        }
-        kingdom = kingdom_mapping.get(kingdom, kingdom)
         
-        # Oil parts - can be derived from plants and some animals
-        if 'oil' in part_name:
-            if kingdom in ['plantae', 'animalia']:
-                return PartApplicability(
-                    part_id=part_id,
-                    applicable=True,
-                    confidence=0.8,
-                    reason="Oil can be derived from plant or animal",
-                    lineage_matches=[taxon_id]
-                )
-            else:
-                return PartApplicability(
-                    part_id=part_id,
-                    applicable=False,
-                    confidence=0.0,
-                    reason="Oil cannot be derived from this kingdom",
-                    lineage_matches=[]
-                )
-        
-        # Flour parts - can be derived from plants
-        if 'flour' in part_name or 'meal' in part_name:
-            if kingdom == 'plantae':
-                return PartApplicability(
-                    part_id=part_id,
-                    applicable=True,
-                    confidence=0.9,
-                    reason="Flour can be derived from plant",
-                    lineage_matches=[taxon_id]
-                )
-            else:
-                return PartApplicability(
-                    part_id=part_id,
-                    applicable=False,
-                    confidence=0.0,
-                    reason="Flour cannot be derived from non-plant",
-                    lineage_matches=[]
-                )
+        rule = self._derived_rules.get(_rule_keyword((part.name or '').lower(), _DERIVED_RULE_KEYWORDS))
+        if rule is not None:
+            return rule(part_id, ctx)
         
         # Default for derived parts
         return PartApplicability(
@@ -342,25 +333,144 @@ class PartFilter:
             applicable=True,
             confidence=0.5,
             reason="Derived part generally applicable",
-            lineage_matches=[taxon_id]
+            lineage_matches=(ctx.taxon_id,)
         )
     
+    def _fruit_rule(self, part_id: str, ctx: TaxonContext) -> PartApplicability:
+        """Fruit parts - only for angiosperms"""
+        if ctx.kingdom != 'plantae':
+            return PartApplicability(
+                part_id=part_id,
+                applicable=False,
+                confidence=0.0,
+                reason="Fruit part for non-plant",
+                lineage_matches=()
+            )
+        # Check if it's an angiosperm (has flowers/fruits)
+        if _ANGIOSPERM_CLASS_RE.search(ctx.class_name):
+            return PartApplicability(
+                part_id=part_id,
+                applicable=True,
+                confidence=0.9,
+                reason="Fruit part for angiosperm",
+                lineage_matches=(ctx.taxon_id,)
+            )
+        return PartApplicability(
+            part_id=part_id,
+            applicable=False,
+            confidence=0.0,
+            reason="Fruit part for non-angiosperm",
+            lineage_matches=()
+        )
+    
+    def _seed_rule(self, part_id: str, ctx: TaxonContext) -> PartApplicability:
+        """Seed parts - only for seed plants"""
+        if ctx.kingdom != 'plantae':
+            return PartApplicability(
+                part_id=part_id,
+                applicable=False,
+                confidence=0.0,
+                reason="Seed part for non-plant",
+                lineage_matches=()
+            )
+        # Check if it's a seed plant (not mosses, ferns, etc.)
+        if _SEED_PLANT_CLASS_RE.search(ctx.class_name) or _SEED_PLANT_PHYLUM_RE.search(ctx.phylum):
+            return PartApplicability(
+                part_id=part_id,
+                applicable=True,
+                confidence=0.9,
+                reason="Seed part for seed plant",
+                lineage_matches=(ctx.taxon_id,)
+            )
+        return PartApplicability(
+            part_id=part_id,
+            applicable=False,
+            confidence=0.0,
+            reason="Seed part for non-seed plant",
+            lineage_matches=()
+        )
+    
+    def _milk_rule(self, part_id: str, ctx: TaxonContext) -> PartApplicability:
+        """Milk parts - only for mammals"""
+        if ctx.kingdom != 'animalia':
+            return PartApplicability(
+                part_id=part_id,
+                applicable=False,
+                confidence=0.0,
+                reason="Milk part for non-animal",
+                lineage_matches=()
+            )
+        if 'mammalia' in ctx.class_name or 'mammal' in ctx.class_name:
+            return PartApplicability(
+                part_id=part_id,
+                applicable=True,
+                confidence=0.9,
+                reason="Milk part for mammal",
+                lineage_matches=(ctx.taxon_id,)
+            )
+        return PartApplicability(
+            part_id=part_id,
+            applicable=False,
+            confidence=0.0,
+            reason="Milk part for non-mammal",
+            lineage_matches=()
+        )
+    
+    def _oil_rule(self, part_id: str, ctx: TaxonContext) -> PartApplicability:
+        """Oil parts - can be derived from plants and some animals"""
+        if ctx.kingdom in ['plantae', 'animalia']:
+            return PartApplicability(
+                part_id=part_id,
+                applicable=True,
+                confidence=0.8,
+                reason="Oil can be derived from plant or animal",
+                lineage_matches=(ctx.taxon_id,)
+            )
+        return PartApplicability(
+            part_id=part_id,
+            applicable=False,
+            confidence=0.0,
+            reason="Oil cannot be derived from this kingdom",
+            lineage_matches=()
+        )
+    
+    def _flour_rule(self, part_id: str, ctx: TaxonContext) -> PartApplicability:
+        """Flour/meal parts - can be derived from plants"""
+        if ctx.kingdom == 'plantae':
+            return PartApplicability(
+                part_id=part_id,
+                applicable=True,
+                confidence=0.9,
+                reason="Flour can be derived from plant",
+                lineage_matches=(ctx.taxon_id,)
+            )
+        return PartApplicability(
+            part_id=part_id,
+            applicable=False,
+            confidence=0.0,
+            reason="Flour cannot be derived from non-plant",
+            lineage_matches=()
+        )
+    
+    def iter_applicable(self, taxon_id: str, lineage: Dict[str, str], available_parts: List[Part],
+                        min_confidence: float = 0.5) -> Iterator[Tuple[Part, PartApplicability]]:
+        """Yield (part, applicability) for each part above the confidence threshold, in order"""
+        ctx = self._taxon_context(taxon_id, lineage)
+        for part in self._kingdom_candidates(available_parts, ctx.kingdom):
+            applicability = self._check_part_applicability(part, ctx)
+            if applicability.applicable and applicability.confidence >= min_confidence:
+                yield part, applicability
+    
     def get_applicable_parts(self, taxon_id: str, lineage: Dict[str, str], 
                            available_parts: List[Dict[str, Any]], 
                            min_confidence: float = 0.5) -> List[Dict[str, Any]]:
         """Get list of applicable parts above confidence threshold"""
-        print(f"[PART FILTER] → Checking {len(available_parts)} parts for taxon {taxon_id}")
-        print(f"[PART FILTER] → Lineage: {lineage}")
-        
-        applicability_results = self.filter_parts_for_taxon(taxon_id, lineage, available_parts)
+        # Lazy %-style args: the lineage dict is only formatted when debug logging is on
+        logger.debug("[PART FILTER] → Checking %d parts for taxon %s", len(available_parts), taxon_id)
+        logger.debug("[PART FILTER] → Lineage: %r", lineage)
         
-        applicable_parts = []
-        skipped_count = 0
-        for part, applicability in zip(available_parts, applicability_results):
-            if applicability.applicable and applicability.confidence >= min_confidence:
-                applicable_parts.append(part)
-            else:
-                skipped_count += 1
+        applicable_parts = [part for part, _ in self.iter_applicable(taxon_id, lineage, available_parts, min_confidence)]
+        skipped_count = len(available_parts) - len(applicable_parts)
         
-        print(f"[PART FILTER] → Found {len(applicable_parts)} applicable parts ({skipped_count} skipped)")
+        logger.debug("[PART FILTER] → Found %d applicable parts (%d skipped)", len(applicable_parts), skipped_count)
         return applicable_parts
@@ -7,21 +7,52 @@ according to the ontology schema. Rejects invalid mappings.
 """
 
 from __future__ import annotations
-from typing import Dict, Any, List, Tuple, Optional
+from functools import cached_property, partial
+from typing import Callable, Dict, Any, FrozenSet, Iterable, List, Optional, Tuple, Union
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True)
 class ValidationError:
     """Structured validation error for Tier 3 remediation"""
     transform_index: int
     transform_id: str
-    error_type: str  # 'invalid_enum', 'unknown_param', 'type_mismatch', 'invalid_part'
+    error_type: str  # 'invalid_enum', 'unknown_param', 'type_mismatch', 'invalid_part', 'invalid_transform'
     param_name: Optional[str] = None
     attempted_value: Any = None
-    valid_values: Optional[List[Any]] = None
+    # Any iterable of the allowed values (e.g. an ontology index's keys view);
+    # materialized into valid_values only if something reads it
+    valid_values_source: Optional[Iterable[Any]] = None
     schema_constraint: Optional[Dict[str, Any]] = None
-    message: str = ""
+    
+    @cached_property
+    def valid_values(self) -> Optional[List[Any]]:
+        """Allowed values as a list, built on first access"""
+        return list(self.valid_values_source) if self.valid_values_source is not None else None
+    
+    @cached_property
+    def message(self) -> str:
+        """Human-readable description, formatted on first use (e.g. by the remediation prompt)"""
+        if self.error_type == 'invalid_part':
+            return f"Invalid part_id: '{self.attempted_value}' not in ontology"
+        if self.error_type == 'invalid_transform':
+            return f"Invalid transform_id '{self.transform_id}'"
+        if self.error_type == 'unknown_param':
+            return f"unknown parameter '{self.param_name}'"
+        if self.error_type == 'invalid_enum':
+            return (f"param '{self.param_name}': invalid value '{self.attempted_value}'. "
+                    f"Must be one of: {self.valid_values}")
+        if self.error_type == 'type_mismatch':
+            return f"param '{self.param_name}': expected number, got {type(self.attempted_value).__name__}"
+        return self.error_type
+    
+    def __str__(self) -> str:
+        """The error as listed in ValidationResult.errors"""
+        if self.error_type == 'invalid_part':
+            return self.message
+        if self.error_type == 'invalid_transform':
+            return f"Transform {self.transform_index}: invalid transform_id '{self.transform_id}' not in ontology"
+        return f"Transform {self.transform_index} ({self.transform_id}): {self.message}"
 
 
 @dataclass
@@ -33,6 +64,33 @@ class ValidationResult:
     structured_errors: List[ValidationError] = None  # New field for structured errors
 
 
+# (transform index, params) → structured errors, compiled per transform
+ParamValidator = Callable[[int, Dict[str, Any]], List[ValidationError]]
+
+
+_NUMERIC = (int, float)
+
+
+def _is_number(value: Any) -> bool:
+    # bool is an int subclass, but True/False is never a valid number param
+    return isinstance(value, _NUMERIC) and not isinstance(value, bool)
+
+
+def _in_enum(value: Any, allowed: FrozenSet[Any]) -> bool:
+    try:
+        return value in allowed
+    except TypeError:
+        # Unhashable values (e.g. a dict where a bucket name was expected) match no enum
+        return False
+
+
+# Param kind → (schema → value check, error_type); kinds not listed accept any value
+_KIND_CHECKS: Dict[str, Callable[[Dict[str, Any]], Tuple[Callable[[Any], bool], str]]] = {
+    'enum': lambda schema: (partial(_in_enum, allowed=frozenset(schema.get('enum', []))), 'invalid_enum'),
+    'number': lambda schema: (_is_number, 'type_mismatch'),
+}
+
+
 class SchemaValidator:
     """Validates evidence mappings against ontology schema"""
     
@@ -46,6 +104,17 @@ class SchemaValidator:
         """
         self.parts_index = parts_index
         self.transforms_index = transforms_index
+        # Per-transform param schemas and enum sets, built once instead of per call
+        self._param_schemas: Dict[str, Dict[str, Dict[str, Any]]] = {
+            tf_id: {p['key']: p for p in (tdef.get('params') or []) if isinstance(p, dict) and 'key' in p}
+            for tf_id, tdef in transforms_index.items()
+        }
+        # One specialized param validator per transform (enum sets bound in; the
+        # enum lists stay in the schema for error reports)
+        self._param_validators: Dict[str, ParamValidator] = {
+            tf_id: self._compile_param_validator(tf_id, param_schema)
+            for tf_id, param_schema in self._param_schemas.items()
+        }
     
     def validate_mapping(self, taxon_id: Optional[str], part_id: Optional[str], 
                         transforms: List[Dict[str, Any]]) -> ValidationResult:
@@ -60,128 +129,113 @@ class SchemaValidator:
         Returns:
             ValidationResult with errors/warnings and structured errors
         """
-        errors = []
+        # Malformed transforms are plain strings; everything else is structured and
+        # formatted once, when the errors list is built
+        issues: List[Union[str, ValidationError]] = []
         warnings = []
-        structured_errors = []
         
         # Validate part exists
         if part_id:
             if part_id not in self.parts_index:
-                errors.append(f"Invalid part_id: '{part_id}' not in ontology")
-                structured_errors.append(ValidationError(
+                issues.append(ValidationError(
                     transform_index=-1,
                     transform_id="",
                     error_type='invalid_part',
                     attempted_value=part_id,
-                    valid_values=list(self.parts_index.keys()),
-                    message=f"Invalid part_id: '{part_id}' not in ontology"
+                    valid_values_source=self.parts_index.keys()
                 ))
         
         # Validate each transform
         for i, transform in enumerate(transforms):
             if not isinstance(transform, dict):
-                errors.append(f"Transform {i}: expected dict, got {type(transform).__name__}")
+                issues.append(f"Transform {i}: expected dict, got {type(transform).__name__}")
                 continue
                 
             tf_id = transform.get('id')
             params = transform.get('params', {})
             
             if not tf_id:
-                errors.append(f"Transform {i}: missing 'id' field")
+                issues.append(f"Transform {i}: missing 'id' field")
                 continue
             
             # Check transform exists
             if tf_id not in self.transforms_index:
-                errors.append(f"Transform {i}: invalid transform_id '{tf_id}' not in ontology")
-                structured_errors.append(ValidationError(
+                issues.append(ValidationError(
                     transform_index=i,
                     transform_id=tf_id or "",
                     error_type='invalid_transform',
                     attempted_value=tf_id,
-                    valid_values=list(self.transforms_index.keys()),
-                    message=f"Invalid transform_id '{tf_id}'"
+                    valid_values_source=self.transforms_index.keys()
                 ))
                 continue
             
             # Validate parameters
-            tdef = self.transforms_index[tf_id]
-            param_errors, param_structured_errors = self._validate_params(i, tf_id, params, tdef)
-            errors.extend([f"Transform {i} ({tf_id}): {err}" for err in param_errors])
-            structured_errors.extend(param_structured_errors)
+            issues.extend(self._param_validators[tf_id](i, params))
         
         return ValidationResult(
-            valid=len(errors) == 0,
-            errors=errors,
+            valid=len(issues) == 0,
+            errors=[str(issue) for issue in issues],
             warnings=warnings,
-            structured_errors=structured_errors
+            structured_errors=[issue for issue in issues if isinstance(issue, ValidationError)]
         )
     
-    def _validate_params(self, transform_index: int, tf_id: str, params: Dict[str, Any], 
-                        tdef: Dict[str, Any]) -> Tuple[List[str], List[ValidationError]]:
-        """Validate transform parameters against schema and return both string and structured errors"""
-        errors = []
-        structured_errors = []
+    def _compile_param_validator(self, tf_id: str,
+                                 param_schema: Dict[str, Dict[str, Any]]) -> ParamValidator:
+        """
+        Validator specialized to one transform's params
         
-        # Build param schema lookup
-        param_schema = {}
-        for p in tdef.get('params', []):
-            if isinstance(p, dict) and 'key' in p:
-                param_schema[p['key']] = p
+        Each known key maps straight to (check, error_type, schema): enum sets and
+        number checks are bound here, so validating a param is one dict hit and at
+        most one call, with no per-call dispatch on the schema's kind.
+        """
+        checks: Dict[str, Tuple[Optional[Callable[[Any], bool]], str, Dict[str, Any]]] = {}
+        for key, schema in param_schema.items():
+            make_check = _KIND_CHECKS.get(schema.get('kind'))
+            checks[key] = (*make_check(schema), schema) if make_check else (None, '', schema)
+        known_keys = param_schema.keys()
         
-        # Validate each provided param
-        for key, value in params.items():
-            if key not in param_schema:
-                msg = f"unknown parameter '{key}'"
-                errors.append(msg)
-                structured_errors.append(ValidationError(
-                    transform_index=transform_index,
-                    transform_id=tf_id,
-                    error_type='unknown_param',
-                    param_name=key,
-                    attempted_value=value,
-                    valid_values=list(param_schema.keys()),
-                    schema_constraint=param_schema,
-                    message=msg
-                ))
-                continue
-            
-            schema = param_schema[key]
-            kind = schema.get('kind')
-            
-            # Validate enum values
-            if kind == 'enum':
-                valid_values = schema.get('enum', [])
-                if value not in valid_values:
-                    msg = f"param '{key}': invalid value '{value}'. Must be one of: {valid_values}"
-                    errors.append(msg)
+        def validate(transform_index: int, params: Dict[str, Any]) -> List[ValidationError]:
+            structured_errors = []
+            for key, value in params.items():
+                entry = checks.get(key)
+                if entry is None:
                     structured_errors.append(ValidationError(
                         transform_index=transform_index,
                         transform_id=tf_id,
-                        error_type='invalid_enum',
+                        error_type='unknown_param',
                         param_name=key,
                         attempted_value=value,
-                        valid_values=valid_values,
-                        schema_constraint=schema,
-                        message=msg
+                        valid_values_source=known_keys,
+                        schema_constraint=param_schema
                     ))
-            
-            # Validate number types
-            elif kind == 'number':
-                if not isinstance(value, (int, float)):
-                    msg = f"param '{key}': expected number, got {type(value).__name__}"
-                    errors.append(msg)
+                    continue
+                check, error_type, schema = entry
+                if check is not None and not check(value):
                     structured_errors.append(ValidationError(
                         transform_index=transform_index,
                         transform_id=tf_id,
-                        error_type='type_mismatch',
+                        error_type=error_type,
                         param_name=key,
                         attempted_value=value,
-                        valid_values=None,
-                        schema_constraint=schema,
-                        message=msg
+                        valid_values_source=schema.get('enum', []) if error_type == 'invalid_enum' else None,
+                        schema_constraint=schema
                     ))
+            return structured_errors
         
-        return errors, structured_errors
+        return validate
+
+
+# (parts_index, transforms_index, validator): the mapper passes the same indexes
+# for every food, so the precomputed schemas are reused across calls
+_last_validator: Tuple[Any, Any, Optional[SchemaValidator]] = (None, None, None)
+
+def _validator_for(parts_index: Dict[str, Any], transforms_index: Dict[str, Any]) -> SchemaValidator:
+    global _last_validator
+    cached_parts, cached_transforms, validator = _last_validator
+    if validator is None or cached_parts is not parts_index or cached_transforms is not transforms_index:
+        validator = SchemaValidator(parts_index, transforms_index)
+        _last_validator = (parts_index, transforms_index, validator)
+    return validator
 
 
 def validate_tpt_construction(tpt_construction: Any, 
@@ -218,8 +272,7 @@ def validate_tpt_construction(tpt_construction: Any,
             structured_errors=[]
         )
     
-    validator = SchemaValidator(parts_index, transforms_index)
-    result = validator.validate_mapping(taxon_id, part_id, transforms)
+    result = _validator_for(parts_index, transforms_index).validate_mapping(taxon_id, part_id, transforms)
     
     return result
 
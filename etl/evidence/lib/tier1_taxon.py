@@ -8,13 +8,52 @@ using NCBI verification and LLM-based taxon identification.
 
 from __future__ import annotations
 import json
+import re
 import time
+from functools import partial
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+from dataclasses import asdict, dataclass
 
 from .ncbi_resolver import NCBIResolver, NCBIResolution
-from .llm import call_llm, DEFAULT_SYSTEM
+from .llm import call_llm, call_llm_batch, call_llm_offline, iter_llm_batch, DEFAULT_SYSTEM
+from .name_cache import NameCache, normalize_food_name
+from .jsonl import append_jsonl, load_checkpoint
+
+# Foods the Tier 1 prompt always skips, decided locally without an LLM call.
+# FDC names lead with the head noun ("Frankfurter, beef"), so only the head is
+# matched, and it must end at a comma or the end of the name ("Water chestnut" and
+# "Breadfruit" still go to the LLM).
+_SKIP_PATTERNS = re.compile(
+    r"^(?:"
+    r"frankfurters?|hot ?dogs?|sausages?|bologna|salami|pepperoni"
+    r"|(?:luncheon|lunch|deli) meats?|cold cuts?"
+    r"|ketchup|catsup|mayonnaise|salad dressings?|sauces?|(?:bbq|barbecue|hot|soy) sauce"
+    r"|hummus|pesto|tapenade"
+    r"|breads?|cookies?|cakes?|muffins?|pastr(?:y|ies)"
+    r"|pizza|sandwich(?:es)?|burgers?|tacos?|stir[- ]?fr(?:y|ies)|casseroles?|stews?"
+    r"|table salt|salt, table|baking soda|water"
+    r")(?=,|$)",
+    re.IGNORECASE,
+)
+# Qualifier words that mark a multi-ingredient product anywhere in the name
+_SKIP_WORDS = frozenset({"mixture", "mixtures", "combination", "combinations"})
+_WORD_SPLIT = re.compile(r"[\s,()/]+")
+
+# Reason prefix of results that stand in for a failed LLM call. Checkpoints
+# leave them out, so a resumed run retries those foods.
+LLM_ERROR_PREFIX = "LLM error: "
+
+def local_skip_reason(food_name: str) -> Optional[str]:
+    """Reason string when a food is trivially skippable, else None"""
+    name = food_name.strip()
+    match = _SKIP_PATTERNS.match(name)
+    if match:
+        return f"Local skip rule: '{match.group(0)}' is non-biological or multi-ingredient"
+    words = _SKIP_WORDS.intersection(_WORD_SPLIT.split(name.lower()))
+    if words:
+        return f"Local skip rule: '{min(words)}' marks a multi-ingredient product"
+    return None
 
 @dataclass
 class TaxonResolution:
@@ -28,13 +67,19 @@ class TaxonResolution:
     ncbi_resolution: Optional[NCBIResolution]
     new_taxa: List[Dict[str, Any]]
 
+# Marshaled Tier 1 calls carry at most this many foods, keeping the JSON answer
+# well inside the model's output-token budget
+MAX_ROWS_PER_CALL = 20
+
 class Tier1TaxonResolver:
     """Tier-1: Taxon-only resolver with NCBI verification"""
     
-    def __init__(self, ncbi_resolver: NCBIResolver, model: str = "gpt-5-mini"):
-        """Initialize with NCBI resolver and LLM model"""
+    def __init__(self, ncbi_resolver: NCBIResolver, model: str = "gpt-5-mini",
+                 name_cache: Optional[NameCache] = None):
+        """Initialize with NCBI resolver and LLM model (and an optional shared name cache)"""
         self.ncbi_resolver = ncbi_resolver
         self.model = model
+        self.name_cache = name_cache if name_cache is not None else NameCache()
     
     def resolve_taxon(self, food_id: str, food_name: str, food_description: str = "") -> TaxonResolution:
         """
@@ -48,8 +93,19 @@ class Tier1TaxonResolver:
         Returns:
             TaxonResolution with taxon identification results
         """
-        # Build prompt for taxon resolution
-        prompt = self._build_taxon_prompt(food_name, food_description)
+        skip_reason = local_skip_reason(food_name)
+        if skip_reason:
+            print(f"[TIER 1] Skipping \"{food_name}\" ({skip_reason})")
+            return self._local_skip(food_id, food_name, skip_reason)
+        
+        description_key = normalize_food_name(food_description)
+        cached = self.name_cache.lookup(food_name, 1, description_key)
+        if cached is not None:
+            print(f"[TIER 1] Cached: \"{food_name}\"")
+            return self._resolution_from_response(food_id, food_name, cached)
+        
+        # Build prompt for taxon resolution (all invariant text in the system message)
+        system, prompt = self._build_taxon_messages(food_name, food_description)
         
         # Call LLM for taxon resolution
         try:
@@ -59,7 +115,7 @@ class Tier1TaxonResolver:
             
             response = call_llm(
                 model=self.model,
-                system=self._get_taxon_system_prompt(),
+                system=system,
                 user=prompt,
                 temperature=0.3
             )
@@ -68,84 +124,265 @@ class Tier1TaxonResolver:
             token_usage = response.get('_token_usage', {})
             print(f"[TIER 1] → LLM Response ({duration:.2f}s, {token_usage.get('total_tokens', 0)} tokens)")
             
-            # Parse LLM response
-            taxon_id = response.get('taxon_id')
-            confidence = response.get('confidence', 0.0)
-            disposition = response.get('disposition', 'ambiguous')
-            reason = response.get('reason', '')
-            new_taxa = response.get('new_taxa', [])
+            resolution = self._resolution_from_response(food_id, food_name, response)
+            self.name_cache.store(food_name, 1, response, description_key)
+            return resolution
             
-            # Verify with NCBI if we have a taxon ID
-            ncbi_resolution = None
-            if taxon_id and taxon_id != 'null':
-                ncbi_resolution = self.ncbi_resolver.resolve_taxon(taxon_id)
-                
-                # Adjust confidence based on NCBI verification
-                if ncbi_resolution.ncbi_taxid and ncbi_resolution.confidence > 0.5:
-                    confidence = min(confidence + 0.1, 1.0)
-                    reason += f" (NCBI verified: {ncbi_resolution.reason})"
-                elif ncbi_resolution.needs_refinement:
-                    confidence = max(confidence - 0.2, 0.0)
-                    reason += f" (NCBI needs refinement: {ncbi_resolution.reason})"
-                else:
-                    confidence = max(confidence - 0.3, 0.0)
-                    reason += f" (NCBI not found: {ncbi_resolution.reason})"
+        except Exception as e:
+            return self._error_resolution(food_id, food_name, e)
+    
+    def _error_resolution(self, food_id: str, food_name: str, error: Exception) -> TaxonResolution:
+        return TaxonResolution(
+            food_id=food_id,
+            food_name=food_name,
+            taxon_id=None,
+            confidence=0.0,
+            disposition='skip',
+            reason=f"{LLM_ERROR_PREFIX}{error}",
+            ncbi_resolution=None,
+            new_taxa=[]
+        )
+    
+    def _local_skip(self, food_id: str, food_name: str, reason: str) -> TaxonResolution:
+        return TaxonResolution(
+            food_id=food_id,
+            food_name=food_name,
+            taxon_id=None,
+            confidence=1.0,
+            disposition='skip',
+            reason=reason,
+            ncbi_resolution=None,
+            new_taxa=[]
+        )
+    
+    def _resolution_from_response(self, food_id: str, food_name: str, response: Dict[str, Any]) -> TaxonResolution:
+        """Verify one LLM taxon answer against NCBI and settle its disposition"""
+        taxon_id = response.get('taxon_id')
+        confidence = response.get('confidence', 0.0)
+        disposition = response.get('disposition', 'ambiguous')
+        reason = response.get('reason', '')
+        new_taxa = response.get('new_taxa', [])
+        
+        # Verify with NCBI if we have a taxon ID
+        ncbi_resolution = None
+        if taxon_id and taxon_id != 'null':
+            ncbi_resolution = self.ncbi_resolver.resolve_taxon(taxon_id)
             
-            # Determine final disposition
-            if disposition == 'skip':
-                final_disposition = 'skip'
-            elif confidence >= 0.7:
-                final_disposition = 'resolved'
-            elif confidence >= 0.4:
-                final_disposition = 'ambiguous'
+            # Adjust confidence based on NCBI verification
+            if ncbi_resolution.ncbi_taxid and ncbi_resolution.confidence > 0.5:
+                confidence = min(confidence + 0.1, 1.0)
+                reason += f" (NCBI verified: {ncbi_resolution.reason})"
+            elif ncbi_resolution.needs_refinement:
+                confidence = max(confidence - 0.2, 0.0)
+                reason += f" (NCBI needs refinement: {ncbi_resolution.reason})"
             else:
-                final_disposition = 'skip'
-            
-            return TaxonResolution(
-                food_id=food_id,
-                food_name=food_name,
-                taxon_id=taxon_id if final_disposition != 'skip' else None,
-                confidence=confidence,
-                disposition=final_disposition,
-                reason=reason,
-                ncbi_resolution=ncbi_resolution,
-                new_taxa=new_taxa
-            )
-            
-        except Exception as e:
-            return TaxonResolution(
-                food_id=food_id,
-                food_name=food_name,
-                taxon_id=None,
-                confidence=0.0,
-                disposition='skip',
-                reason=f"LLM error: {str(e)}",
-                ncbi_resolution=None,
-                new_taxa=[]
-            )
+                confidence = max(confidence - 0.3, 0.0)
+                reason += f" (NCBI not found: {ncbi_resolution.reason})"
+        
+        # Determine final disposition
+        if disposition == 'skip':
+            final_disposition = 'skip'
+        elif confidence >= 0.7:
+            final_disposition = 'resolved'
+        elif confidence >= 0.4:
+            final_disposition = 'ambiguous'
+        else:
+            final_disposition = 'skip'
+        
+        return TaxonResolution(
+            food_id=food_id,
+            food_name=food_name,
+            taxon_id=taxon_id if final_disposition != 'skip' else None,
+            confidence=confidence,
+            disposition=final_disposition,
+            reason=reason,
+            ncbi_resolution=ncbi_resolution,
+            new_taxa=new_taxa
+        )
     
-    def _build_taxon_prompt(self, food_name: str, food_description: str = "") -> str:
-        """Build prompt for taxon resolution"""
-        from .optimized_prompts import get_enhanced_taxon_prompt
-        return get_enhanced_taxon_prompt(food_name, food_description)
+    def _build_taxon_messages(self, food_name: str, food_description: str = "") -> Tuple[str, str]:
+        """Build (static system, dynamic user) messages for taxon resolution"""
+        from .optimized_prompts import get_taxon_prompt_pair
+        return get_taxon_prompt_pair(food_name, food_description)
     
     def _get_taxon_system_prompt(self) -> str:
         """Get system prompt for taxon resolution"""
         from .optimized_prompts import get_optimized_taxon_system_prompt
         return get_optimized_taxon_system_prompt()
     
-    def resolve_batch(self, foods: List[Dict[str, Any]]) -> List[TaxonResolution]:
-        """Resolve taxa for a batch of foods"""
-        results = []
+    def resolve_batch(self, foods: List[Dict[str, Any]], rows_per_call: int = 1,
+                      max_concurrency: int = 8, checkpoint: Optional[Path] = None) -> List[TaxonResolution]:
+        """
+        Resolve taxa for a batch of foods
         
-        for food in foods:
-            food_id = str(food.get('fdc_id', food.get('food_id', '')))
-            food_name = food.get('description', food.get('name', ''))
-            food_description = food.get('additional_description', '')
-            
-            resolution = self.resolve_taxon(food_id, food_name, food_description)
-            results.append(resolution)
+        Args:
+            foods: FDC food dicts
+            rows_per_call: Foods marshaled into each LLM call (4-16 amortizes the
+                static prompt and eases rate limits; 1 keeps one call per food;
+                capped at MAX_ROWS_PER_CALL)
+            max_concurrency: LLM calls in flight at once
+            checkpoint: JSONL of finished resolutions. Foods already in it are
+                not re-resolved, and each new resolution is appended as soon as
+                it is settled, so an interrupted run resumes where it stopped.
+                LLM errors are not recorded and are retried on resume
+        
+        Results keep input order.
+        """
+        if checkpoint is None:
+            return self._resolve_rows(foods, rows_per_call, partial(call_llm_batch, max_workers=max_concurrency))
         
+        done = load_checkpoint(checkpoint, 'food_id')
+        results: List[Optional[TaxonResolution]] = [None] * len(foods)
+        todo = []
+        for i, food in enumerate(foods):
+            row = done.get(str(food.get('fdc_id', food.get('food_id', ''))))
+            if row is not None:
+                results[i] = self._resolution_from_checkpoint(row)
+            else:
+                todo.append(i)
+        if done:
+            print(f"[TIER 1] → Resuming: {len(foods) - len(todo)} foods already in {checkpoint}")
+        
+        def record(j: int, resolution: TaxonResolution) -> None:
+            results[todo[j]] = resolution
+            if not resolution.reason.startswith(LLM_ERROR_PREFIX):
+                append_jsonl(checkpoint, asdict(resolution))
+        
+        # Results stream back in order as calls finish, so each is recorded while later calls are in flight
+        self._resolve_rows([foods[i] for i in todo], rows_per_call,
+                           partial(iter_llm_batch, max_workers=max_concurrency), on_result=record)
+        return results
+    
+    @staticmethod
+    def _resolution_from_checkpoint(row: Dict[str, Any]) -> TaxonResolution:
+        ncbi_resolution = row.get('ncbi_resolution')
+        return TaxonResolution(**{**row, 'ncbi_resolution': NCBIResolution(**ncbi_resolution) if ncbi_resolution else None})
+    
+    def resolve_batch_offline(self, foods: List[Dict[str, Any]], work_path: Path, rows_per_call: int = 1,
+                              poll_interval: float = 60.0) -> List[TaxonResolution]:
+        """
+        resolve_batch with the LLM calls submitted as one OpenAI Batch API job
+        
+        Half the price of online calls, for runs that can wait (up to 24h) for
+        results; see call_llm_offline. The submitted JSONL is written to work_path.
+        Marshaled calls that come back unusable fall back to online per-food calls.
+        """
+        return self._resolve_rows(foods, rows_per_call,
+                                  partial(call_llm_offline, work_path=work_path, poll_interval=poll_interval))
+    
+    def _resolve_rows(self, foods: List[Dict[str, Any]], rows_per_call: int,
+                      send: Callable[[Iterable[Dict[str, Any]]], Iterable[Any]],
+                      on_result: Optional[Callable[[int, TaxonResolution], None]] = None) -> List[TaxonResolution]:
+        """
+        Skip/cache/dedupe screening, then one send() of every remaining LLM call
+        
+        on_result(index, resolution) runs as each food is settled, in the order
+        send() yields responses.
+        """
+        rows_per_call = max(1, min(rows_per_call, MAX_ROWS_PER_CALL))
+        rows = [
+            (
+                str(food.get('fdc_id', food.get('food_id', ''))),
+                food.get('description', food.get('name', '')),
+                food.get('additional_description', '')
+            )
+            for food in foods
+        ]
+        
+        # Locally skippable, cached and repeated foods never take a slot in an LLM call
+        results: List[Optional[TaxonResolution]] = [None] * len(rows)
+        
+        def settle(i: int, resolution: TaxonResolution) -> None:
+            results[i] = resolution
+            if on_result is not None:
+                on_result(i, resolution)
+        
+        pending = []
+        repeats: Dict[Tuple[str, str], List[int]] = {}
+        for i, (food_id, food_name, food_description) in enumerate(rows):
+            skip_reason = local_skip_reason(food_name)
+            if skip_reason:
+                settle(i, self._local_skip(food_id, food_name, skip_reason))
+                continue
+            description_key = normalize_food_name(food_description)
+            cached = self.name_cache.lookup(food_name, 1, description_key)
+            if cached is not None:
+                settle(i, self._resolution_from_response(food_id, food_name, cached))
+                continue
+            key = (normalize_food_name(food_name), description_key)
+            if key in repeats:
+                repeats[key].append(i)
+            else:
+                repeats[key] = []
+                pending.append(i)
+        
+        chunks = [pending[start:start + rows_per_call] for start in range(0, len(pending), rows_per_call)]
+        if chunks:
+            # send() runs the calls (concurrently or as a provider batch); NCBI
+            # verification and cache writes stay on this thread, in chunk order
+            print(f"[TIER 1] → Resolving {len(pending)} foods in {len(chunks)} calls ({self.model})...")
+            start_time = time.time()
+            # send() may yield lazily, so responses are timed once all are handled
+            responses = send(self._chunk_request([rows[i] for i in chunk]) for chunk in chunks)
+            for chunk, response in zip(chunks, responses):
+                chunk_rows = [rows[i] for i in chunk]
+                resolutions = ([self._single_resolution(chunk_rows[0], response)] if len(chunk) == 1
+                               else self._marshaled_resolutions(chunk_rows, response))
+                for i, resolution in zip(chunk, resolutions):
+                    settle(i, resolution)
+            print(f"[TIER 1] → LLM Responses ({time.time() - start_time:.2f}s)")
+        
+        # Repeats reuse the answer their first occurrence cached
+        for (_, description_key), indexes in repeats.items():
+            for i in indexes:
+                food_id, food_name, food_description = rows[i]
+                cached = self.name_cache.lookup(food_name, 1, description_key)
+                settle(i, self._resolution_from_response(food_id, food_name, cached) if cached is not None
+                       else self.resolve_taxon(food_id, food_name, food_description))
+        return results
+    
+    def _chunk_request(self, rows: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+        """call_llm kwargs for one food (system/user pair) or several (marshaled rows)"""
+        if len(rows) == 1:
+            _, food_name, food_description = rows[0]
+            system, prompt = self._build_taxon_messages(food_name, food_description)
+        else:
+            from .optimized_prompts import get_enhanced_taxon_prompt_batch
+            system = self._get_taxon_system_prompt()
+            prompt = get_enhanced_taxon_prompt_batch([(name, desc) for _, name, desc in rows])
+        return {'model': self.model, 'system': system, 'user': prompt, 'temperature': 0.3}
+    
+    def _single_resolution(self, row: Tuple[str, str, str], response: Any) -> TaxonResolution:
+        """Resolution for a one-food call (a failed call becomes an 'LLM error' skip)"""
+        food_id, food_name, food_description = row
+        try:
+            if isinstance(response, Exception):
+                raise response
+            resolution = self._resolution_from_response(food_id, food_name, response)
+            self.name_cache.store(food_name, 1, response, normalize_food_name(food_description))
+            return resolution
+        except Exception as e:
+            return self._error_resolution(food_id, food_name, e)
+    
+    def _marshaled_resolutions(self, rows: List[Tuple[str, str, str]], response: Any) -> List[TaxonResolution]:
+        """Resolutions from one marshaled call, falling back to per-food calls"""
+        from .optimized_prompts import marshaled_results
+        try:
+            if isinstance(response, Exception):
+                raise response
+            # Matched to foods by their row number, never by position
+            items = marshaled_results(response, len(rows))
+        except Exception as e:
+            print(f"[TIER 1] → Marshaled call failed ({e}); resolving foods individually")
+            return [self.resolve_taxon(*row) for row in rows]
+        
+        results = []
+        for (food_id, food_name, food_description), item in zip(rows, items):
+            try:
+                results.append(self._resolution_from_response(food_id, food_name, item))
+                self.name_cache.store(food_name, 1, item, normalize_food_name(food_description))
+            except Exception as e:
+                results.append(self._error_resolution(food_id, food_name, e))
         return results
     
     def get_resolved_taxa(self, resolutions: List[TaxonResolution]) -> List[TaxonResolution]:
@@ -9,13 +9,16 @@ and constructs Taxon-Part-Transform (TPT) combinations using lineage-based part
 from __future__ import annotations
 import json
 import time
+from functools import partial
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 
-from .tier1_taxon import TaxonResolution
+from .tier1_taxon import LLM_ERROR_PREFIX, TaxonResolution
 from .part_filter import PartFilter, PartApplicability
-from .llm import call_llm
+from .llm import call_llm, call_llm_batch, call_llm_offline, iter_llm_batch
+from .name_cache import NameCache, normalize_food_name
+from .jsonl import append_jsonl, load_checkpoint
 
 # Try absolute imports first, fall back to relative
 try:
@@ -42,10 +45,18 @@ class TPTConstruction:
 class Tier2TPTConstructor:
     """Tier-2: TPT constructor with lineage-based part filtering"""
     
-    def __init__(self, part_filter: PartFilter, model: str = "gpt-5-mini"):
-        """Initialize with part filter and LLM model"""
+    def __init__(self, part_filter: PartFilter, model: str = "gpt-5-mini",
+                 name_cache: Optional[NameCache] = None):
+        """Initialize with part filter and LLM model (and an optional shared name cache)"""
         self.part_filter = part_filter
         self.model = model
+        self.name_cache = name_cache if name_cache is not None else NameCache()
+    
+    @staticmethod
+    def _cache_context(taxon_resolution: TaxonResolution, applicable_parts: List[Any],
+                       available_transforms: List[Any]) -> Tuple[Any, ...]:
+        """What a TPT answer depends on besides the food name (transform count tracks overlays)"""
+        return (taxon_resolution.taxon_id, tuple(part.id for part in applicable_parts), len(available_transforms))
     
     def construct_tpt(self, taxon_resolution: TaxonResolution, 
                      available_parts: List[Dict[str, Any]], 
@@ -61,6 +72,40 @@ class Tier2TPTConstructor:
         Returns:
             TPTConstruction with TPT combination
         """
+        applicable_parts = self._applicable_parts_or_skip(taxon_resolution, available_parts)
+        if isinstance(applicable_parts, TPTConstruction):
+            return applicable_parts
+        
+        # Use LLM to select part and transforms
+        tpt_result = self._llm_construct_tpt(
+            taxon_resolution, 
+            applicable_parts, 
+            available_transforms
+        )
+        
+        return self._construction_from_result(taxon_resolution, applicable_parts, tpt_result)
+    
+    def _construction_from_result(self, taxon_resolution: TaxonResolution,
+                                  applicable_parts: List[Dict[str, Any]],
+                                  tpt_result: Dict[str, Any]) -> TPTConstruction:
+        """Wrap one LLM TPT answer in a TPTConstruction"""
+        return TPTConstruction(
+            food_id=taxon_resolution.food_id,
+            food_name=taxon_resolution.food_name,
+            taxon_id=taxon_resolution.taxon_id,
+            part_id=tpt_result.get('part_id'),
+            transforms=tpt_result.get('transforms', []),
+            confidence=tpt_result.get('confidence', 0.0),
+            disposition=tpt_result.get('disposition', 'ambiguous'),
+            reason=tpt_result.get('reason', ''),
+            applicable_parts=applicable_parts,
+            new_parts=tpt_result.get('new_parts', []),
+            new_transforms=tpt_result.get('new_transforms', [])
+        )
+    
+    def _applicable_parts_or_skip(self, taxon_resolution: TaxonResolution,
+                                  available_parts: List[Dict[str, Any]]):
+        """Lineage-filtered parts for a taxon, or a 'skip' TPTConstruction when there are none"""
         if not taxon_resolution.taxon_id or taxon_resolution.disposition != 'resolved':
             return TPTConstruction(
                 food_id=taxon_resolution.food_id,
@@ -102,34 +147,20 @@ class Tier2TPTConstructor:
                 new_transforms=[]
             )
         
-        # Use LLM to select part and transforms
-        tpt_result = self._llm_construct_tpt(
-            taxon_resolution, 
-            applicable_parts, 
-            available_transforms
-        )
-        
-        return TPTConstruction(
-            food_id=taxon_resolution.food_id,
-            food_name=taxon_resolution.food_name,
-            taxon_id=taxon_resolution.taxon_id,
-            part_id=tpt_result.get('part_id'),
-            transforms=tpt_result.get('transforms', []),
-            confidence=tpt_result.get('confidence', 0.0),
-            disposition=tpt_result.get('disposition', 'ambiguous'),
-            reason=tpt_result.get('reason', ''),
-            applicable_parts=applicable_parts,
-            new_parts=tpt_result.get('new_parts', []),
-            new_transforms=tpt_result.get('new_transforms', [])
-        )
+        return applicable_parts
     
     def _llm_construct_tpt(self, taxon_resolution: TaxonResolution, 
                           applicable_parts: List[Dict[str, Any]], 
                           available_transforms: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Use LLM to construct TPT from applicable parts and transforms"""
+        context = self._cache_context(taxon_resolution, applicable_parts, available_transforms)
+        cached = self.name_cache.lookup(taxon_resolution.food_name, 2, *context)
+        if cached is not None:
+            print(f"[TIER 2] → Cached TPT for {taxon_resolution.food_name}")
+            return cached
         
-        # Build prompt for TPT construction
-        prompt = self._build_tpt_prompt(taxon_resolution, applicable_parts, available_transforms)
+        # Build prompt for TPT construction (all invariant text in the system message)
+        system, prompt = self._build_tpt_messages(taxon_resolution, applicable_parts, available_transforms)
         
         try:
             start_time = time.time()
@@ -139,7 +170,7 @@ class Tier2TPTConstructor:
             
             response = call_llm(
                 model=self.model,
-                system=self._get_tpt_system_prompt(),
+                system=system,
                 user=prompt,
                 temperature=0.3
             )
@@ -148,43 +179,228 @@ class Tier2TPTConstructor:
             token_usage = response.get('_token_usage', {})
             print(f"[TIER 2] → LLM Response ({duration:.2f}s, {token_usage.get('total_tokens', 0)} tokens)")
             
+            self.name_cache.store(taxon_resolution.food_name, 2, response, *context)
             return response
             
         except Exception as e:
-            return {
-                'part_id': None,
-                'transforms': [],
-                'confidence': 0.0,
-                'disposition': 'skip',
-                'reason': f"LLM error: {str(e)}",
-                'new_parts': [],
-                'new_transforms': []
-            }
-    
-    def _build_tpt_prompt(self, taxon_resolution: TaxonResolution, 
-                         applicable_parts: List[Dict[str, Any]], 
-                         available_transforms: List[Dict[str, Any]]) -> str:
-        """Build prompt for TPT construction"""
-        from .optimized_prompts import get_enhanced_tpt_prompt
-        return get_enhanced_tpt_prompt(taxon_resolution, applicable_parts, available_transforms)
-    
-    def _get_tpt_system_prompt(self) -> str:
-        """Get system prompt for TPT construction"""
+            return self._error_result(e)
+    
+    @staticmethod
+    def _error_result(error: Exception) -> Dict[str, Any]:
+        return {
+            'part_id': None,
+            'transforms': [],
+            'confidence': 0.0,
+            'disposition': 'skip',
+            'reason': f"{LLM_ERROR_PREFIX}{error}",
+            'new_parts': [],
+            'new_transforms': []
+        }
+    
+    def _build_tpt_messages(self, taxon_resolution: TaxonResolution, 
+                            applicable_parts: List[Dict[str, Any]], 
+                            available_transforms: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """Build (static system, dynamic user) messages for TPT construction"""
+        from .optimized_prompts import get_tpt_prompt_pair
+        return get_tpt_prompt_pair(taxon_resolution, applicable_parts, available_transforms)
+    
+    def _get_tpt_system_prompt(self, taxon_kingdom: Optional[str] = None,
+                               available_transforms: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Get system prompt for TPT construction (schemas of the given transforms, narrowed to the kingdom)"""
         from .optimized_prompts import get_optimized_tpt_system_prompt
-        return get_optimized_tpt_system_prompt()
+        return get_optimized_tpt_system_prompt(taxon_kingdom=taxon_kingdom, available_transforms=available_transforms)
     
     def construct_batch(self, taxon_resolutions: List[TaxonResolution], 
                        available_parts: List[Dict[str, Any]], 
-                       available_transforms: List[Dict[str, Any]]) -> List[TPTConstruction]:
-        """Construct TPTs for a batch of taxon resolutions"""
-        results = []
+                       available_transforms: List[Dict[str, Any]],
+                       rows_per_call: int = 1, max_concurrency: int = 8,
+                       checkpoint: Optional[Path] = None) -> List[TPTConstruction]:
+        """
+        Construct TPTs for a batch of taxon resolutions
+        
+        LLM calls run up to max_concurrency at a time. With rows_per_call > 1,
+        foods whose taxa filter to the same applicable parts share one prompt
+        listing and are sent rows_per_call per call. Results keep input order.
+        
+        With a checkpoint JSONL, foods already in it are not reconstructed and
+        each new construction is appended as soon as it is settled, so an
+        interrupted run resumes where it stopped. LLM errors are not recorded
+        and are retried on resume.
+        """
+        if checkpoint is None:
+            return self._construct_rows(taxon_resolutions, available_parts, available_transforms, rows_per_call,
+                                        partial(call_llm_batch, max_workers=max_concurrency))
+        
+        done = load_checkpoint(checkpoint, 'food_id')
+        parts_by_id = {part.id: part for part in available_parts}
+        results: List[Optional[TPTConstruction]] = [None] * len(taxon_resolutions)
+        todo = []
+        for i, taxon_resolution in enumerate(taxon_resolutions):
+            row = done.get(str(taxon_resolution.food_id))
+            if row is not None:
+                results[i] = TPTConstruction(**{
+                    **row,
+                    'applicable_parts': [parts_by_id[part_id] for part_id in row['applicable_parts'] if part_id in parts_by_id]
+                })
+            else:
+                todo.append(i)
+        if done:
+            print(f"[TIER 2] → Resuming: {len(taxon_resolutions) - len(todo)} foods already in {checkpoint}")
         
-        for resolution in taxon_resolutions:
-            tpt = self.construct_tpt(resolution, available_parts, available_transforms)
-            results.append(tpt)
+        def record(j: int, construction: TPTConstruction) -> None:
+            results[todo[j]] = construction
+            if not construction.reason.startswith(LLM_ERROR_PREFIX):
+                # Parts are ontology records; the checkpoint keeps their ids
+                append_jsonl(checkpoint, {**vars(construction),
+                                          'applicable_parts': [part.id for part in construction.applicable_parts]})
         
+        # Results stream back in order as calls finish, so each is recorded while later calls are in flight
+        self._construct_rows([taxon_resolutions[i] for i in todo], available_parts, available_transforms,
+                             rows_per_call, partial(iter_llm_batch, max_workers=max_concurrency), on_result=record)
         return results
     
+    def construct_batch_offline(self, taxon_resolutions: List[TaxonResolution],
+                                available_parts: List[Dict[str, Any]],
+                                available_transforms: List[Dict[str, Any]], work_path: Path,
+                                rows_per_call: int = 1, poll_interval: float = 60.0) -> List[TPTConstruction]:
+        """
+        construct_batch with the LLM calls submitted as one OpenAI Batch API job
+        
+        Half the price of online calls, for runs that can wait (up to 24h) for
+        results; see call_llm_offline. Only resolved taxa with applicable parts
+        are submitted; the JSONL is written to work_path.
+        """
+        return self._construct_rows(taxon_resolutions, available_parts, available_transforms, rows_per_call,
+                                    partial(call_llm_offline, work_path=work_path, poll_interval=poll_interval))
+    
+    def _construct_rows(self, taxon_resolutions: List[TaxonResolution], available_parts: List[Dict[str, Any]],
+                        available_transforms: List[Dict[str, Any]], rows_per_call: int,
+                        send: Callable[[Iterable[Dict[str, Any]]], Iterable[Any]],
+                        on_result: Optional[Callable[[int, TPTConstruction], None]] = None) -> List[TPTConstruction]:
+        """
+        Skip/cache screening and part grouping, then one send() of every remaining LLM call
+        
+        on_result(index, construction) runs as each food is settled, in the
+        order send() yields responses.
+        """
+        from .optimized_prompts import taxon_kingdom_code
+        
+        rows_per_call = max(1, rows_per_call)
+        results: List[Optional[TPTConstruction]] = [None] * len(taxon_resolutions)
+        
+        def settle(i: int, construction: TPTConstruction) -> None:
+            results[i] = construction
+            if on_result is not None:
+                on_result(i, construction)
+        
+        # Keyed by (kingdom, *part ids): a group shares one system prompt and one part listing
+        groups: Dict[Tuple[Optional[str], ...], List[Tuple[int, TaxonResolution, List[Any]]]] = {}
+        repeats: Dict[Tuple[Any, ...], List[Tuple[int, TaxonResolution, List[Any]]]] = {}
+        
+        for i, taxon_resolution in enumerate(taxon_resolutions):
+            applicable_parts = self._applicable_parts_or_skip(taxon_resolution, available_parts)
+            if isinstance(applicable_parts, TPTConstruction):
+                settle(i, applicable_parts)
+                continue
+            context = self._cache_context(taxon_resolution, applicable_parts, available_transforms)
+            cached = self.name_cache.lookup(taxon_resolution.food_name, 2, *context)
+            if cached is not None:
+                settle(i, self._construction_from_result(taxon_resolution, applicable_parts, cached))
+                continue
+            # Identical foods (same name and context) take one slot in an LLM call
+            repeat_key = (normalize_food_name(taxon_resolution.food_name), *context)
+            if repeat_key in repeats:
+                repeats[repeat_key].append((i, taxon_resolution, applicable_parts))
+                continue
+            repeats[repeat_key] = []
+            key = (taxon_kingdom_code(taxon_resolution.taxon_id), *(part.id for part in applicable_parts))
+            # A tuple lets the prompt builder reuse the group's rendered listing by identity
+            groups.setdefault(key, []).append((i, taxon_resolution, tuple(applicable_parts)))
+        
+        chunks = [
+            (key, members[start:start + rows_per_call])
+            for key, members in groups.items()
+            for start in range(0, len(members), rows_per_call)
+        ]
+        if not chunks:
+            return results
+        
+        self._send_chunks(chunks, settle, available_transforms, send)
+        
+        # Repeats reuse the answer their first occurrence cached
+        for (_, *context), members in repeats.items():
+            for i, taxon_resolution, applicable_parts in members:
+                cached = self.name_cache.lookup(taxon_resolution.food_name, 2, *context)
+                tpt_result = (cached if cached is not None
+                              else self._llm_construct_tpt(taxon_resolution, applicable_parts, available_transforms))
+                settle(i, self._construction_from_result(taxon_resolution, applicable_parts, tpt_result))
+        return results
+    
+    def _send_chunks(self, chunks: List[Tuple[Tuple[Any, ...], List[Tuple[int, TaxonResolution, Tuple[Any, ...]]]]],
+                     settle: Callable[[int, TPTConstruction], None], available_transforms: List[Dict[str, Any]],
+                     send: Callable[[Iterable[Dict[str, Any]]], Iterable[Any]]) -> None:
+        """One send() of every chunk's LLM call; each answer is settled at its food's index"""
+        # Prompts are rendered lazily, in chunk order, while earlier calls are in flight
+        requests = (self._chunk_request(key[0], chunk, available_transforms) for key, chunk in chunks)
+        print(f"[TIER 2] → Constructing TPTs for {sum(len(chunk) for _, chunk in chunks)} foods "
+              f"in {len(chunks)} calls ({self.model})...")
+        start_time = time.time()
+        # send() may yield lazily, so responses are timed once all are handled
+        responses = send(requests)
+        
+        for (_, chunk), response in zip(chunks, responses):
+            applicable_parts = list(chunk[0][2])
+            if len(chunk) == 1:
+                i, taxon_resolution, _ = chunk[0]
+                if isinstance(response, Exception):
+                    tpt_result = self._error_result(response)
+                else:
+                    tpt_result = response
+                    self.name_cache.store(taxon_resolution.food_name, 2, tpt_result,
+                                          *self._cache_context(taxon_resolution, applicable_parts, available_transforms))
+                settle(i, self._construction_from_result(taxon_resolution, applicable_parts, tpt_result))
+                continue
+            tpt_results = self._marshaled_results(response, len(chunk))
+            if tpt_results is None:
+                print(f"[TIER 2] → Marshaled call failed; constructing {len(chunk)} TPTs individually")
+                tpt_results = [self._llm_construct_tpt(r, applicable_parts, available_transforms) for _, r, _ in chunk]
+            else:
+                # Individual fallbacks cache their own answers (and never their errors)
+                for (_, taxon_resolution, _), tpt_result in zip(chunk, tpt_results):
+                    self.name_cache.store(taxon_resolution.food_name, 2, tpt_result,
+                                          *self._cache_context(taxon_resolution, applicable_parts, available_transforms))
+            for (i, taxon_resolution, _), tpt_result in zip(chunk, tpt_results):
+                settle(i, self._construction_from_result(taxon_resolution, applicable_parts, tpt_result))
+        print(f"[TIER 2] → LLM Responses ({time.time() - start_time:.2f}s)")
+    
+    def _chunk_request(self, kingdom: Optional[str], chunk: List[Tuple[int, TaxonResolution, Tuple[Any, ...]]],
+                       available_transforms: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """call_llm kwargs for one food (system/user pair) or several (marshaled rows)"""
+        applicable_parts = chunk[0][2]
+        if len(chunk) == 1:
+            system, prompt = self._build_tpt_messages(chunk[0][1], applicable_parts, available_transforms)
+        else:
+            from .optimized_prompts import get_enhanced_tpt_prompt_batch
+            system = self._get_tpt_system_prompt(kingdom, available_transforms)
+            prompt = get_enhanced_tpt_prompt_batch([r for _, r, _ in chunk], applicable_parts, available_transforms)
+        return {'model': self.model, 'system': system, 'user': prompt, 'temperature': 0.3}
+    
+    @staticmethod
+    def _marshaled_results(response: Any, expected: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Per-row results from a marshaled response in row order, or None if it is unusable
+        
+        Results are matched to foods by row number; a missing, repeated or
+        non-object row sends the whole chunk to the individual fallback.
+        """
+        from .optimized_prompts import marshaled_results
+        if isinstance(response, Exception):
+            return None
+        try:
+            return marshaled_results(response, expected)
+        except ValueError:
+            return None
+    
     def get_constructed_tpts(self, constructions: List[TPTConstruction]) -> List[TPTConstruction]:
         """Get successfully constructed TPTs"""
         return [t for t in constructions if t.disposition == 'constructed' and t.part_id]
@@ -104,18 +104,19 @@ class Tier3Curator:
         
         print(f"[TIER 3] → Curating ambiguous TPT for {tpt_construction.food_name}")
         
-        # Build curation prompt for the partial TPT
-        prompt = f"Food: {tpt_construction.food_name}\n"
-        prompt += f"Taxon: {taxon_resolution.taxon_id}\n"
-        prompt += f"Reason: {tpt_construction.reason}\n\n"
-        prompt += "Tier 2 constructed a partial TPT but marked it as ambiguous/failed. "
-        prompt += "Analyze the issue and determine the best path forward:\n\n"
-        
-        prompt += "1. Can we complete the TPT despite missing transforms?\n"
-        prompt += "2. Should we propose new transforms/parts to the ontology?\n"
-        prompt += "3. Is Tier 2 fundamentally wrong and we should reject?\n\n"
-        
-        prompt += "Return JSON with: {\"strategy\": \"...\", \"corrected_tpt\": {...}, \"overlay_proposal\": {...}, \"reasoning\": \"...\"}\n"
+        # Build curation prompt for the partial TPT (static instructions first for prompt caching)
+        prompt = f"""Tier 2 constructed a partial TPT but marked it as ambiguous/failed. Analyze the issue and determine the best path forward:
+
+1. Can we complete the TPT despite missing transforms?
+2. Should we propose new transforms/parts to the ontology?
+3. Is Tier 2 fundamentally wrong and we should reject?
+
+Return JSON with: {{"strategy": "...", "corrected_tpt": {{...}}, "overlay_proposal": {{...}}, "reasoning": "..."}}
+
+Food: {tpt_construction.food_name}
+Taxon: {taxon_resolution.taxon_id}
+Reason: {tpt_construction.reason}
+"""
         
         try:
             # Call LLM for curation analysis
@@ -480,7 +481,9 @@ class Tier3Curator:
         
         # Apply new transforms
         if new_transforms:
+            from .optimized_prompts import clear_prompt_caches
             self._write_overlay_file('transforms.jsonl', new_transforms)
+            clear_prompt_caches()
             applied = True
             
         # Apply transform applicability rules
@@ -683,7 +686,8 @@ class Tier3Curator:
             
             response = call_llm(
                 model=self.model,
-                system=self._get_curation_system_prompt(),
+                system=self._get_curation_system_prompt(available_parts, available_transforms,
+                                                        getattr(tpt, 'taxon_id', '') or ''),
                 user=prompt,
                 temperature=0.3
             )
@@ -717,35 +721,34 @@ class Tier3Curator:
                              available_transforms: List[Dict[str, Any]], 
                              nutrient_data: List[Dict[str, Any]]) -> str:
         """Build comprehensive curation prompt for LLM analysis"""
-        prompt = f"Food: {tpt.food_name}\n"
-        prompt += f"Taxon: {tpt.taxon_id}\n"
-        prompt += f"Proposed Part: {tpt.part_id}\n"
-        prompt += f"Proposed Transforms: {[t.get('id') for t in tpt.transforms]}\n"
-        prompt += f"Confidence: {tpt.confidence:.2f}\n"
-        prompt += f"Disposition: {tpt.disposition}\n"
-        prompt += f"Reason: {tpt.reason}\n\n"
-        
-        # Add context about available parts and transforms
-        prompt += "Available Parts (sample):\n"
-        for part in available_parts[:10]:  # Show sample
-            prompt += f"  {part.get('id')}: {part.get('name')} (kind: {part.get('kind')})\n"
-        
-        prompt += "\nAvailable Transforms (sample):\n"
-        for transform in available_transforms[:10]:  # Show sample
-            prompt += f"  {transform.get('id')}: {transform.get('name')}\n"
-        
-        prompt += "\nNutrient Data (sample):\n"
-        for nutrient in nutrient_data[:5]:  # Show sample
-            prompt += f"  {nutrient.get('nutrient_id')}: {nutrient.get('amount')} {nutrient.get('unit')}\n"
-        
-        prompt += "\nAnalyze this food mapping and provide comprehensive ontology curation recommendations."
-        
-        return prompt
+        from .optimized_prompts import top_nutrients
+        
+        # Available parts/transforms travel in the (cacheable) system prompt
+        nutrient_lines = "".join(
+            f"  {nutrient.get('nutrient_id')}: {nutrient.get('amount')} {nutrient.get('unit')}\n"
+            for nutrient in top_nutrients(nutrient_data, 5)  # Most abundant by mass
+        )
+        return f"""Food: {tpt.food_name}
+Taxon: {tpt.taxon_id}
+Proposed Part: {tpt.part_id}
+Proposed Transforms: {[t.get('id') for t in tpt.transforms]}
+Confidence: {tpt.confidence:.2f}
+Disposition: {tpt.disposition}
+Reason: {tpt.reason}
+
+Nutrient Data (sample):
+{nutrient_lines}
+Analyze this food mapping and provide comprehensive ontology curation recommendations."""
     
-    def _get_curation_system_prompt(self) -> str:
-        """Get system prompt for comprehensive ontology curation"""
-        from .optimized_prompts import get_optimized_curation_system_prompt
-        return get_optimized_curation_system_prompt()
+    def _get_curation_system_prompt(self, available_parts: Optional[List[Dict[str, Any]]] = None,
+                                    available_transforms: Optional[List[Dict[str, Any]]] = None,
+                                    taxon_id: str = "") -> str:
+        """Get system prompt for comprehensive ontology curation (with ontology context when given)"""
+        from .optimized_prompts import get_optimized_curation_system_prompt, build_curation_system_prompt_with_context
+        if available_parts is None and available_transforms is None:
+            return get_optimized_curation_system_prompt()
+        return build_curation_system_prompt_with_context(available_parts or [], available_transforms or [],
+                                                         taxon_id=taxon_id, model=self.model)
     
     def _parse_curation_response(self, response: Dict[str, Any]) -> OntologyCuration:
         """Parse LLM response into OntologyCuration object"""
@@ -9,7 +9,7 @@ from lib.io import write_jsonl, append_jsonl, read_jsonl
 from lib.logging import setup_logger, ProgressTracker, MetricsCollector
 from lib.config import find_project_root, load_env, resolve_path
 from .lib.fdc import load_foundation_foods_json, filter_nutrients_for_foods, load_nutrient_index, filter_base_foods
-from .lib.llm import call_llm, DEFAULT_SYSTEM
+from .lib.llm import call_llm, set_response_cache_path, DEFAULT_SYSTEM
 from .db import GraphDB
 
 
@@ -27,7 +27,7 @@ def build_static_header(parts: List[Dict[str, Any]], transforms: List[Dict[str,
     # We include names to aid the LLM; synonyms are optional (can add later if helpful).
     # For transforms, include id, name, order, and full param schema (identity_param flag included).
     header = {
-      "version": "static-v2a",
+      "version": "static-v2b",
       "id_rules": {
         "notes": [
           "Taxon IDs start at kingdom (never domain). Use lowercase snake segments.",
@@ -102,6 +102,9 @@ def build_static_header(parts: List[Dict[str, Any]], transforms: List[Dict[str,
           } for t in tfs_sorted
         ]
       },
+      # One canonical full example; the rest are one-liners that reuse the
+      # output_contract field names instead of repeating the whole object
+      "micro_examples_format": "label [category] → output_contract fields; omitted transforms/new_taxa/new_parts/new_transforms are []",
       "micro_examples": [
         {
           "input": {"label":"Greek yogurt, plain","category":"Dairy and Egg Products"},
@@ -121,103 +124,13 @@ def build_static_header(parts: List[Dict[str, Any]], transforms: List[Dict[str,
             "new_taxa":[],"new_parts":[],"new_transforms":[]
           }
         },
-        {
-          "input": {"label":"Apple, raw","category":"Fruits and Fruit Juices"},
-          "output": {
-            "disposition":"map",
-            "node_kind":"tp",
-            "identity_json":{
-              "taxon_id":"tx:plantae:eudicots:rosales:rosaceae:malus:domestica",
-              "part_id":"part:fruit",
-              "transforms":[]
-            },
-            "confidence":0.88,
-            "reason_short":"raw edible fruit",
-            "new_taxa":[],"new_parts":[],"new_transforms":[]
-          }
-        },
-        {
-          "input": {"label":"Salt, table, iodized","category":"Spices and Herbs"},
-          "output": {
-            "disposition":"skip",
-            "node_kind":"tp",
-            "identity_json":{"taxon_id":None,"part_id":None,"transforms":[]},
-            "confidence":0.99,
-            "reason_short":"non-biological mineral",
-            "new_taxa":[],"new_parts":[],"new_transforms":[]
-          }
-        },
-        {
-          "input": {"label":"Egg white, raw, frozen, pasteurized","category":"Dairy and Egg Products"},
-          "output": {
-            "disposition":"map",
-            "node_kind":"tpt",
-            "identity_json":{
-              "taxon_id":"tx:animalia:chordata:aves:galliformes:phasianidae:gallus:gallus_domesticus",
-              "part_id":"part:egg:white",
-              "transforms":[{"id":"tf:pasteurize","params":{}},{"id":"tf:freeze","params":{}}]
-            },
-            "confidence":0.88,
-            "reason_short":"pasteurized and frozen egg white",
-            "new_taxa":[],"new_parts":[],"new_transforms":[]
-          }
-        },
-        {
-          "input": {"label":"Strawberries, raw","category":"Fruits and Fruit Juices"},
-          "output": {
-            "disposition":"map",
-            "node_kind":"tp",
-            "identity_json":{
-              "taxon_id":"tx:plantae:eudicots:rosales:rosaceae:fragaria:x_ananassa",
-              "part_id":"part:fruit",
-              "transforms":[]
-            },
-            "confidence":0.9,
-            "reason_short":"hybrid garden strawberry fruit",
-            "new_taxa":[],"new_parts":[],"new_transforms":[]
-          }
-        },
-        {
-          "input": {"label":"Mushroom, lion's mane","category":"Vegetables and Vegetable Products"},
-          "output": {
-            "disposition":"map",
-            "node_kind":"tp",
-            "identity_json":{
-              "taxon_id":"tx:fungi:agaricomycetes:russulales:hericiaceae:hericium:erinaceus",
-              "part_id":"part:fruiting_body",
-              "transforms":[]
-            },
-            "confidence":0.85,
-            "reason_short":"edible mushroom fruiting body",
-            "new_taxa":[],"new_parts":[],"new_transforms":[]
-          }
-        },
-        {
-          "input": {"label":"Oil, canola","category":"Fats and Oils"},
-          "output": {
-            "disposition":"map",
-            "node_kind":"tpt",
-            "identity_json":{
-              "taxon_id":"tx:plantae:eudicots:brassicales:brassicaceae:brassica:napus",
-              "part_id":"part:oil",
-              "transforms":[{"id":"tf:press","params":{}},{"id":"tf:refine","params":{}}]
-            },
-            "confidence":0.85,
-            "reason_short":"pressed and refined Brassica napus oil",
-            "new_taxa":[],"new_parts":[],"new_transforms":[]
-          }
-        },
-        {
-          "input": {"label":"Frankfurter, beef, unheated","category":"Sausages and Luncheon Meats"},
-          "output": {
-            "disposition":"skip",
-            "node_kind":"tp",
-            "identity_json":{"taxon_id":null,"part_id":null,"transforms":[]},
-            "confidence":0.95,
-            "reason_short":"Multi-ingredient processed meat product",
-            "new_taxa":[],"new_parts":[],"new_transforms":[]
-          }
-        }
+        "Apple, raw [Fruits and Fruit Juices] → disposition=map, node_kind=tp, taxon_id=tx:plantae:eudicots:rosales:rosaceae:malus:domestica, part_id=part:fruit, confidence=0.88, reason_short=\"raw edible fruit\"",
+        "Salt, table, iodized [Spices and Herbs] → disposition=skip, node_kind=tp, taxon_id=null, part_id=null, confidence=0.99, reason_short=\"non-biological mineral\"",
+        "Egg white, raw, frozen, pasteurized [Dairy and Egg Products] → disposition=map, node_kind=tpt, taxon_id=tx:animalia:chordata:aves:galliformes:phasianidae:gallus:gallus_domesticus, part_id=part:egg:white, transforms=[tf:pasteurize, tf:freeze], confidence=0.88, reason_short=\"pasteurized and frozen egg white\"",
+        "Strawberries, raw [Fruits and Fruit Juices] → disposition=map, node_kind=tp, taxon_id=tx:plantae:eudicots:rosales:rosaceae:fragaria:x_ananassa, part_id=part:fruit, confidence=0.9, reason_short=\"hybrid garden strawberry fruit\"",
+        "Mushroom, lion's mane [Vegetables and Vegetable Products] → disposition=map, node_kind=tp, taxon_id=tx:fungi:agaricomycetes:russulales:hericiaceae:hericium:erinaceus, part_id=part:fruiting_body, confidence=0.85, reason_short=\"edible mushroom fruiting body\"",
+        "Oil, canola [Fats and Oils] → disposition=map, node_kind=tpt, taxon_id=tx:plantae:eudicots:brassicales:brassicaceae:brassica:napus, part_id=part:oil, transforms=[tf:press, tf:refine], confidence=0.85, reason_short=\"pressed and refined Brassica napus oil\"",
+        "Frankfurter, beef, unheated [Sausages and Luncheon Meats] → disposition=skip, node_kind=tp, taxon_id=null, part_id=null, confidence=0.95, reason_short=\"Multi-ingredient processed meat product\""
       ]
     }
 
@@ -337,6 +250,7 @@ def main():
     ap.add_argument("--fdc", default="data/sources/fdc", help="Folder containing FDC data")
     ap.add_argument("--out", dest="out_dir", default="data/evidence/fdc-foundation")
     ap.add_argument("--model", default=os.environ.get("EVIDENCE_LLM_MODEL","gpt-5-mini"))
+    ap.add_argument("--model-large", default=os.environ.get("EVIDENCE_LLM_MODEL_LARGE"), help="Re-run low-confidence/ambiguous results on this model (off by default)")
     # Default temperature based on model (gpt-5-mini only supports 1.0)
     env_temperature = os.environ.get("EVIDENCE_LLM_TEMPERATURE")
     temperature: Optional[float] = 1.0  # Default for gpt-5-mini
@@ -355,7 +269,10 @@ def main():
     ap.add_argument("--nutrient-registry", default="data/ontology/nutrients.json", help="Path to INFOODS registry.")
     ap.add_argument("--overwrite", action="store_true", help="Rewrite mapping.jsonl instead of appending/resuming")
     ap.add_argument("--debug-prompts", action="store_true", help="Save prompts and responses to debug directories")
+    ap.add_argument("--llm-cache", default=None, help="SQLite file persisting LLM responses across runs (default: $EVIDENCE_LLM_CACHE)")
     args = ap.parse_args()
+    if args.llm_cache:
+        set_response_cache_path(args.llm_cache)
     
     # Ensure gpt-5-mini uses temperature=1 (it only supports 1)
     if "gpt-5-mini" in args.model and temperature != 1.0:
@@ -398,7 +315,7 @@ def main():
     
     log_file_path = logs_dir / "map.log"
     with log_file_path.open("a", encoding="utf-8") as log_file:
-        log_file.write(f"[{datetime.utcnow().isoformat()}] run start model={args.model} min_conf={args.min_conf} topk={args.topk} limit={args.limit}\n")
+        log_file.write(f"[{datetime.utcnow().isoformat()}] run start model={args.model} model_large={args.model_large} min_conf={args.min_conf} topk={args.topk} limit={args.limit}\n")
 
     # 1) Load graph registries (parts, transforms) and prep candidate search
     # Resolve database path relative to project root
@@ -444,6 +361,9 @@ def main():
 
     # Build the cache-friendly static header once (no timestamps, no dynamic fields)
     static_header = build_static_header(parts, transforms)
+    # Header plus item marker, joined once; each food's prompt then copies the
+    # header a single time instead of once per `+` in a concatenation chain
+    item_prefix = static_header + "\n### ITEM\n"
 
     # 2) Load existing foods.jsonl to create exclusion map for resume
     existing_foods = set()
@@ -630,6 +550,7 @@ def main():
     skipped_count = 0
     ambiguous_count = 0
     error_count = 0
+    escalated_count = 0
     
     # Create OpenAI client once for session continuity
     from openai import OpenAI
@@ -638,6 +559,15 @@ def main():
         raise RuntimeError("OPENAI_API_KEY environment variable is required but not set.")
     openai_client = OpenAI(api_key=api_key)
     
+    # Debug: Check if static header is long enough for caching (>1024 tokens)
+    if args.debug_prompts:
+        # tiktoken count when available, else ~4 chars per token
+        from .lib.optimized_prompts import estimate_prompt_tokens
+        header_tokens = estimate_prompt_tokens(static_header, static_prefix=static_header, model=args.model)
+        print(f"[DEBUG] Static header length: {len(static_header)} chars (~{header_tokens} tokens)")
+        if header_tokens < 1024:
+            print(f"[DEBUG] WARNING: Static header too short for caching (need >1024 tokens)")
+    
     for food in norm_foods:
         fid = food["food_id"]
         if fid in existing:
@@ -664,20 +594,11 @@ def main():
             "category": food.get("category",""),
         }
         
-        prompt = (
-            static_header
-            + "\n### ITEM\n"
-            + json.dumps(item, ensure_ascii=False, separators=(",",":"))
-            + "\n### RESPOND_WITH_JSON_ONLY"
-        )
-        
-        # Debug: Check if static header is long enough for caching (>1024 tokens)
-        if args.debug_prompts:
-            # Rough token estimation (4 chars per token)
-            header_tokens = len(static_header) // 4
-            print(f"[DEBUG] Static header length: {len(static_header)} chars (~{header_tokens} tokens)")
-            if header_tokens < 1024:
-                print(f"[DEBUG] WARNING: Static header too short for caching (need >1024 tokens)")
+        prompt = "".join((
+            item_prefix,
+            json.dumps(item, ensure_ascii=False, separators=(",",":")),
+            "\n### RESPOND_WITH_JSON_ONLY",
+        ))
         
         # Debug logging for prompts
         if args.debug_prompts:
@@ -705,7 +626,7 @@ def main():
         try:
             llm_start = time.time()
             # Call LLM with single user message for cached input optimization
-            response = call_llm(model=args.model, system=DEFAULT_SYSTEM, user=prompt, max_retries=1, temperature=temperature, client=openai_client)
+            response = call_llm(model=args.model, system=DEFAULT_SYSTEM, user=prompt, max_retries=1, temperature=temperature, client=openai_client, model_large=args.model_large, escalate_below=args.min_conf)
             llm_time_ms = int((time.time() - llm_start) * 1000)
             
             # Extract token usage if available
@@ -723,6 +644,8 @@ def main():
                 timing_stats["total_tokens"] += usage['total_tokens']
                 # Remove token usage from the response object
                 del response['_token_usage']
+            if isinstance(response, dict) and response.pop('_escalated_from', None):
+                escalated_count += 1
             
             # Debug logging for raw responses
             if args.debug_prompts:
@@ -830,7 +753,7 @@ def main():
     avg_cached_tokens = timing_stats["cached_tokens"] / num_items
     
     with log_file_path.open("a", encoding="utf-8") as f:
-        f.write(f"[done] processed={processed} accepted={accepted_count} skipped={skipped_count} ambiguous={ambiguous_count} errors={error_count} total_time={timing_stats['total_time']:.2f}s avg_per_food={avg_time_per_food:.2f}s\n")
+        f.write(f"[done] processed={processed} accepted={accepted_count} skipped={skipped_count} ambiguous={ambiguous_count} errors={error_count} escalated={escalated_count} total_time={timing_stats['total_time']:.2f}s avg_per_food={avg_time_per_food:.2f}s\n")
         f.write(f"[tokens] input={timing_stats['input_tokens']} cached={timing_stats['cached_tokens']} output={timing_stats['output_tokens']} total={timing_stats['total_tokens']} avg_input={avg_input_tokens:.1f} avg_cached={avg_cached_tokens:.1f} avg_output={avg_output_tokens:.1f}\n")
 
     # Acceptance summary (Phase-1)
@@ -841,6 +764,8 @@ def main():
         "skipped": skipped_count,
         "ambiguous": ambiguous_count,
         "errors": error_count,
+        "model_large": args.model_large,
+        "escalated": escalated_count,
         "yield_pct": (0 if processed==0 else round(100.0*accepted_count/processed,1)),
         "total_time_s": round(timing_stats["total_time"],2),
         "avg_tokens_in": round(avg_input_tokens,1),
@@ -857,6 +782,8 @@ def main():
     print(f"Skipped: {skipped_count} foods")
     print(f"Ambiguous: {ambiguous_count} foods")
     print(f"Errors: {error_count} foods")
+    if args.model_large:
+        print(f"Escalated to {args.model_large}: {escalated_count} foods")
     print(f"Total time: {timing_stats['total_time']:.2f}s")
     print(f"Avg per food: {avg_time_per_food:.2f}s")
     print(f"Tokens used: {timing_stats['total_tokens']} (input: {timing_stats['input_tokens']}, output: {timing_stats['output_tokens']})")
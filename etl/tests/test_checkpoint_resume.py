@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for checkpoint resume of the Tier 1 and Tier 2 batch paths
+
+Both tiers share the same contract: each settled result is appended as soon
+as it is known, a torn last line is dropped, and failed LLM calls are left
+out so that a resumed run retries them.
+"""
+
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from etl.evidence.lib import tier1_taxon, tier2_tpt
+from etl.evidence.lib.ncbi_resolver import NCBIResolution
+from etl.evidence.lib.tier1_taxon import TaxonResolution, Tier1TaxonResolver
+from etl.evidence.lib.tier2_tpt import Tier2TPTConstructor
+
+LINEAGE = NCBIResolution(taxon_id="tx:p:malus", ncbi_taxid=3750, confidence=0.9,
+                         lineage={"kingdom": "Viridiplantae"}, needs_refinement=False, reason="ok")
+
+class Tier1Case:
+    """resolve_batch over foods, one taxon per food name"""
+
+    module = tier1_taxon
+    ANSWERS = {"Apples, raw": "tx:p:malus", "Pears, raw": "tx:p:pyrus", "Plums, raw": "tx:p:prunus",
+               "Quinces, raw": "tx:p:cydonia"}
+
+    def __init__(self):
+        self.items = [{"fdc_id": i, "description": name} for i, name in enumerate(self.ANSWERS, 1)]
+
+    @staticmethod
+    def food_name(request):
+        return request["user"].split("Food: ", 1)[1]
+
+    def response(self, food_name):
+        return {"taxon_id": self.ANSWERS[food_name], "confidence": 0.9, "disposition": "resolved"}
+
+    @staticmethod
+    def run(items, **kwargs):
+        ncbi = Mock()
+        ncbi.resolve_taxon.side_effect = lambda taxon_id: NCBIResolution(
+            taxon_id=taxon_id, ncbi_taxid=1, confidence=0.9, lineage={"kingdom": "Viridiplantae"},
+            needs_refinement=False, reason="ok"
+        )
+        return Tier1TaxonResolver(ncbi, model="test").resolve_batch(items, **kwargs)
+
+    @staticmethod
+    def check_rebuilt(result):
+        assert isinstance(result.ncbi_resolution, NCBIResolution)
+
+class Tier2Case:
+    """construct_batch over resolved foods, one cooking method per food name"""
+
+    module = tier2_tpt
+    ANSWERS = {"Apples, raw": "raw", "Apples, baked": "bake", "Apples, boiled": "boil", "Apples, dried": "dry"}
+    PARTS = [SimpleNamespace(id="part:fruit", name="Fruit", kind="plant", applies_to=[])]
+    TRANSFORMS = [SimpleNamespace(id="tf:cook", name="Cook", order=90, params=[])]
+
+    def __init__(self):
+        self.items = [TaxonResolution(food_id=str(i), food_name=name, taxon_id="tx:p:malus", confidence=0.9,
+                                      disposition="resolved", reason="", ncbi_resolution=LINEAGE, new_taxa=[])
+                      for i, name in enumerate(self.ANSWERS, 1)]
+
+    @staticmethod
+    def food_name(request):
+        return request["user"].split("Food: ", 1)[1].split("\n", 1)[0]
+
+    def response(self, food_name):
+        method = self.ANSWERS[food_name]
+        return {"part_id": "part:fruit", "transforms": [{"id": "tf:cook", "params": {"method": method}}],
+                "confidence": 0.9, "disposition": "constructed", "reason": method}
+
+    @classmethod
+    def run(cls, items, **kwargs):
+        part_filter = Mock()
+        part_filter.get_applicable_parts.side_effect = lambda taxon_id, lineage, parts, min_confidence: list(parts)
+        return Tier2TPTConstructor(part_filter, model="test").construct_batch(items, cls.PARTS, cls.TRANSFORMS,
+                                                                             **kwargs)
+
+    @classmethod
+    def check_rebuilt(cls, result):
+        # Part ids in the checkpoint map back to the ontology's part objects
+        assert result.applicable_parts[0] is cls.PARTS[0]
+
+@pytest.fixture(params=[Tier1Case, Tier2Case], ids=["tier1", "tier2"])
+def case(request, monkeypatch):
+    """A tier case whose LLM answers by food name, recording what was sent and failing on request"""
+    case = request.param()
+    case.sent = []
+    case.failing = set()
+
+    def fake_iter(requests, max_workers):
+        for llm_request in requests:
+            food_name = case.food_name(llm_request)
+            case.sent.append(food_name)
+            yield RuntimeError("timeout") if food_name in case.failing else case.response(food_name)
+
+    monkeypatch.setattr(case.module, "iter_llm_batch", fake_iter)
+    monkeypatch.setattr(case.module, "call_llm_batch", lambda requests, max_workers: list(fake_iter(requests, max_workers)))
+    return case
+
+class TestCheckpointResume:
+    """Batch runs resume from a checkpoint JSONL"""
+
+    def test_resume_after_torn_last_line(self, case, tmp_path):
+        checkpoint = tmp_path / "checkpoint.jsonl"
+        expected = case.run(case.items)
+
+        assert case.run(case.items[:3], checkpoint=checkpoint) == expected[:3]
+        lines = checkpoint.read_text().splitlines()
+        assert len(lines) == 3
+
+        # Killed while appending the third row
+        checkpoint.write_text("\n".join(lines[:2]) + "\n" + lines[2][:len(lines[2]) // 2])
+        case.sent.clear()
+        resumed = case.run(case.items, checkpoint=checkpoint)
+
+        assert case.sent == list(case.ANSWERS)[2:]
+        assert resumed == expected
+        case.check_rebuilt(resumed[0])
+
+        # The torn line was terminated, so every later row is whole
+        rows = checkpoint.read_text().splitlines()
+        assert len(rows) == 5
+        assert [json.loads(row)["food_id"] for row in rows[:2] + rows[3:]] == ["1", "2", "3", "4"]
+
+        case.sent.clear()
+        assert case.run(case.items, checkpoint=checkpoint) == expected
+        assert case.sent == []
+
+    def test_llm_errors_are_retried_on_resume(self, case, tmp_path):
+        """A failed call is returned as an error skip but never checkpointed"""
+        checkpoint = tmp_path / "checkpoint.jsonl"
+        expected = case.run(case.items)
+        names = list(case.ANSWERS)
+
+        case.failing.add(names[1])
+        first = case.run(case.items, checkpoint=checkpoint)
+        assert first[1].reason == "LLM error: timeout"
+        assert [first[0], first[2], first[3]] == [expected[0], expected[2], expected[3]]
+        # Rows after the failure are still written as they finish
+        assert [json.loads(row)["food_id"] for row in checkpoint.read_text().splitlines()] == ["1", "3", "4"]
+
+        case.failing.clear()
+        case.sent.clear()
+        assert case.run(case.items, checkpoint=checkpoint) == expected
+        assert case.sent == [names[1]]
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for LLM retry backoff
+"""
+
+import pytest
+from types import SimpleNamespace
+
+openai = pytest.importorskip("openai")
+
+from etl.evidence.lib import llm
+
+def _error(error_class, status, headers):
+    # Only the status and response headers matter to the backoff
+    err = error_class.__new__(error_class)
+    err.status_code = status
+    err.response = SimpleNamespace(status_code=status, headers=headers)
+    return err
+
+class TestBackoffDelay:
+    """Server-requested waits apply to rate limits only, within a ceiling"""
+
+    @pytest.fixture(autouse=True)
+    def no_jitter(self, monkeypatch):
+        monkeypatch.setattr(llm.random, "uniform", lambda low, high: 0.0)
+
+    def test_retry_after_beats_reset_headers(self):
+        err = _error(openai.RateLimitError, 429, {"retry-after": "7", "x-ratelimit-reset-requests": "20s"})
+        assert llm._backoff_delay(1, err) == 7.0
+
+    def test_retry_after_ms(self):
+        err = _error(openai.RateLimitError, 429, {"retry-after-ms": "2500", "retry-after": "9"})
+        assert llm._backoff_delay(1, err) == 2.5
+
+    def test_reset_header_is_a_rate_limit_fallback(self):
+        err = _error(openai.RateLimitError, 429, {"x-ratelimit-reset-tokens": "12s"})
+        assert llm._backoff_delay(1, err) == 12.0
+
+    def test_rate_limit_wait_is_capped(self):
+        err = _error(openai.RateLimitError, 429, {"x-ratelimit-reset-requests": "1h"})
+        assert llm._backoff_delay(1, err) == llm.RETRY_AFTER_MAX
+
+    def test_server_error_ignores_rate_limit_headers(self):
+        """A transient 500 carries the same headers but keeps plain exponential backoff"""
+        err = _error(openai.InternalServerError, 500, {"retry-after": "30", "x-ratelimit-reset-requests": "6m0s"})
+        assert llm._retry_after(err) is None
+        assert llm._backoff_delay(1, err) == llm.BACKOFF_INITIAL
+        assert llm._backoff_delay(20, err) == llm.BACKOFF_MAX
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the NCBI resolver used by evidence mapping
+"""
+
+import pytest
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from etl.evidence.lib.ncbi_resolver import NCBIResolver
+
+class TestNCBIResolver:
+    """Test SQL-backed and preloaded NCBI resolution"""
+
+    def setup_method(self):
+        """Create a minimal NCBI database"""
+        self.temp_db = tempfile.NamedTemporaryFile(suffix='.sqlite', delete=False)
+        self.temp_db.close()
+
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.executescript("""
+                CREATE TABLE ncbi_names (taxid INTEGER, name_txt TEXT, name_class TEXT);
+                CREATE TABLE ncbi_lineage (
+                    taxid INTEGER PRIMARY KEY, kingdom TEXT, phylum TEXT, class TEXT,
+                    order_name TEXT, family TEXT, genus TEXT, species TEXT, lineage_json TEXT
+                );
+                CREATE VIRTUAL TABLE ncbi_names_fts USING fts5(name_txt, name_class, taxid UNINDEXED);
+
+                INSERT INTO ncbi_names VALUES
+                    (33090, 'Viridiplantae', 'scientific name'),
+                    (3749, 'Malus', 'scientific name'),
+                    (3750, 'Malus domestica', 'scientific name'),
+                    (3750, 'apple', 'common name');
+                INSERT INTO ncbi_lineage VALUES
+                    (3749, '33090', NULL, NULL, NULL, NULL, '3749', NULL,
+                     '{"kingdom": "33090", "genus": "3749"}'),
+                    (3750, '33090', NULL, NULL, NULL, NULL, '3749', '3750',
+                     '{"kingdom": "33090", "genus": "3749", "species": "3750"}');
+                INSERT INTO ncbi_names_fts SELECT name_txt, name_class, taxid FROM ncbi_names;
+            """)
+
+    def teardown_method(self):
+        """Clean up test database"""
+        Path(self.temp_db.name).unlink()
+
+    @pytest.mark.parametrize("preload", [False, True])
+    def test_exact_match(self, preload):
+        """Exact genus+species matches resolve with full lineage names"""
+        resolver = NCBIResolver(Path(self.temp_db.name), preload=preload)
+        resolution = resolver.resolve_taxon("tx:p:Malus:domestica")
+
+        assert resolution.ncbi_taxid == 3750
+        assert resolution.confidence == 0.9
+        assert resolution.lineage == {
+            'kingdom': 'Viridiplantae',
+            'genus': 'Malus',
+            'species': 'Malus domestica'
+        }
+
+    @pytest.mark.parametrize("preload", [False, True])
+    def test_genus_match(self, preload):
+        """Unknown species falls back to the genus-level match"""
+        resolver = NCBIResolver(Path(self.temp_db.name), preload=preload)
+        resolution = resolver.resolve_taxon("tx:p:malus:unknown")
+
+        assert resolution.ncbi_taxid == 3749
+        assert resolution.reason == "Genus-level NCBI match"
+        assert resolution.needs_refinement
+
+    def test_read_only_connection(self):
+        """Read-only resolvers query through a mode=ro URI connection"""
+        resolver = NCBIResolver(Path(self.temp_db.name), read_only=True)
+        resolution = resolver.resolve_taxon("tx:p:Malus:domestica")
+
+        assert resolution.ncbi_taxid == 3750
+        with pytest.raises(sqlite3.OperationalError):
+            resolver._connect().execute("DELETE FROM ncbi_names")
+
+    def test_preload_builds_indexes(self):
+        """Preloading only indexes scientific names"""
+        resolver = NCBIResolver(Path(self.temp_db.name), preload=True)
+
+        assert resolver.preloaded
+        assert "Malus domestica" in resolver._species_index
+        assert "apple" not in resolver._species_index
+        assert resolver._genus_index["malus"][0] == 3749
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -65,6 +65,7 @@ class TestNutrientMapper:
     
     def teardown_method(self):
         """Clean up test data"""
+        self.mapper.close()
         Path(self.temp_file.name).unlink()
     
     def test_build_fdc_to_infoods_mapping(self):
@@ -143,6 +144,52 @@ class TestNutrientMapper:
         assert result.unmapped_info.food_id == '12345'
         assert result.unmapped_info.amount == 50.0
     
+    def test_unmapped_nutrients_spill_to_disk(self):
+        """Test that unmapped nutrients are streamed back from the spill file"""
+        self.mapper.map_fdc_nutrient({'nutrient_id': '9999', 'fdc_id': '1', 'amount': '1', 'unit': 'G'})
+        self.mapper.map_fdc_nutrient({'nutrient_id': '208', 'fdc_id': '1', 'amount': '1', 'unit': 'KCAL'})
+        self.mapper.map_fdc_nutrient({'nutrient_id': '9998', 'fdc_id': '2', 'amount': '2', 'unit': 'MG'})
+        
+        unmapped = list(self.mapper.get_unmapped_nutrients())
+        assert [u.fdc_id for u in unmapped] == ['9999', '9998']
+        assert unmapped[1].amount == 2.0
+        assert self.mapper.get_mapping_stats()['unmapped_nutrients'] == 2
+        
+        spill_path = self.mapper.unmapped_path
+        self.mapper.close()
+        assert not spill_path.exists()
+
+    def test_explicit_unmapped_path_starts_empty(self, tmp_path):
+        """Rows left in a caller's spill file by an earlier run are not reported again"""
+        spill_path = tmp_path / "unmapped.jsonl"
+        with NutrientMapper(Path(self.temp_file.name), unmapped_path=spill_path) as mapper:
+            mapper.map_fdc_nutrient({'nutrient_id': '9999', 'fdc_id': '1', 'amount': '1', 'unit': 'G'})
+
+        with NutrientMapper(Path(self.temp_file.name), unmapped_path=spill_path) as mapper:
+            assert list(mapper.get_unmapped_nutrients()) == []
+            mapper.map_fdc_nutrient({'nutrient_id': '9998', 'fdc_id': '2', 'amount': '2', 'unit': 'MG'})
+            assert [u.fdc_id for u in mapper.get_unmapped_nutrients()] == ['9998']
+        # The caller's file is kept
+        assert spill_path.exists()
+
+    def test_map_fdc_nutrients_df(self):
+        """Test vectorized DataFrame mapping matches the scalar path"""
+        pd = pytest.importorskip("pandas")
+        df = pd.DataFrame({
+            'nutrient_id': ['313', '9999'],
+            'fdc_id': ['12345', '12345'],
+            'amount': ['1000', '5'],
+            'unit': ['UG', 'G']
+        })
+        
+        out = self.mapper.map_fdc_nutrients_df(df)
+        
+        assert out['mapped'].tolist() == [True, False]
+        row = self.mapper.map_fdc_nutrient(df.iloc[0].to_dict()).nutrient_row
+        for key, value in row.items():
+            assert out.iloc[0][key] == value
+        assert [u.fdc_id for u in self.mapper.get_unmapped_nutrients()] == ['9999']
+    
     def test_get_mapping_stats(self):
         """Test mapping statistics"""
         stats = self.mapper.get_mapping_stats()
@@ -171,6 +218,7 @@ class TestNutrientStore:
     
     def teardown_method(self):
         """Clean up test database"""
+        self.store.close()
         Path(self.temp_db.name).unlink()
     
     def test_nutrient_row_creation(self):
@@ -229,6 +277,69 @@ class TestNutrientStore:
         assert retrieved_row.conversion_factor == nutrient_row.conversion_factor
         assert retrieved_row.nutrient_name == nutrient_row.nutrient_name
 
+    
+    def test_store_rows_and_stream_by_source(self):
+        """Test bulk storage and chunked streaming of nutrient rows"""
+        rows = [
+            NutrientRow(
+                id=f"{food}_N{i}", food_id=str(food), nutrient_id=f"N{i}", amount=float(i),
+                unit="g", original_amount=float(i), original_unit="G", original_nutrient_id=str(i),
+                conversion_factor=1.0, source="fdc_foundation", confidence=0.9
+            )
+            for food in range(3) for i in range(150)
+        ]
+        self.store.store_nutrient_rows(rows)
+        
+        streamed = list(self.store.iter_nutrient_rows_by_source("fdc_foundation", chunk_size=64))
+        assert len(streamed) == 450
+        assert [r.food_id for r in streamed[:2]] == ["0", "0"]
+        assert len(self.store.get_nutrient_rows_for_food("2")) == 150
+
+    def test_map_fdc_nutrients_parallel_matches_sequential(self, monkeypatch):
+        """Large inputs are mapped in the shared, capped process pool with the same rows"""
+        from etl.evidence.lib import nutrient_store, parallel_mapping
+        fdc_nutrients = [{'fdc_id': str(i // 3), 'nutrient_id': ('203', '208', '9999')[i % 3],
+                          'amount': str(i), 'unit': 'G'} for i in range(30)]
+        mapping = {'203': 'PROT', '208': 'ENERC_KCAL'}
+        sequential = self.store.map_fdc_nutrients(fdc_nutrients, mapping)
+        
+        pools = []
+        map_chunks_parallel = parallel_mapping.map_chunks_parallel
+        monkeypatch.setattr(parallel_mapping, "map_chunks_parallel",
+                            lambda *args, **kwargs: pools.append(kwargs) or map_chunks_parallel(*args, **kwargs))
+        monkeypatch.setattr(nutrient_store, "PARALLEL_MAPPING_THRESHOLD", 10)
+        monkeypatch.setattr(nutrient_store, "_MAPPING_CHUNK_SIZE", 8)
+        parallel = self.store.map_fdc_nutrients(fdc_nutrients, mapping)
+        
+        assert len(pools) == 1
+        assert parallel == sequential
+        assert [r.nutrient_id for r in parallel[:3]] == ['PROT', 'ENERC_KCAL', '9999']
+        assert parallel_mapping._default_workers() <= 8
+
+    def test_canonical_nutrients_survive_own_writes(self):
+        """Nutrient rows written by the store keep the cache; another connection's commit drops it"""
+        import sqlite3
+        with sqlite3.connect(self.temp_db.name) as con:
+            con.execute("CREATE TABLE nutrients (id TEXT PRIMARY KEY, name TEXT, unit TEXT)")
+            con.execute("INSERT INTO nutrients VALUES ('PROCNT', 'Protein', 'g')")
+        con.close()
+        nutrients = self.store.get_canonical_nutrients()
+        mapping = self.store.create_nutrient_mapping()
+        assert mapping == {'1003': 'PROCNT'}
+
+        self.store.store_nutrient_rows([NutrientRow(
+            id="1_PROCNT", food_id="1", nutrient_id="PROCNT", amount=1.0, unit="g", original_amount=1.0,
+            original_unit="G", original_nutrient_id="203", conversion_factor=1.0, source="fdc_foundation",
+            confidence=0.9
+        )])
+        self.store.delete_nutrient_rows_for_food("1")
+        assert self.store.get_canonical_nutrients() is nutrients
+        assert self.store.create_nutrient_mapping() is mapping
+
+        with sqlite3.connect(self.temp_db.name) as con:
+            con.execute("INSERT INTO nutrients VALUES ('FAT', 'Total lipid (fat)', 'g')")
+        con.close()
+        assert [n['id'] for n in self.store.get_canonical_nutrients()] == ['FAT', 'PROCNT']
 
 class TestUnmappedNutrientCollector:
     """Test the unmapped nutrient proposal system"""
@@ -321,5 +432,62 @@ class TestUnmappedNutrientCollector:
         assert loaded[0].occurrence_count == proposal.occurrence_count
 
 
+class TestEvidenceMapperWorkers:
+    """Nutrient mapping stats must not depend on --workers"""
+    
+    def setup_method(self):
+        """Set up nutrients.json and a nutrient store"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        nutrients_json = self.temp_dir / "nutrients.json"
+        nutrients_json.write_text(json.dumps({
+            "version": "v1.1",
+            "nutrients": [{"id": "PROT", "name": "Protein", "class": "proximate", "unit": "g", "fdc_candidates": ["203"],
+                           "fdc_unit": "G", "unit_factor_from_fdc": 1.0, "confidence": "high"}]
+        }))
+        self.nutrients_json = nutrients_json
+        (self.temp_dir / "graph.sqlite").touch()
+        self.store = NutrientStore(self.temp_dir / "graph.sqlite")
+        self.store.create_tables()
+        self.nutrients_by_food = {
+            food_id: [{'nutrient_id': '203', 'fdc_id': food_id, 'amount': '1', 'unit': 'G'},
+                      {'nutrient_id': '9999', 'fdc_id': food_id, 'amount': '2', 'unit': 'G'}]
+            for food_id in ('1', '2', '3')
+        }
+    
+    def teardown_method(self):
+        """Clean up test directory"""
+        import shutil
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def _summary(self, workers):
+        from etl.evidence.evidence_mapper import EvidenceMapper
+        
+        mapper = EvidenceMapper.__new__(EvidenceMapper)
+        mapper.workers = workers
+        mapper._premapped_nutrients = {}
+        mapper.nutrient_store = self.store
+        mapper.nutrient_mapper = NutrientMapper(self.nutrients_json, unmapped_path=self.temp_dir / f"unmapped_{workers}.jsonl")
+        mapper.unmapped_collector = Mock()
+        mapper._premap_nutrients(self.nutrients_by_food)
+        
+        tpt = Mock(confidence=0.9, reason="test")
+        mappings = [mapper._create_high_confidence_mapping(food_id, "Food", Mock(), tpt, nutrients)
+                    for food_id, nutrients in self.nutrients_by_food.items()]
+        summary = mapper._generate_summary(mappings, mappings, len(mappings), 0, 0.5, [])
+        unmapped = [(u.fdc_id, u.food_id) for u in mapper.nutrient_mapper.get_unmapped_nutrients()]
+        mapper.nutrient_mapper.close()
+        return summary, unmapped
+    
+    def test_parallel_summary_matches_in_process(self):
+        """Unmapped nutrients from worker processes are recorded on the parent mapper"""
+        sequential, sequential_unmapped = self._summary(1)
+        parallel, parallel_unmapped = self._summary(2)
+        
+        assert sequential['nutrient_mapping']['unmapped_nutrients'] == 3
+        assert parallel == sequential
+        assert parallel_unmapped == sequential_unmapped
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
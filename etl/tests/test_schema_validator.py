@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for TPT schema validation
+
+The errors strings are fed verbatim to the Tier 3 remediation prompt, so
+they are asserted byte for byte.
+"""
+
+import pytest
+
+from etl.evidence.lib.schema_validator import SchemaValidator, validate_tpt_construction, _validator_for
+
+PARTS_INDEX = {"part:fruit": {"id": "part:fruit"}, "part:leaf": {"id": "part:leaf"}}
+TRANSFORMS_INDEX = {
+    "tf:cook": {
+        "id": "tf:cook",
+        "params": [
+            {"key": "method", "kind": "enum", "enum": ["raw", "boil", "bake"]},
+            {"key": "time_min", "kind": "number"},
+            {"key": "fat_added", "kind": "boolean"},
+        ],
+    },
+    "tf:dry": {"id": "tf:dry", "params": []},
+}
+
+class TestSchemaValidator:
+    """Test errors, structured errors and valid values for each error type"""
+
+    def setup_method(self):
+        self.validator = SchemaValidator(PARTS_INDEX, TRANSFORMS_INDEX)
+
+    def test_valid_mapping(self):
+        result = self.validator.validate_mapping(
+            "tx:p:malus", "part:fruit",
+            [{"id": "tf:cook", "params": {"method": "bake", "time_min": 30, "fat_added": True}}, {"id": "tf:dry"}]
+        )
+
+        assert result.valid
+        assert result.errors == []
+        assert result.structured_errors == []
+
+    def test_invalid_part(self):
+        result = self.validator.validate_mapping("tx:p:malus", "part:root", [])
+
+        assert not result.valid
+        assert result.errors == ["Invalid part_id: 'part:root' not in ontology"]
+        (error,) = result.structured_errors
+        assert (error.transform_index, error.transform_id, error.error_type, error.attempted_value) == \
+            (-1, "", "invalid_part", "part:root")
+        assert error.valid_values == ["part:fruit", "part:leaf"]
+        assert error.message == "Invalid part_id: 'part:root' not in ontology"
+
+    def test_invalid_transform(self):
+        result = self.validator.validate_mapping("tx:p:malus", "part:fruit", [{"id": "tf:fry", "params": {}}])
+
+        assert result.errors == ["Transform 0: invalid transform_id 'tf:fry' not in ontology"]
+        (error,) = result.structured_errors
+        assert (error.transform_index, error.transform_id, error.error_type) == (0, "tf:fry", "invalid_transform")
+        assert error.valid_values == ["tf:cook", "tf:dry"]
+        assert error.message == "Invalid transform_id 'tf:fry'"
+
+    def test_unknown_param(self):
+        result = self.validator.validate_mapping("tx:p:malus", "part:fruit",
+                                                 [{"id": "tf:dry"}, {"id": "tf:cook", "params": {"temp": 180}}])
+
+        assert result.errors == ["Transform 1 (tf:cook): unknown parameter 'temp'"]
+        (error,) = result.structured_errors
+        assert (error.transform_index, error.param_name, error.attempted_value, error.error_type) == \
+            (1, "temp", 180, "unknown_param")
+        assert error.valid_values == ["method", "time_min", "fat_added"]
+        assert error.schema_constraint["method"]["enum"] == ["raw", "boil", "bake"]
+
+    def test_invalid_enum(self):
+        result = self.validator.validate_mapping("tx:p:malus", "part:fruit",
+                                                 [{"id": "tf:cook", "params": {"method": "fry"}}])
+
+        assert result.errors == ["Transform 0 (tf:cook): param 'method': invalid value 'fry'. "
+                                 "Must be one of: ['raw', 'boil', 'bake']"]
+        (error,) = result.structured_errors
+        assert (error.error_type, error.param_name, error.attempted_value) == ("invalid_enum", "method", "fry")
+        assert error.valid_values == ["raw", "boil", "bake"]
+        assert error.schema_constraint == TRANSFORMS_INDEX["tf:cook"]["params"][0]
+
+    def test_unhashable_enum_value(self):
+        """A dict where an enum name was expected is an invalid value, not a crash"""
+        result = self.validator.validate_mapping("tx:p:malus", "part:fruit",
+                                                 [{"id": "tf:cook", "params": {"method": {"name": "bake"}}}])
+
+        assert result.errors == ["Transform 0 (tf:cook): param 'method': invalid value '{'name': 'bake'}'. "
+                                 "Must be one of: ['raw', 'boil', 'bake']"]
+        assert [e.error_type for e in result.structured_errors] == ["invalid_enum"]
+
+    def test_type_mismatch(self):
+        result = self.validator.validate_mapping("tx:p:malus", "part:fruit",
+                                                 [{"id": "tf:cook", "params": {"time_min": "30"}}])
+
+        assert result.errors == ["Transform 0 (tf:cook): param 'time_min': expected number, got str"]
+        (error,) = result.structured_errors
+        assert (error.error_type, error.param_name, error.attempted_value) == ("type_mismatch", "time_min", "30")
+        assert error.valid_values is None
+        assert error.schema_constraint == {"key": "time_min", "kind": "number"}
+
+    @pytest.mark.parametrize("value, type_name", [(True, "bool"), (False, "bool"), (None, "NoneType")])
+    def test_bool_is_not_a_number(self, value, type_name):
+        """bool is an int subclass, but True/False for a number param is a type mismatch"""
+        result = self.validator.validate_mapping("tx:p:malus", "part:fruit",
+                                                 [{"id": "tf:cook", "params": {"time_min": value}}])
+
+        assert result.errors == [f"Transform 0 (tf:cook): param 'time_min': expected number, got {type_name}"]
+        assert [e.error_type for e in result.structured_errors] == ["type_mismatch"]
+
+    @pytest.mark.parametrize("value", [0, 30, 2.5])
+    def test_numbers_pass(self, value):
+        assert self.validator.validate_mapping("tx:p:malus", "part:fruit",
+                                               [{"id": "tf:cook", "params": {"time_min": value}}]).valid
+
+    def test_malformed_transforms_are_unstructured(self):
+        result = self.validator.validate_mapping("tx:p:malus", "part:fruit", ["tf:cook", {"params": {}}])
+
+        assert result.errors == ["Transform 0: expected dict, got str", "Transform 1: missing 'id' field"]
+        assert result.structured_errors == []
+
+    def test_errors_keep_input_order(self):
+        result = self.validator.validate_mapping(
+            "tx:p:malus", "part:root",
+            [{"id": "tf:cook", "params": {"method": "fry", "temp": 1}}, {"id": "tf:fry"}]
+        )
+
+        assert result.errors == [
+            "Invalid part_id: 'part:root' not in ontology",
+            "Transform 0 (tf:cook): param 'method': invalid value 'fry'. Must be one of: ['raw', 'boil', 'bake']",
+            "Transform 0 (tf:cook): unknown parameter 'temp'",
+            "Transform 1: invalid transform_id 'tf:fry' not in ontology",
+        ]
+        assert [e.error_type for e in result.structured_errors] == \
+            ["invalid_part", "invalid_enum", "unknown_param", "invalid_transform"]
+
+class TestValidateTPTConstruction:
+    """Test the convenience wrapper and its validator reuse"""
+
+    def test_dict_construction(self):
+        result = validate_tpt_construction({"taxon_id": "tx:p:malus", "part_id": "part:leaf", "transforms": []},
+                                           PARTS_INDEX, TRANSFORMS_INDEX)
+        assert result.valid
+
+    def test_validator_reused_for_the_same_indexes(self):
+        validator = _validator_for(PARTS_INDEX, TRANSFORMS_INDEX)
+        assert _validator_for(PARTS_INDEX, TRANSFORMS_INDEX) is validator
+
+        # An equal but new index (e.g. after an overlay reload) gets a fresh validator
+        transforms_index = {**TRANSFORMS_INDEX, "tf:fry": {"id": "tf:fry", "params": []}}
+        result = validate_tpt_construction({"part_id": "part:fruit", "transforms": [{"id": "tf:fry"}]},
+                                           PARTS_INDEX, transforms_index)
+        assert result.valid
+        assert _validator_for(PARTS_INDEX, transforms_index) is not validator
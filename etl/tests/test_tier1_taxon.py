@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the Tier 1 taxon resolver's LLM-free paths
+"""
+
+import pytest
+from unittest.mock import Mock
+
+from etl.evidence.lib.ncbi_resolver import NCBIResolution
+from etl.evidence.lib.tier1_taxon import Tier1TaxonResolver, local_skip_reason
+
+class TestLocalSkipReason:
+    """Foods settled as skips without an LLM call"""
+
+    @pytest.mark.parametrize("food_name", [
+        "Frankfurter, beef",
+        "Hot dog",
+        "Sausage, Italian, pork",
+        "Salt, table",
+        "Table salt",
+        "Soy sauce",
+        "Sauce, pasta",
+        "Water",
+        "Water, bottled",
+        "Cookies, oatmeal",
+        "  Pizza, cheese",
+        "Nuts, mixed, mixture",
+        "Beans and rice, combination",
+        "Vegetables (mixtures)",
+    ])
+    def test_skips_non_biological_and_multi_ingredient_heads(self, food_name):
+        assert local_skip_reason(food_name) is not None
+
+    @pytest.mark.parametrize("food_name", [
+        "Water chestnut",          # head must end at a comma or the end of the name
+        "Watermelon, raw",
+        "Breadfruit",
+        "Breadnut tree seeds",
+        "Soy sauce made from soy and wheat (shoyu)",
+        "Tomato sauce",            # only the head noun is matched
+        "Cabbage, stir-fried",
+        "Saltines",
+        "Mixed nuts",              # "mixed" is not a mixture(s) word
+        "Apples, raw",
+        "",
+    ])
+    def test_real_foods_go_to_the_llm(self, food_name):
+        assert local_skip_reason(food_name) is None
+
+    def test_reason_names_the_matched_rule(self):
+        assert local_skip_reason("Salt, table") == "Local skip rule: 'Salt, table' is non-biological or multi-ingredient"
+        assert local_skip_reason("Soup, combination, MIXTURE") == "Local skip rule: 'combination' marks a multi-ingredient product"
+
+    def test_skipped_foods_never_reach_the_llm(self):
+        """Local skips are final, full-confidence dispositions that take no slot in a call"""
+        resolver = Tier1TaxonResolver(Mock(), model="test")
+        sent = []
+        send = lambda requests: [sent.append(request) for request in requests]
+
+        results = resolver._resolve_rows([{"fdc_id": 1, "description": "Frankfurter, beef"},
+                                          {"fdc_id": 2, "description": "Water"}], 1, send)
+
+        assert sent == []
+        assert [(r.disposition, r.confidence, r.taxon_id) for r in results] == [("skip", 1.0, None)] * 2
+
+
+class TestMarshaledResolutions:
+    """Results of a marshaled Tier 1 call are matched to foods by row number"""
+
+    def setup_method(self):
+        """Resolver whose NCBI check verifies every taxon"""
+        ncbi = Mock()
+        ncbi.resolve_taxon.side_effect = lambda taxon_id: NCBIResolution(
+            taxon_id=taxon_id, ncbi_taxid=1, confidence=0.9, lineage={}, needs_refinement=False, reason="ok"
+        )
+        self.resolver = Tier1TaxonResolver(ncbi, model="test")
+        self.fallbacks = []
+        self.resolver.resolve_taxon = lambda food_id, food_name, food_description="": (
+            self.fallbacks.append(food_id) or self.resolver._error_resolution(food_id, food_name, "fallback")
+        )
+        self.rows = [("1", "Apples, raw", ""), ("2", "Pears, raw", ""), ("3", "Plums, raw", "")]
+
+    @staticmethod
+    def _item(row, taxon_id):
+        return {"row": row, "taxon_id": taxon_id, "confidence": 0.9, "disposition": "resolved"}
+
+    def test_reordered_rows_match_their_foods(self):
+        """Rows returned out of order still land on the food they name"""
+        response = {"results": [self._item(3, "tx:p:prunus"), self._item(1, "tx:p:malus"), self._item("2", "tx:p:pyrus")]}
+
+        results = self.resolver._marshaled_resolutions(self.rows, response)
+
+        assert [r.taxon_id for r in results] == ["tx:p:malus", "tx:p:pyrus", "tx:p:prunus"]
+        assert self.resolver.name_cache.lookup("Pears, raw", 1, "")["taxon_id"] == "tx:p:pyrus"
+        assert self.fallbacks == []
+
+    @pytest.mark.parametrize("rows", [
+        [1, 1, 3],      # row 2 dropped, row 1 repeated
+        [1, 2, 4],      # out of range
+        [1, 2, None],   # missing row number
+        [1, 2, True],   # bool is not a row number
+    ])
+    def test_bad_row_coverage_falls_back(self, rows):
+        """Anything but rows 1..N exactly once resolves every food individually and caches nothing"""
+        response = {"results": [self._item(row, "tx:p:malus") for row in rows]}
+
+        results = self.resolver._marshaled_resolutions(self.rows, response)
+
+        assert self.fallbacks == ["1", "2", "3"]
+        assert [r.reason for r in results] == ["LLM error: fallback"] * 3
+        assert all(self.resolver.name_cache.lookup(name, 1, "") is None for _, name, _ in self.rows)
+
+    def test_non_object_result_falls_back(self):
+        """A non-object result fails the whole call rather than one row"""
+        response = {"results": [self._item(1, "tx:p:malus"), "tx:p:pyrus", self._item(3, "tx:p:prunus")]}
+
+        self.resolver._marshaled_resolutions(self.rows, response)
+
+        assert self.fallbacks == ["1", "2", "3"]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the Tier 2 TPT constructor's batch paths
+"""
+
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from etl.evidence.lib import optimized_prompts
+from etl.evidence.lib.tier1_taxon import TaxonResolution
+from etl.evidence.lib.tier2_tpt import Tier2TPTConstructor
+
+PARTS = [SimpleNamespace(id="part:fruit", name="Fruit", kind="plant", applies_to=[])]
+TRANSFORMS = [SimpleNamespace(id="tf:cook", name="Cook", order=90, params=[])]
+
+def _resolution(food_id, food_name):
+    return TaxonResolution(food_id=food_id, food_name=food_name, taxon_id="tx:p:malus", confidence=0.9,
+                           disposition="resolved", reason="", ncbi_resolution=None, new_taxa=[])
+
+class TestMarshaledConstruction:
+    """Results of a marshaled Tier 2 call are matched to foods by row number"""
+
+    def setup_method(self):
+        """Constructor whose part filter keeps every part and whose fallback is recorded"""
+        part_filter = Mock()
+        part_filter.get_applicable_parts.side_effect = lambda taxon_id, lineage, parts, min_confidence: list(parts)
+        self.constructor = Tier2TPTConstructor(part_filter, model="test")
+        self.fallbacks = []
+        self.constructor._llm_construct_tpt = lambda taxon_resolution, parts, transforms: (
+            self.fallbacks.append(taxon_resolution.food_id) or self.constructor._error_result(RuntimeError("fallback"))
+        )
+        self.resolutions = [_resolution("1", "Apples, raw"), _resolution("2", "Apples, dried"),
+                            _resolution("3", "Apples, baked")]
+
+    def _construct(self, response):
+        send = lambda requests: [response for _ in requests]
+        return self.constructor._construct_rows(self.resolutions, PARTS, TRANSFORMS, 3, send)
+
+    def _cached(self, resolution):
+        context = self.constructor._cache_context(resolution, PARTS, TRANSFORMS)
+        return self.constructor.name_cache.lookup(resolution.food_name, 2, *context)
+
+    @staticmethod
+    def _item(row, method):
+        return {"row": row, "part_id": "part:fruit", "transforms": [{"id": "tf:cook", "params": {"method": method}}],
+                "confidence": 0.9, "disposition": "constructed", "reason": method}
+
+    def test_reordered_rows_match_their_foods(self):
+        """Rows returned out of order still land on the food they name"""
+        results = self._construct({"results": [self._item(2, "dry"), self._item(3, "bake"), self._item(1, "raw")]})
+
+        assert [r.reason for r in results] == ["raw", "dry", "bake"]
+        assert self._cached(self.resolutions[1])["reason"] == "dry"
+        assert self.fallbacks == []
+
+    @pytest.mark.parametrize("items", [
+        [{"row": 1}, {"row": 1}, {"row": 3}],   # row 2 dropped, row 1 repeated
+        [{"row": 1}, {"row": 2}],               # too few results
+        [{"row": 1}, "bake", {"row": 3}],       # non-object result
+    ])
+    def test_unusable_rows_fall_back_uncached(self, items):
+        """A mismatched marshaled answer goes to the individual fallback and caches nothing"""
+        results = self._construct({"results": [self._item(**item, method="raw") if isinstance(item, dict) else item
+                                               for item in items]})
+
+        assert self.fallbacks == ["1", "2", "3"]
+        assert [r.disposition for r in results] == ["skip"] * 3
+        assert all(self._cached(resolution) is None for resolution in self.resolutions)
+
+
+class TestTPTSystemPrompt:
+    """Transform schemas in the Tier 2 system prompt follow the transforms Tier 2 is given"""
+
+    @pytest.fixture(autouse=True)
+    def ontology(self, tmp_path, monkeypatch):
+        """transforms.json in a temp ontology; prompt caches are cleared around each test"""
+        self.transforms_file = tmp_path / "transforms.json"
+        self.transforms_file.write_text(json.dumps([{"id": "tf:dry", "order": 10, "params": []}]))
+        monkeypatch.setattr(optimized_prompts, "_ontology_file",
+                            lambda relative: tmp_path / relative.rsplit("/", 1)[1])
+        optimized_prompts.clear_prompt_caches()
+        yield
+        optimized_prompts.clear_prompt_caches()
+
+    @staticmethod
+    def _schemas(prompt):
+        return [line for line in prompt.splitlines() if line.startswith("tf:")]
+
+    def test_schemas_come_from_the_tiers_transforms(self):
+        """An overlay transform missing from transforms.json is still listed"""
+        transforms = TRANSFORMS + [SimpleNamespace(id="tf:smoke", name="Smoke", order=95, identity=True,
+                                                   params=[{"key": "wood", "enum": ["oak", "hickory"]}])]
+        constructor = Tier2TPTConstructor(Mock(), model="test")
+
+        assert self._schemas(constructor._get_tpt_system_prompt("p", transforms)) == \
+            ["tf:cook", "tf:smoke [wood∈{oak,hickory}]"]
+        system, _ = optimized_prompts.get_tpt_prompt_pair(_resolution("1", "Apples, raw"), PARTS, transforms)
+        assert self._schemas(system) == ["tf:cook", "tf:smoke [wood∈{oak,hickory}]"]
+
+    def test_clear_prompt_caches_rereads_the_ontology(self):
+        assert self._schemas(optimized_prompts.get_optimized_tpt_system_prompt()) == ["tf:dry"]
+
+        self.transforms_file.write_text(json.dumps([{"id": "tf:cure", "order": 20, "params": []}]))
+        assert self._schemas(optimized_prompts.get_optimized_tpt_system_prompt()) == ["tf:dry"]
+        optimized_prompts.clear_prompt_caches()
+        assert self._schemas(optimized_prompts.get_optimized_tpt_system_prompt()) == ["tf:cure"]
+
+    def test_unreadable_ontology_raises(self):
+        """A prompt without transform schemas is never sent"""
+        self.transforms_file.unlink()
+
+        with pytest.raises(FileNotFoundError):
+            optimized_prompts.get_optimized_tpt_system_prompt()